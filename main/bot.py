@@ -10,21 +10,46 @@ Keep this file minimal and robust — heavy logic lives in cogs.
 
 """
 
-import os
 import sys
+
+from core.boot import BootProfile
+
+# every boot phase is timed from here; --profile-startup also times each import
+boot = BootProfile()
+PROFILE_STARTUP = "--profile-startup" in sys.argv
+if PROFILE_STARTUP:
+    boot.profile_imports()
+
+import os
 import logging
-import threading
-import json
+import re
+import shlex
+import time
 import asyncio
-from collections import deque
-from datetime import datetime, timezone
+from contextlib import nullcontext
 
 import nextcord
 from nextcord.ext import commands
 from dotenv import load_dotenv
 
+from core.allowlist import GuildAllowlist
+from core.commandsync import CommandSync
+from core.console import Console, ConsoleContext
+from core.lazycogs import LazyCogs, build_manifest
+from core.mentions import MentionLog
+from core.reload import CogReloader, describe
+from core.resolver import MessageResolver
+from core.search import MessageSearch
+from core.snapshot import StateSnapshot
+from core.storage import Storage, migrate_json_files
+from core.tail import POLICIES, TailFilter, TailHub
+from core.users import UserDirectory
+
+boot.mark("imports", since="start")
+
 # --- Setup ---
-load_dotenv()
+with boot.phase("env"):
+    load_dotenv()
 
 logging.basicConfig(
     level=logging.INFO,
@@ -32,35 +57,57 @@ logging.basicConfig(
 )
 logger = logging.getLogger("lunarbot")
 
-# --- Message persistence files ---
+# --- Intents & bot ---
+with boot.phase("intents"):
+    intents = nextcord.Intents.default()
+    intents.message_content = True
+    intents.guilds = True
+    intents.members = True
+    intents.bans = True
+    intents.guild_messages = True
+    intents.invites = True
+    intents.guild_reactions = True
+
+    bot = commands.Bot(
+        command_prefix=os.getenv("PREFIX", "!!"),
+        intents=intents,
+        help_command=None,  # disable default help command
+    )
+    bot.boot = boot
+    bot.resolver = MessageResolver(
+        bot,
+        max_messages=int(os.getenv("MESSAGE_CACHE_SIZE", "5000")),
+        max_bytes=int(os.getenv("MESSAGE_CACHE_BYTES", str(16 * 1024 * 1024))),
+    )
+    bot.resolver.attach()
+    bot.directory = UserDirectory(bot, ttl=float(os.getenv("USER_CACHE_TTL", "3600")))
+    bot.directory.attach()
+    bot.command_sync = CommandSync(bot, os.getenv("COMMAND_SYNC_STATE", "command_sync.json"))
+    bot.tail = TailHub(bot)
+    bot.tail.attach()
+
+# --- Storage ---
+# Legacy whole-file JSON stores; imported once into the SQLite database below.
 message_count_path = "message_counts.json"
-if not os.path.exists(message_count_path):
-    with open(message_count_path, "w", encoding="utf-8") as f:
-        json.dump({}, f)
-
-alt_log_file = "alts_log.json"
-msg_delete_log_file = "message_deletes.json"
+custom_roles_path = "custom_roles.json"
 
-# --- Intents & bot ---
-intents = nextcord.Intents.default()
-intents.message_content = True
-intents.guilds = True
-intents.members = True
-intents.bans = True
-intents.guild_messages = True
-intents.invites = True
-intents.guild_reactions = True
-
-bot = commands.Bot(
-    command_prefix=os.getenv("PREFIX", "!!"),
-    intents=intents,
-    help_command=None,  # disable default help command
-)
+with boot.phase("storage"):
+    storage = Storage(os.getenv("DB_PATH", "lunarbot.db"))
+    migrate_json_files(storage, message_counts=message_count_path, custom_roles=custom_roles_path)
+bot.storage = storage  # shared by the cogs
 
 # --- Globals referenced by CLI ---
+message_search = MessageSearch(concurrency=int(os.getenv("SEARCH_CONCURRENCY", "8")))
 listened_channel_id = None
-mentions_log = deque(maxlen=100)
-raid_enabled = True
+listen_tail = None  # tail subscription streaming the listened channel
+# bot and keyword mentions; older entries spill to MENTION_SPILL once the ring is full
+mentions_log = MentionLog(
+    capacity=int(os.getenv("MENTION_LOG_SIZE", "1000")),
+    keywords=os.getenv("MENTION_KEYWORDS", "").split(","),
+    spill_path=os.getenv("MENTION_SPILL", "mentions.ndjson") or None,
+)
+mentions_log.attach(bot)
+bot.raid_enabled = True  # read by the AntiRaid cog
 
 ALLOWED_GUILDS = {
     983593136867643462,
@@ -70,957 +117,904 @@ ALLOWED_GUILDS = {
     1433372795412287501,
 }
 
-
-def terminal_listener():
-    """Interactive terminal command loop used while the bot is running.
-
-    Runs in a separate thread. Commands are designed to be safe and schedule
-    async work on the bot event loop when needed.
-    """
-    global listened_channel_id
-
-    scheduled_shutdown = None
-
-    def console_print(*args, **kwargs):
-        prefix = getattr(getattr(bot, "user", None), "name", os.getenv("BOT_NAME", "Bot"))
-        sep = kwargs.pop("sep", " ")
-        end = kwargs.pop("end", "\n")
-        message = sep.join(str(a) for a in args) if args else ""
-        print(f"{prefix}> {message}", end=end)
-
-    def parse_time(s: str) -> int | None:
+# --- Guild allowlist ---
+# Events from other guilds are dropped at the gateway, before any cog sees them.
+# Console edits are saved to ALLOWLIST_FILE, which then takes precedence over the set above.
+with boot.phase("allowlist"):
+    bot.allowlist = GuildAllowlist(
+        bot,
+        ALLOWED_GUILDS,
+        leave=os.getenv("ALLOWLIST_LEAVE", "false").lower() == "true",
+        path=os.getenv("ALLOWLIST_FILE", "allowed_guilds.json") or None,
+    )
+    bot.allowlist.attach()
+
+
+# --- Warm-restart snapshot ---
+# Restored before any cog loads; each cog gets its state back as it registers.
+def dump_console_state():
+    return {
+        "listened_channel_id": listened_channel_id,
+        "raid_enabled": bot.raid_enabled,
+        "mentions": mentions_log.to_json(),
+    }
+
+
+def load_console_state(state):
+    bot.raid_enabled = state["raid_enabled"]
+    mentions_log.load_json(state["mentions"])
+    cid = state["listened_channel_id"]
+    if cid is not None:
+        # the client that started it is gone; stream to the log until `listen` is run again
+        restored = ConsoleContext()
+        restored.done = True
+        bot.loop.call_soon(lambda: listen_to(cid, restored))  # tails need the running loop
+
+
+with boot.phase("snapshot restore"):
+    bot.snapshot = StateSnapshot(
+        os.getenv("SNAPSHOT_PATH", "restart_snapshot.bin"),
+        max_age=float(os.getenv("SNAPSHOT_MAX_AGE", "300")),
+    )
+    bot.snapshot.register("console", dump_console_state, load_console_state)
+    bot.snapshot.register("resolver", bot.resolver.to_json, bot.resolver.load_json)
+    bot.snapshot.register("directory", bot.directory.to_json, bot.directory.load_json)
+    bot.snapshot.restore()
+
+
+# --- Operator console ---
+# Served inside the event loop on a local Unix socket (CONSOLE_SOCKET) and on
+# stdin; see core/console.py for the text/JSON protocol and the CLI client.
+console = Console(name=lambda: getattr(getattr(bot, "user", None), "name", os.getenv("BOT_NAME", "Bot")))
+scheduled_shutdown = None
+# per-subscription queue bound and overflow policy for live tails
+TAIL_QUEUE = int(os.getenv("TAIL_QUEUE", "200"))
+TAIL_POLICY = os.getenv("TAIL_POLICY", "drop-oldest")
+TAIL_SAMPLE = int(os.getenv("TAIL_SAMPLE", "10"))
+
+
+def parse_time(s: str) -> int | None:
+    try:
+        if s == "now":
+            return 0
+        if s.endswith("s"):
+            return int(s[:-1])
+        if s.endswith("m"):
+            return int(s[:-1]) * 60
+        if s.endswith("h"):
+            return int(s[:-1]) * 3600
+        return int(s)
+    except Exception:
+        return None
+
+
+async def find_message(message_id):
+    try:
+        found = await bot.resolver.resolve(message_id)
+    except Exception:
+        found = None
+    if found is None:
+        channels = [ch for g in bot.guilds for ch in g.text_channels]
+        found = await message_search.find(channels, message_id)
+    return found
+
+
+def remove_command_everywhere(ctx, target: str) -> bool:
+    """Drop a prefix command and queue removal of same-named application commands."""
+    removed = False
+    if bot.get_command(target):
         try:
-            if s == "now":
-                return 0
-            if s.endswith("s"):
-                return int(s[:-1])
-            if s.endswith("m"):
-                return int(s[:-1]) * 60
-            if s.endswith("h"):
-                return int(s[:-1]) * 3600
-            return int(s)
-        except Exception:
-            return None
+            bot.remove_command(target)
+            removed = True
+            ctx.print(f"Removed prefix command: {target}")
+        except Exception as e:
+            ctx.print(f"Failed to remove prefix command {target}: {e}")
 
-    while True:
+    app_cmds = getattr(bot, "application_commands", [])
+    for app in [app for app in app_cmds if getattr(app, 'name', None) == target]:
         try:
-            cmd_raw = input()
-        except EOFError:
-            break
-        if cmd_raw is None:
-            continue
-
-        cmd = cmd_raw.strip()
-        if not cmd:
-            continue
-
-        lcmd = cmd.lower()
-
-        if lcmd == "refresh":
-            console_print("Refreshing all cogs...")
-            COGS_DIR = os.path.join(os.path.dirname(__file__), "cogs")
-            for fn in os.listdir(COGS_DIR):
-                if fn.endswith('.py') and not fn.startswith('_'):
-                    cog_name = f'cogs.{fn[:-3]}'
-                    try:
-                        bot.reload_extension(cog_name)
-                        console_print(f"Reloaded {cog_name}")
-                        logger.info(f"Reloaded {cog_name} via terminal Refresh")
-                    except Exception as e:
-                        console_print(f"Failed to reload {cog_name}: {e}")
-                        logger.error(f"Failed to reload {cog_name}: {e}")
-
-        elif lcmd.startswith("listen "):
-            parts = cmd.split()
-            if len(parts) < 2:
-                console_print("Usage: listen <start|stop|list> [channelid]")
-                continue
-            action = parts[1].lower()
-            if action == "start":
-                if len(parts) != 3:
-                    console_print("Usage: listen start <channelid>")
-                    continue
-                try:
-                    cid = int(parts[2])
-                    listened_channel_id = cid
-                    console_print(f"Listening to channel {cid}")
-                except Exception as e:
-                    console_print(f"Invalid channel id: {e}")
-            elif action == "stop":
-                if listened_channel_id is not None:
-                    console_print(f"Stopped listening to channel {listened_channel_id}")
-                    listened_channel_id = None
-                else:
-                    console_print("No channel is currently being listened to.")
-            elif action == "list":
-                if listened_channel_id is not None:
-                    console_print(f"Currently listening to channel: {listened_channel_id}")
+            bot._connection.remove_application_command(app)
+            removed = True
+            ctx.print(f"Queued removal of application command: {target}")
+        except Exception as e:
+            ctx.print(f"Failed to queue removal of application command {target}: {e}")
+    return removed
+
+
+@console.command("refresh", "refresh [all]")
+async def console_refresh(ctx, args):
+    force = args.lower() == "all"
+    ctx.print("Reloading all cogs..." if force else "Reloading changed cogs...")
+    result = await bot.reloader.reload(force=force)
+    ctx.print(describe(result))
+    ctx.data = result
+
+
+@console.command("watch", "watch on/off")
+async def console_watch(ctx, args):
+    if args.lower() == "on":
+        bot.reloader.start_watch()
+        ctx.print(f"Watching cogs for changes (debounce {bot.reloader.debounce}s)")
+    elif args.lower() == "off":
+        bot.reloader.stop_watch()
+        ctx.print("Stopped watching cogs")
+    else:
+        ctx.fail("Usage: watch on|off")
+
+
+def listen_to(cid: int, ctx):
+    """Point the `listen` tail at channel `cid`, streaming its messages to `ctx`."""
+    global listened_channel_id, listen_tail
+    listened_channel_id = cid
+    if listen_tail is not None:
+        bot.tail.unsubscribe(listen_tail)
+    listen_tail = bot.tail.subscribe(
+        TailFilter(channels=[cid]), ctx, maxsize=TAIL_QUEUE, policy=TAIL_POLICY, sample=TAIL_SAMPLE
+    ).id
+
+
+@console.command("listen", "listen start/stop/list")
+async def console_listen(ctx, args):
+    global listened_channel_id, listen_tail
+    parts = args.split()
+    if not parts:
+        ctx.fail("Usage: listen <start|stop|list> [channelid]")
+        return
+    action = parts[0].lower()
+    if action == "start":
+        if len(parts) != 2:
+            ctx.fail("Usage: listen start <channelid>")
+            return
+        try:
+            cid = int(parts[1])
+            # this client now sees the channel's messages; `send` posts to it
+            listen_to(cid, ctx)
+            ctx.print(f"Listening to channel {cid}")
+        except Exception as e:
+            ctx.fail(f"Invalid channel id: {e}")
+    elif action == "stop":
+        if listened_channel_id is not None:
+            ctx.print(f"Stopped listening to channel {listened_channel_id}")
+            listened_channel_id = None
+            if listen_tail is not None:
+                bot.tail.unsubscribe(listen_tail)
+                listen_tail = None
+        else:
+            ctx.print("No channel is currently being listened to.")
+    elif action == "list":
+        if listened_channel_id is not None:
+            ctx.print(f"Currently listening to channel: {listened_channel_id}")
+        else:
+            ctx.print("No channel is currently being listened to.")
+    else:
+        ctx.fail("Unknown listen command. Use start, stop, or list.")
+    ctx.data["channel_id"] = listened_channel_id
+
+
+@console.command("tail", "tail add/list/remove")
+async def console_tail(ctx, args):
+    usage = (
+        "Usage: tail add [--channel ID]... [--guild ID]... [--author ID]... [--match REGEX] [--attachments]\n"
+        f"                [--queue N] [--policy {'|'.join(POLICIES)}] [--sample N]\n"
+        "       tail list | tail remove <id|all>"
+    )
+    try:
+        parts = shlex.split(args)
+    except ValueError as e:
+        ctx.fail(f"{e}\n{usage}")
+        return
+    action = parts[0].lower() if parts else ""
+
+    if action == "list":
+        subs = ctx.data["subscriptions"] = bot.tail.stats()
+        if not subs:
+            ctx.print("No live tails.")
+        for sub in subs:
+            ctx.print(
+                f"tail {sub['id']}: {sub['filter']} [{sub['policy']}, {sub['queued']}/{sub['maxsize']} queued] "
+                f"{sub['delivered']} delivered, {sub['dropped']} dropped"
+            )
+    elif action == "remove" and len(parts) == 2:
+        ids = list(bot.tail.subscriptions) if parts[1] == "all" else [int(parts[1])] if parts[1].isdigit() else []
+        removed = [sub_id for sub_id in ids if bot.tail.unsubscribe(sub_id)]
+        if removed:
+            ctx.print(f"Stopped tail {', '.join(map(str, removed))}")
+        else:
+            ctx.fail(f"No tail {parts[1]}.")
+    elif action == "add":
+        scope = {"channels": [], "guilds": [], "authors": []}
+        options = {"maxsize": TAIL_QUEUE, "policy": TAIL_POLICY, "sample": TAIL_SAMPLE}
+        pattern, attachments = None, False
+        flags = iter(parts[1:])
+        try:
+            for flag in flags:
+                if flag in ("--channel", "--guild", "--author"):
+                    scope[flag[2:] + "s"].append(int(next(flags)))
+                elif flag == "--match":
+                    pattern = next(flags)
+                elif flag == "--attachments":
+                    attachments = True
+                elif flag == "--queue":
+                    options["maxsize"] = max(1, int(next(flags)))
+                elif flag == "--policy":
+                    options["policy"] = next(flags)
+                elif flag == "--sample":
+                    options["sample"] = int(next(flags))
                 else:
-                    console_print("No channel is currently being listened to.")
-            else:
-                console_print("Unknown listen command. Use start, stop, or list.")
-
-        elif lcmd.startswith("send "):
-            message = cmd[5:].strip()
-            if not message:
-                console_print("Usage: send <message>")
-                continue
-            if listened_channel_id is None:
-                console_print("No channel is currently being listened to. Use 'listen start <channelid>' first.")
-                continue
-
-            async def send_message():
-                channel = bot.get_channel(listened_channel_id)
-                if channel is None:
-                    console_print(f"Channel {listened_channel_id} not found or bot has no access.")
-                    return
-                try:
-                    await channel.send(message)
-                    console_print(f"Sent message to {listened_channel_id}")
-                except Exception as e:
-                    console_print(f"Failed to send: {e}")
-
-            if bot.is_closed():
-                console_print("Cannot send message: bot is not running.")
-            else:
-                bot.loop.call_soon_threadsafe(lambda: bot.loop.create_task(send_message()))
-
-        elif lcmd.startswith("reply "):
-            parts = cmd.split(" ", 2)
-            async def reply_core():
-                if len(parts) < 3:
-                    console_print("Usage:\n  reply <messageID> <message>\n  reply user <messageID> <message>\n  reply dms <userID> <message>")
-                    return
-
-                sub = parts[1]
-                remainder = parts[2]
-
-                # reply by fetching message author
-                if sub == "user":
-                    try:
-                        message_id, reply_msg = remainder.strip().split(" ", 1)
-                    except ValueError:
-                        console_print("Usage: reply user <messageID> <message>")
-                        return
-
-                    found = None
-                    for g in bot.guilds:
-                        for ch in g.text_channels:
-                            try:
-                                msg = await ch.fetch_message(int(message_id))
-                                found = msg
-                                break
-                            except Exception:
-                                continue
-                        if found:
-                            break
-
-                    if not found:
-                        console_print("Message ID not found in accessible channels.")
-                        return
-
-                    user = found.author
-                    try:
-                        await user.send(reply_msg)
-                        console_print(f"Sent message to user {user.id}")
-                    except Exception as e:
-                        console_print(f"Failed to send DM: {e}")
-
-                elif sub == "dms":
-                    try:
-                        user_id_str, reply_msg = remainder.strip().split(" ", 1)
-                        user_id = int(user_id_str)
-                    except ValueError:
-                        console_print("Usage: reply dms <userID> <message>")
-                        return
-
-                    try:
-                        user = await bot.fetch_user(user_id)
-                        await user.send(reply_msg)
-                        console_print(f"Sent DM to user {user_id}")
-                    except Exception as e:
-                        console_print(f"Failed to send DM: {e}")
+                    raise ValueError(f"unknown option {flag}")
+            sub = bot.tail.subscribe(TailFilter(pattern=pattern, attachments=attachments, **scope), ctx, **options)
+        except StopIteration:
+            ctx.fail(usage)
+            return
+        except (ValueError, re.error) as e:
+            ctx.fail(f"{e}\n{usage}")
+            return
+        ctx.print(f"tail {sub.id}: streaming {sub.filter.describe()} (queue {sub.maxsize}, {sub.policy})")
+        ctx.data["id"] = sub.id
+    else:
+        ctx.fail(usage)
+
+
+@console.command("send", "send")
+async def console_send(ctx, args):
+    if not args:
+        ctx.fail("Usage: send <message>")
+        return
+    if listened_channel_id is None:
+        ctx.fail("No channel is currently being listened to. Use 'listen start <channelid>' first.")
+        return
+    if bot.is_closed():
+        ctx.fail("Cannot send message: bot is not running.")
+        return
+    channel = bot.get_channel(listened_channel_id)
+    if channel is None:
+        ctx.fail(f"Channel {listened_channel_id} not found or bot has no access.")
+        return
+    try:
+        sent = await channel.send(args)
+        ctx.print(f"Sent message to {listened_channel_id}")
+        ctx.data["message_id"] = sent.id
+    except Exception as e:
+        ctx.fail(f"Failed to send: {e}")
 
-                else:
-                    # default: reply to message by id
-                    try:
-                        message_id, reply_msg = cmd.split(" ", 2)[1:]
-                    except ValueError:
-                        console_print("Usage: reply <messageID> <message>")
-                        return
-
-                    found = None
-                    for g in bot.guilds:
-                        for ch in g.text_channels:
-                            try:
-                                msg = await ch.fetch_message(int(message_id))
-                                found = msg
-                                break
-                            except Exception:
-                                continue
-                        if found:
-                            break
-
-                    if not found:
-                        console_print("Message not found in accessible channels.")
-                        return
-
-                    try:
-                        await found.reply(reply_msg)
-                        console_print(f"Replied to message {message_id}")
-                    except Exception as e:
-                        console_print(f"Failed to reply: {e}")
-
-            bot.loop.call_soon_threadsafe(lambda: bot.loop.create_task(reply_core()))
-
-        elif lcmd == "antiraid on":
-            raid_enabled = True
-            console_print("Anti-raid ENABLED via terminal.")
-
-        elif lcmd == "antiraid off":
-            raid_enabled = False
-            console_print("Anti-raid DISABLED via terminal.")
-
-        elif lcmd == "mentions list":
-            if not mentions_log:
-                console_print("No mentions recorded.")
-            else:
-                for entry in mentions_log:
-                    console_print(f"{entry['channel_id']}: {entry['message_id']} \"{entry['content']}\" {entry['user_id']}")
 
-        elif lcmd == "commandslist":
-            console_print("Prefix commands:")
-            for c in sorted(bot.commands, key=lambda x: x.name):
-                console_print(f" - {c.name}: {c.help or 'no help'}")
+@console.command("reply", "reply")
+async def console_reply(ctx, args):
+    parts = args.split(" ", 1)
+    if len(parts) < 2:
+        ctx.fail("Usage:\n  reply <messageID> <message>\n  reply user <messageID> <message>\n  reply dms <userID> <message>")
+        return
 
-            console_print("Application (slash) commands:")
-            try:
-                app_cmds = getattr(bot, "application_commands", [])
-                for app in sorted(app_cmds, key=lambda a: getattr(a, 'name', str(a))):
-                    name = getattr(app, "name", None) or getattr(app, "qualified_name", str(app))
-                    is_global = getattr(app, "is_global", False)
-                    console_print(f" - {name} (global: {is_global})")
-            except Exception as e:
-                console_print(f"Failed to list application commands: {e}")
+    sub, remainder = parts
 
-        elif lcmd.startswith("delete "):
-            target = cmd[len("delete "):].strip()
-            if not target:
-                console_print("Usage: delete <command_name>")
-                continue
+    # reply by fetching message author
+    if sub == "user":
+        try:
+            message_id, reply_msg = remainder.strip().split(" ", 1)
+            message_id = int(message_id)
+        except ValueError:
+            ctx.fail("Usage: reply user <messageID> <message>")
+            return
+
+        found = await find_message(message_id)
+        if not found:
+            ctx.fail("Message ID not found in accessible channels.")
+            return
+
+        user = found.author
+        try:
+            await user.send(reply_msg)
+            ctx.print(f"Sent message to user {user.id}")
+        except Exception as e:
+            ctx.fail(f"Failed to send DM: {e}")
 
-            async def delete_core():
-                removed_any = False
-                if bot.get_command(target):
-                    try:
-                        bot.remove_command(target)
-                        removed_any = True
-                        console_print(f"Removed prefix command: {target}")
-                    except Exception as e:
-                        console_print(f"Failed to remove prefix command {target}: {e}")
-
-                try:
-                    app_cmds = getattr(bot, "application_commands", [])
-                    to_remove = [app for app in app_cmds if getattr(app, 'name', None) == target]
-                    if to_remove:
-                        for app in to_remove:
-                            try:
-                                bot._connection.remove_application_command(app)
-                                removed_any = True
-                                console_print(f"Queued removal of application command: {target}")
-                            except Exception as e:
-                                console_print(f"Failed to queue removal of application command {target}: {e}")
-
-                        try:
-                            await bot.sync_application_commands()
-                            console_print(f"Synchronized application command deletions for: {target}")
-                        except Exception as e:
-                            console_print(f"Failed to sync application commands after deletion: {e}")
-                except Exception as e:
-                    console_print(f"Error while checking application commands: {e}")
-
-                if not removed_any:
-                    console_print(f"No command named '{target}' was found as a prefix or application command.")
-
-            bot.loop.call_soon_threadsafe(lambda: bot.loop.create_task(delete_core()))
-
-        elif lcmd.startswith("update "):
-            target = cmd[len("update "):].strip()
-            if not target:
-                console_print("Usage: update <command_name>")
-                continue
+    elif sub == "dms":
+        try:
+            user_id_str, reply_msg = remainder.strip().split(" ", 1)
+            user_id = int(user_id_str)
+        except ValueError:
+            ctx.fail("Usage: reply dms <userID> <message>")
+            return
 
-            async def update_core():
-                deleted = False
-                if bot.get_command(target):
-                    try:
-                        bot.remove_command(target)
-                        deleted = True
-                        console_print(f"Removed prefix command: {target}")
-                    except Exception as e:
-                        console_print(f"Failed to remove prefix command {target}: {e}")
-
-                try:
-                    app_cmds = getattr(bot, "application_commands", [])
-                    to_remove = [app for app in app_cmds if getattr(app, 'name', None) == target]
-                    if to_remove:
-                        for app in to_remove:
-                            try:
-                                bot._connection.remove_application_command(app)
-                                deleted = True
-                                console_print(f"Queued removal of application command: {target}")
-                            except Exception as e:
-                                console_print(f"Failed to queue removal of application command {target}: {e}")
-
-                        try:
-                            await bot.sync_application_commands()
-                            console_print(f"Synchronized deletions of {target} to Discord")
-                        except Exception as e:
-                            console_print(f"Failed to sync application commands after deletion: {e}")
-                except Exception as e:
-                    console_print(f"Error while checking application commands: {e}")
-
-                console_print("Reloading all cogs to pick up any new/changed command implementations...")
-                COGS_DIR = os.path.join(os.path.dirname(__file__), "cogs")
-                for fn in os.listdir(COGS_DIR):
-                    if fn.endswith('.py') and not fn.startswith('_'):
-                        cog_name = f'cogs.{fn[:-3]}'
-                        try:
-                            bot.reload_extension(cog_name)
-                            console_print(f"Reloaded {cog_name}")
-                        except Exception as e:
-                            console_print(f"Failed to reload {cog_name}: {e}")
-
-                try:
-                    await bot.sync_application_commands()
-                    console_print(f"Synchronized application commands (update completed for: {target})")
-                except Exception as e:
-                    console_print(f"Failed to sync application commands after reload: {e}")
-
-            bot.loop.call_soon_threadsafe(lambda: bot.loop.create_task(update_core()))
-
-        elif lcmd == "restart":
-            console_print("Restarting bot...")
-
-            async def restart_core():
-                try:
-                    await bot.close()
-                except Exception as e:
-                    console_print(f"Error during bot.close(): {e}")
-                try:
-                    python = sys.executable
-                    os.execv(python, [python] + sys.argv)
-                except Exception as e:
-                    console_print(f"Failed to exec new process: {e}")
-
-            bot.loop.call_soon_threadsafe(lambda: bot.loop.create_task(restart_core()))
-
-        elif lcmd.startswith("shutdown"):
-            parts = cmd.split()
-            if len(parts) == 1:
-                console_print("Usage: shutdown <time>|now|cancel  (e.g. shutdown 30s or shutdown 5m)")
-                continue
+        try:
+            user = await bot.directory.resolve_user(user_id)
+            await user.send(reply_msg)
+            ctx.print(f"Sent DM to user {user_id}")
+        except Exception as e:
+            ctx.fail(f"Failed to send DM: {e}")
 
-            sub = parts[1].lower()
-            if sub == "cancel":
-                if scheduled_shutdown is not None and not scheduled_shutdown.done():
-                    scheduled_shutdown.cancel()
-                    scheduled_shutdown = None
-                    console_print("Scheduled shutdown cancelled.")
-                else:
-                    console_print("No scheduled shutdown to cancel.")
-                continue
+    else:
+        # default: reply to message by id
+        try:
+            message_id, reply_msg = sub, remainder
+            message_id = int(message_id)
+        except ValueError:
+            ctx.fail("Usage: reply <messageID> <message>")
+            return
 
-            seconds = parse_time(sub)
-            if seconds is None:
-                console_print("Invalid time format for shutdown. Use e.g. 30s, 5m, 1h, now, or cancel")
-                continue
+        found = await find_message(message_id)
+        if not found:
+            ctx.fail("Message not found in accessible channels.")
+            return
 
-            async def shutdown_core(delay: int):
-                if delay > 0:
-                    console_print(f"Shutdown scheduled in {delay} seconds. Use 'shutdown cancel' to abort.")
-                    try:
-                        await asyncio.sleep(delay)
-                    except asyncio.CancelledError:
-                        console_print("Shutdown task was cancelled.")
-                        return
-                console_print("Shutting down now...")
-                try:
-                    await bot.close()
-                except Exception as e:
-                    console_print(f"Error while closing bot: {e}")
-                try:
-                    os._exit(0)
-                except Exception:
-                    pass
-
-            if sub == "now":
-                bot.loop.call_soon_threadsafe(lambda: bot.loop.create_task(shutdown_core(0)))
-            else:
-                scheduled_shutdown = bot.loop.create_task(shutdown_core(seconds))
+        try:
+            await found.reply(reply_msg)
+            ctx.print(f"Replied to message {message_id}")
+        except Exception as e:
+            ctx.fail(f"Failed to reply: {e}")
+
+
+@console.command("sync", "sync [force|stats]")
+async def console_sync(ctx, args):
+    if args.lower() == "stats":
+        stats = ctx.data = bot.command_sync.stats()
+        ctx.print(
+            f"Command sync: {stats['scopes']} scopes tracked, {stats['synced_scopes']} synced / "
+            f"{stats['skipped_scopes']} skipped, {stats['spent_ms']} ms spent, ~{stats['saved_ms']} ms saved "
+            f"(~{stats['scope_ms']} ms per scope)"
+        )
+        return
+    result = ctx.data = await bot.command_sync.sync(force=args.lower() == "force")
+    ctx.print(
+        f"Synced {len(result['synced'])} scope(s) ({', '.join(result['synced']) or 'none'}), "
+        f"skipped {result['skipped']} unchanged, {len(result['failed'])} failed "
+        f"in {result['elapsed'] * 1000:.0f} ms"
+    )
+
+
+@console.command("boot", "boot")
+async def console_boot(ctx, args):
+    for line in boot.report().splitlines():
+        ctx.print(line)
+    ctx.data["phases"] = {name: round(seconds * 1000, 1) for name, seconds in boot.phases}
+
+
+@console.command("cogs", "cogs")
+async def console_cogs(ctx, args):
+    ctx.print(f"Loaded: {', '.join(sorted(bot.extensions))}")
+    ctx.data["loaded"] = sorted(bot.extensions)
+    if bot.lazy_cogs:
+        stats = ctx.data["lazy"] = bot.lazy_cogs.stats()
+        ctx.print(f"Lazy, not loaded yet: {', '.join(stats['pending']) or 'none'}")
+        for module, info in stats["loaded"].items():
+            ctx.print(f"  {module}: loaded on {info['trigger']} in {info['ms']} ms")
+
+
+@console.command("snapshot", "snapshot")
+async def console_snapshot(ctx, args):
+    stats = ctx.data = bot.snapshot.stats()
+    ctx.print(f"Registered: {', '.join(stats['registered'])}")
+    ctx.print(f"Restored at boot: {', '.join(stats['restored']) or 'none'}")
+    if stats["unclaimed"]:
+        ctx.print(f"Waiting for their cog to load: {', '.join(stats['unclaimed'])}")
+
+
+@console.command("search", "search stats")
+async def console_search(ctx, args):
+    if args.lower() != "stats":
+        ctx.fail("Usage: search stats")
+        return
+    stats = ctx.data["search"] = message_search.stats()
+    ctx.print(
+        f"Message search: {stats['searches']} searches, {stats['hits']} hits, "
+        f"{stats['lookups']} REST lookups, last {stats['last_ms']} ms, avg {stats['avg_ms']} ms"
+    )
+    stats = ctx.data["cache"] = bot.resolver.stats()
+    ctx.print(
+        f"Message cache: {stats['messages']} messages (~{stats['bytes'] // 1024} KiB), "
+        f"{stats['indexed']} indexed, {stats['hits']} hits / {stats['misses']} misses "
+        f"(hit ratio {stats['hit_ratio']}), {stats['evicted']} evicted"
+    )
+    stats = ctx.data["users"] = bot.directory.stats()
+    ctx.print(
+        f"User directory: {stats['indexed']} users indexed, {stats['fetched']} fetched cached, "
+        f"{stats['hits']} hits / {stats['fetches']} REST fetches (hit ratio {stats['hit_ratio']})"
+    )
+
+
+@console.command("backfill", "backfill")
+async def console_backfill(ctx, args):
+    parts = args.split()
+    cog = bot.get_cog("MessageCounter")
+    if cog is None:
+        ctx.fail("MessageCounter cog is not loaded.")
+        return
+    if parts == ["status"]:
+        if not cog.backfills:
+            ctx.print("No backfill is running.")
+        for gid, (job, _) in cog.backfills.items():
+            ctx.print(f"Backfill {gid}: {job.status()}")
+        return
+    try:
+        guild_id = int(parts[0])
+        options = {"concurrency": int(parts[1])} if len(parts) == 2 else {}
+        if len(parts) > 2:
+            raise ValueError
+    except (IndexError, ValueError):
+        ctx.fail("Usage: backfill <guildID> [concurrency] | backfill status")
+        return
 
-        else:
-            console_print("Unknown command. Available: refresh, restart, shutdown, listen, send, delete, update, commandslist, antiraid on/off, mentions list")
+    guild = bot.get_guild(guild_id)
+    if guild is None:
+        ctx.fail(f"Guild {guild_id} not found or bot is not a member.")
+        return
 
+    async def progress(text):
+        ctx.print(f"Backfill {guild_id}: {text}")
 
-# --- Cog Loader ---
-COGS_DIR = os.path.join(os.path.dirname(__file__), "cogs")
-for fn in os.listdir(COGS_DIR):
-    if fn.endswith('.py') and not fn.startswith('_'):
+    async def backfill_core():
         try:
-            bot.load_extension(f'cogs.{fn[:-3]}')
-            logger.info(f"Loaded cog: {fn}")
+            ctx.print(await cog.run_backfill(guild, progress=progress, **options))
         except Exception as e:
-            logger.error(f"Failed to load cog {fn}: {e}")
+            ctx.print(f"Backfill of {guild_id} failed: {e}")
+            logger.error(f"Backfill of {guild_id} failed: {e}")
 
+    # runs for as long as the history scan takes; progress follows as late output
+    asyncio.create_task(backfill_core())
+    ctx.print(f"Backfill of {guild_id} started.")
 
-# --- Optional: Reload command for owner only ---
-@bot.command(hidden=True)
-#@commands.is_owner()
-async def reload(ctx, cog: str):
-    allowed_ids = 972357305226125322
-    """Reload a cog. Usage: !reload embed"""
-    if ctx.author.id != allowed_ids:
+
+@console.command("export", "export")
+async def console_export(ctx, args):
+    parts = args.lower().split()
+    cog = bot.get_cog("MessageCounter")
+    if cog is None:
+        ctx.fail("MessageCounter cog is not loaded.")
         return
     try:
-        bot.reload_extension(f'cogs.{cog}')
-        await ctx.send(f"Reloaded cogs.{cog}")
-        logger.info(f"Reloaded cog: {cog}")
-    except Exception as e:
-        await ctx.send(f"Failed to reload: {e}")
-        logger.error(f"Failed to reload cog {cog}: {e}")
-
+        guild_id = None if parts[0] == "all" else int(parts[0])
+        fmt = "ndjson" if "ndjson" in parts[1:] else "csv"
+        compress = "gzip" in parts[1:]
+        days = next((int(p[5:]) for p in parts[1:] if p.startswith("days=")), 0)
+    except (IndexError, ValueError):
+        ctx.fail("Usage: export <guildID|all> [csv|ndjson] [gzip] [days=N]")
+        return
 
-# --- Bot events ---
-@bot.event
-async def on_ready():
-    logger.info(f"Bot is running as {bot.user} (ID: {bot.user.id})")
-    logger.info(f"Connected to {len(bot.guilds)} guild(s).")
+    directory = os.getenv("EXPORT_DIR", "exports")
+    os.makedirs(directory, exist_ok=True)
     try:
-        await bot.sync_application_commands()
-        logger.info("Application commands synced successfully")
+        paths = await cog.export_counts(directory, fmt, compress, days, guild_id)
     except Exception as e:
-        logger.error(f"Failed to sync application commands: {e}")
+        ctx.fail(f"Export failed: {e}")
+        return
+    if not paths:
+        ctx.print("Nothing to export.")
+    for path in paths:
+        ctx.print(f"Wrote {path} ({os.path.getsize(path):,} bytes)")
+    ctx.data["paths"] = paths
+
+
+@console.command("antiraid", "antiraid on/off/status/release")
+async def console_antiraid(ctx, args):
+    parts = args.lower().split()
+    cog = bot.get_cog("AntiRaid")
+    if parts == ["on"]:
+        bot.raid_enabled = True
+        ctx.print("Anti-raid ENABLED via terminal.")
+    elif parts == ["off"]:
+        bot.raid_enabled = False
+        ctx.print("Anti-raid DISABLED via terminal.")
+    elif parts == ["status"]:
+        ctx.print(f"Anti-raid is {'ENABLED' if bot.raid_enabled else 'DISABLED'}.")
+        if cog is None:
+            ctx.print("AntiRaid cog is not loaded.")
+        else:
+            stats = ctx.data["stats"] = cog.stats()
+            actions = stats["actions"]
+            ctx.print(
+                f"{stats['joins']} joins seen in {stats['guilds']} guilds, {stats['trips']} raids detected; "
+                f"actions: {actions['done']} done, {actions['failed']} failed, {actions['queued']} queued, "
+                f"{actions['dropped']} dropped"
+            )
+            for guild_id, raid in stats["raids"].items():
+                ctx.print(f"  LOCKDOWN {guild_id}: {raid['joins']} joins since {time.ctime(raid['since'])}")
+    elif len(parts) == 2 and parts[0] == "release" and parts[1].isdigit():
+        if cog is not None and await cog.release(int(parts[1])):
+            ctx.print(f"Lockdown of {parts[1]} lifted.")
+        else:
+            ctx.fail(f"Guild {parts[1]} is not in lockdown.")
+    else:
+        ctx.fail("Usage: antiraid on|off|status|release <guildID>")
+    ctx.data["enabled"] = bot.raid_enabled
+
+
+@console.command("mentions", "mentions list|stats")
+async def console_mentions(ctx, args):
+    parts = args.split()
+    if parts == ["stats"]:
+        stats = ctx.data = mentions_log.stats()
+        ctx.print(
+            f"Mentions: {stats['entries']}/{stats['capacity']} in memory, {stats['recorded']} recorded, "
+            f"{stats['spilled']} spilled, indexed by {stats['channels']} channels / {stats['users']} users"
+        )
+        return
+    usage = "Usage: mentions list [--user ID] [--channel ID] [--since 30m] [--limit N] | mentions stats"
+    if not parts or parts[0].lower() != "list" or len(parts) % 2 == 0:
+        ctx.fail(usage)
+        return
+    filters = {"limit": 20}
+    try:
+        for flag, value in zip(parts[1::2], parts[2::2]):
+            if flag == "--user":
+                filters["user_id"] = int(value)
+            elif flag == "--channel":
+                filters["channel_id"] = int(value)
+            elif flag == "--since":
+                seconds = parse_time(value)
+                if seconds is None:
+                    raise ValueError(value)
+                filters["since"] = time.time() - seconds
+            elif flag == "--limit":
+                filters["limit"] = int(value)
+            else:
+                raise ValueError(flag)
+    except ValueError:
+        ctx.fail(usage)
+        return
 
-    logger.info(f"Logged in as {bot.user} (ID: {bot.user.id})")
+    found = mentions_log.query(**filters)
+    if not found:
+        ctx.print("No mentions recorded.")
+    for entry in reversed(found):
+        ctx.print(f"{entry['channel_id']}: {entry['message_id']} \"{entry['content']}\" {entry['user_id']}")
+    ctx.data["mentions"] = found
 
 
-@bot.event
-async def on_disconnect():
-    logger.warning("Bot disconnected from Discord.")
-
+@console.command("modlog", "modlog search|stats")
+async def console_modlog(ctx, args):
+    cog = bot.get_cog("ModLog")
+    if cog is None:
+        ctx.fail("ModLog cog is not loaded.")
+        return
+    parts = args.split()
+    if parts == ["stats"]:
+        stats = ctx.data = {**cog.stats(), "index": await cog.index.stats()}
+        index = stats["index"]
+        ctx.print(
+            f"Modlog: {stats['logged']} logged in {stats['batches']} batches, {stats['rotations']} rotations; "
+            f"cache {stats['cache']['messages']} messages ({stats['cache']['hit_ratio']:.0%} hits)"
+        )
+        ctx.print(
+            f"Index: {index['records']} records in {len(index['partitions'])} partitions, "
+            f"{index['searches']} searches (last {index['last_search_ms']} ms), {index['merges']} merge steps"
+            f"{', backfill running' if stats['backfilling'] else ''}"
+        )
+        for part in index["partitions"]:
+            ctx.print(f"  {time.strftime('%Y-%m-%d', time.gmtime(part['start']))}: {part['rows']} records"
+                      f"{', optimized' if part['optimized'] else ''}")
+        return
+    usage = ("Usage: modlog search [--guild ID] [--user ID] [--channel ID] [--since 2h] [--kind delete|edit] "
+             "[--limit N] [words...] | modlog stats")
+    if not parts or parts[0].lower() != "search":
+        ctx.fail(usage)
+        return
+    filters, words = {"limit": 20}, []
+    tokens = iter(parts[1:])
+    try:
+        for token in tokens:
+            if not token.startswith("--"):
+                words.append(token)
+                continue
+            value = next(tokens)
+            if token == "--guild":
+                filters["guild_id"] = int(value)
+            elif token == "--user":
+                filters["user_id"] = int(value)
+            elif token == "--channel":
+                filters["channel_id"] = int(value)
+            elif token == "--since":
+                seconds = parse_time(value)
+                if seconds is None:
+                    raise ValueError(value)
+                filters["since"] = time.time() - seconds
+            elif token == "--kind" and value in ("delete", "edit"):
+                filters["kind"] = value
+            elif token == "--limit":
+                filters["limit"] = int(value)
+            else:
+                raise ValueError(token)
+    except (ValueError, StopIteration):
+        ctx.fail(usage)
+        return
 
-@bot.event
-async def on_resumed():
-    logger.info("Bot resumed session.")
+    await cog.writer.flush()
+    found = await cog.index.search(words=" ".join(words), **filters)
+    if not found:
+        ctx.print("No modlog records found.")
+    for record in reversed(found):
+        text = (record.get("content") or "").replace("\n", " ")
+        if record.get("kind") == "edit":
+            text = f"{record.get('before', '')!r} -> {text!r}"
+        ctx.print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record['ts']))} {record.get('kind', 'delete')} "
+                  f"{record['guild_id']}/{record['channel_id']}/{record['message_id']} "
+                  f"{record.get('author_id', '?')}: {text}")
+    ctx.print(f"{len(found)} results in {cog.index.last_search_ms:.1f} ms")
+    if cog.backfill_running:
+        ctx.print("Older records are still being indexed; results may be incomplete.")
+    ctx.data["records"] = found
+
+
+@console.command("allowlist", "allowlist status|add|remove|reload|leave|sweep")
+async def console_allowlist(ctx, args):
+    allowlist = bot.allowlist
+    parts = args.lower().split()
+    if parts == ["status"]:
+        stats = ctx.data = allowlist.stats()
+        ctx.print(
+            f"Allowlist: {len(stats['allowed'])} guilds{' (empty: all guilds allowed)' if not stats['allowed'] else ''}, "
+            f"auto-leave {'ON' if stats['leave'] else 'OFF'}; {stats['dropped_total']} events dropped, "
+            f"{stats['stripped']} guild payloads stripped, {stats['left']} guilds left"
+        )
+        for event, count in stats["dropped"].items():
+            ctx.print(f"  {event}: {count}")
+        unlisted = [g for g in bot.guilds if not allowlist.allows(g.id)]
+        for guild in unlisted:
+            ctx.print(f"  unlisted: {guild.name} ({guild.id})")
+        return
+    if len(parts) == 2 and parts[0] in ("add", "remove") and parts[1].isdigit():
+        guild_id = int(parts[1])
+        if parts[0] == "add":
+            allowlist.add(guild_id)
+            ctx.print(f"Guild {guild_id} allowed.")
+        elif allowlist.remove(guild_id):
+            ctx.print(f"Guild {guild_id} removed from the allowlist.")
+        else:
+            ctx.fail(f"Guild {guild_id} is not on the allowlist.")
+            return
+    elif parts == ["reload"]:
+        if not allowlist.path or not os.path.exists(allowlist.path):
+            ctx.fail(f"No allowlist file to reload ({allowlist.path or 'ALLOWLIST_FILE is unset'}).")
+            return
+        try:
+            allowlist.reload()
+        except (OSError, ValueError, TypeError) as e:
+            ctx.fail(f"Failed to reload {allowlist.path}: {e}")
+            return
+        ctx.print(f"Reloaded {len(allowlist.allowed)} guilds from {allowlist.path}.")
+    elif len(parts) == 2 and parts[0] == "leave" and parts[1] in ("on", "off"):
+        allowlist.leave = parts[1] == "on"
+        ctx.print(f"Auto-leave of unlisted guilds {'ENABLED' if allowlist.leave else 'DISABLED'}.")
+    elif parts != ["sweep"]:
+        ctx.fail("Usage: allowlist status|add <guildID>|remove <guildID>|reload|leave on|off|sweep")
+        return
+    # every change applies to the guilds already joined: leave (if enabled) or chunk
+    left = await allowlist.sweep()
+    if left:
+        ctx.print(f"Left {left} unlisted guild(s).")
+    ctx.data["allowed"] = sorted(allowlist.allowed)
 
 
-# --- Run Bot ---
-token = os.getenv('Token')
-if not token:
-    logger.critical("No bot token found in environment variable 'Token'. Exiting.")
-    exit(1)
+@console.command("commandslist", "commandslist")
+async def console_commandslist(ctx, args):
+    ctx.print("Prefix commands:")
+    for c in sorted(bot.commands, key=lambda x: x.name):
+        ctx.print(f" - {c.name}: {c.help or 'no help'}")
+    ctx.data["prefix"] = sorted(c.name for c in bot.commands)
 
+    ctx.print("Application (slash) commands:")
+    try:
+        app_cmds = getattr(bot, "application_commands", [])
+        ctx.data["application"] = []
+        for app in sorted(app_cmds, key=lambda a: getattr(a, 'name', str(a))):
+            name = getattr(app, "name", None) or getattr(app, "qualified_name", str(app))
+            is_global = getattr(app, "is_global", False)
+            ctx.print(f" - {name} (global: {is_global})")
+            ctx.data["application"].append({"name": name, "global": is_global})
+    except Exception as e:
+        ctx.fail(f"Failed to list application commands: {e}")
 
-if __name__ == '__main__':
-    threading.Thread(target=terminal_listener, daemon=True).start()
-    bot.run(token)
-#import dependencies
 
-#dependencies.setup(update=False)
+@console.command("delete", "delete")
+async def console_delete(ctx, args):
+    target = args
+    if not target:
+        ctx.fail("Usage: delete <command_name>")
+        return
 
-import nextcord
-from nextcord.ext import commands
-import os
+    removed_any = remove_command_everywhere(ctx, target)
+    if removed_any:
+        try:
+            await bot.command_sync.sync()
+            ctx.print(f"Synchronized application command deletions for: {target}")
+        except Exception as e:
+            ctx.fail(f"Failed to sync application commands after deletion: {e}")
+    else:
+        ctx.fail(f"No command named '{target}' was found as a prefix or application command.")
 
 
-import nextcord
-from nextcord.ext import commands
-import os
-import logging
-from dotenv import load_dotenv
-import threading
-from collections import deque
-import json
-import asyncio
-import time
-from datetime import datetime, timezone
+@console.command("update", "update")
+async def console_update(ctx, args):
+    target = args
+    if not target:
+        ctx.fail("Usage: update <command_name>")
+        return
 
-# --- Message Count File Initialization ---
-message_count_path = "message_counts.json"
-if not os.path.exists(message_count_path):
-    with open(message_count_path, "w") as f:
-        json.dump({}, f)
+    remove_command_everywhere(ctx, target)
 
-# Alt log file and message delete log file
-alt_log_file = "alts_log.json"
-msg_delete_log_file = "message_deletes.json"
+    # deletions and reloaded commands go out together in the single sync below
+    ctx.print("Reloading changed cogs to pick up any new/changed command implementations...")
+    result = await bot.reloader.reload(sync=False)
+    ctx.print(describe(result))
 
-# --- Logging Setup ---
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
-)
-logger = logging.getLogger("lunarbot")
+    try:
+        await bot.command_sync.sync()
+        ctx.print(f"Synchronized application commands (update completed for: {target})")
+    except Exception as e:
+        ctx.fail(f"Failed to sync application commands after reload: {e}")
 
-def terminal_listener():
-    global listened_channel_id
-    scheduled_shutdown = None
 
-    def console_print(*args, **kwargs):
-        prefix = getattr(getattr(bot, "user", None), "name", os.getenv("BOT_NAME", "Bot"))
-        sep = kwargs.pop("sep", " ")
-        end = kwargs.pop("end", "\n")
-        message = sep.join(str(a) for a in args) if args else ""
-        print(f"{prefix}> {message}", end=end)
+@console.command("restart", "restart")
+async def console_restart(ctx, args):
+    ctx.print("Restarting bot...")
 
-    def parse_time(s: str) -> int | None:
+    async def restart_core():
+        # taken before close(), which unloads the cogs that registered state
         try:
-            if s == "now":
-                return 0
-            if s.endswith("s"):
-                return int(s[:-1])
-            if s.endswith("m"):
-                return int(s[:-1]) * 60
-            if s.endswith("h"):
-                return int(s[:-1]) * 3600
-            return int(s)
-        except Exception:
-            return None
-
-    while True:
+            saved = bot.snapshot.save()
+            ctx.print(f"Saved state of {len(saved['components'])} components ({saved['bytes']:,} bytes, {saved['ms']} ms)")
+        except Exception as e:
+            ctx.print(f"Failed to save restart snapshot, restarting cold: {e}")
         try:
-            cmd = input().strip()
-        except EOFError:
-            # input closed — exit thread
-            break
-
-        if not cmd:
-            continue
-
-        lcmd = cmd.lower()
-
-        if lcmd == "refresh":
-            console_print("Refreshing all cogs...")
-            COGS_DIR = os.path.join(os.path.dirname(__file__), "cogs")
-            for fn in os.listdir(COGS_DIR):
-                if fn.endswith('.py') and not fn.startswith('_'):
-                    cog_name = f'cogs.{fn[:-3]}'
-                    try:
-                        bot.reload_extension(cog_name)
-                        console_print(f"Reloaded {cog_name}")
-                        logger.info(f"Reloaded {cog_name} via terminal Refresh")
-                    except Exception as e:
-                        console_print(f"Failed to reload {cog_name}: {e}")
-                        logger.error(f"Failed to reload {cog_name}: {e}")
-
-        elif lcmd.startswith("listen "):
-            parts = cmd.split()
-            if len(parts) < 2:
-                console_print("Usage: listen <start|stop|list> [channelid]")
-                continue
-            action = parts[1].lower()
-            if action == "start":
-                if len(parts) != 3:
-                    console_print("Usage: listen start <channelid>")
-                    continue
-                try:
-                    channel_id = int(parts[2])
-                    listened_channel_id = channel_id
-                    console_print(f"Listening to channel {channel_id}")
-                    logger.info(f"Listening to channel {channel_id}")
-                except Exception as e:
-                    console_print(f"Invalid channel ID: {e}")
-            elif action == "stop":
-                if listened_channel_id is not None:
-                    console_print(f"Stopped listening to channel {listened_channel_id}")
-                    logger.info(f"Stopped listening to channel {listened_channel_id}")
-                    listened_channel_id = None
-                else:
-                    console_print("No channel is currently being listened to.")
-            elif action == "list":
-                if listened_channel_id is not None:
-                    console_print(f"Currently listening to channel: {listened_channel_id}")
-                else:
-                    console_print("No channel is currently being listened to.")
-            else:
-                console_print("Unknown listen command. Use start, stop, or list.")
-
-        elif lcmd.startswith("send "):
-            message = cmd[5:].strip()
-            if not message:
-                console_print("Usage: send <message>")
-                continue
-            if listened_channel_id is None:
-                console_print("No channel is currently being listened to. Use 'listen start <channelid>' first.")
-                continue
-
-            async def send_message():
-                channel = bot.get_channel(listened_channel_id)
-                if channel is None:
-                    logger.error(f"Channel ID {listened_channel_id} not found or bot has no access.")
-                    console_print(f"Channel ID {listened_channel_id} not found or bot has no access.")
-                    return
-                try:
-                    await channel.send(message)
-                    logger.info(f"Sent message to channel {listened_channel_id} via terminal command.")
-                    console_print(f"Sent message to {listened_channel_id}")
-                except Exception as e:
-                    logger.error(f"Failed to send message to {listened_channel_id}: {e}")
-                    console_print(f"Failed to send message: {e}")
-
-            if bot.is_closed():
-                logger.error("Cannot send message: bot is not running.")
-                console_print("Cannot send message: bot is not running.")
-            else:
-                bot.loop.call_soon_threadsafe(lambda: bot.loop.create_task(send_message()))
-
-        elif lcmd.startswith("reply "):
-            parts = cmd.split(" ", 2)
-
-            async def reply_core():
-                if len(parts) < 3:
-                    console_print("Usage:")
-                    console_print("  reply <messageID> <message>")
-                    console_print("  reply user <messageID> <message>")
-                    console_print("  reply dms <userID> <message>")
-                    return
-
-                subcommand = parts[1]
-                remainder = parts[2]
-
-                if subcommand == "user":
-                    try:
-                        message_id, reply_msg = remainder.strip().split(" ", 1)
-                    except ValueError:
-                        console_print("Usage: reply user <messageID> <message>")
-                        return
-
-                    # Fetch message directly without relying on mentions_log
-                    user_id = None
-                    for guild in bot.guilds:
-                        for channel in guild.text_channels:
-                            try:
-                                msg = await channel.fetch_message(int(message_id))
-                                user_id = msg.author.id
-                                raise StopIteration
-                            except Exception:
-                                continue
-                    if user_id is None:
-                        console_print("Message ID not found in accessible channels.")
-                        return
-
-                    user = None
-                    for guild in bot.guilds:
-                        user = guild.get_member(user_id)
-                        if user:
-                            break
-                    if not user:
-                        try:
-                            user = await bot.fetch_user(user_id)
-                        except Exception as e:
-                            console_print(f"Failed to fetch user: {e}")
-                            return
-
-                    try:
-                        await user.send(reply_msg)
-                        console_print(f"Sent message to user {user_id}")
-                    except Exception as e:
-                        console_print(f"Failed to send DM: {e}")
-
-                elif subcommand == "dms":
-                    try:
-                        user_id_str, reply_msg = remainder.strip().split(" ", 1)
-                        user_id = int(user_id_str)
-                    except ValueError:
-                        console_print("Usage: reply dms <userID> <message>")
-                        return
-
-                    user = None
-                    for guild in bot.guilds:
-                        user = guild.get_member(user_id)
-                        if user:
-                            break
-                    if not user:
-                        try:
-                            user = await bot.fetch_user(user_id)
-                        except Exception as e:
-                            console_print(f"Failed to fetch user: {e}")
-                            return
-
-                    try:
-                        await user.send(reply_msg)
-                        console_print(f"Sent DM to user {user_id}")
-                    except Exception as e:
-                        console_print(f"Failed to send DM: {e}")
+            await bot.close()
+        except Exception as e:
+            ctx.print(f"Error during bot.close(): {e}")
+        console.close()
+        mentions_log.close()
+        storage.close()  # the DB thread is a daemon; exec would drop its queued writes
+        try:
+            python = sys.executable
+            os.execv(python, [python] + sys.argv)
+        except Exception as e:
+            ctx.print(f"Failed to exec new process: {e}")
 
-                else:
-                    # Default: reply to message by directly fetching it
-                    try:
-                        message_id, reply_msg = cmd.split(" ", 2)[1:]
-                    except ValueError:
-                        console_print("Usage: reply <messageID> <message>")
-                        return
-
-                    for guild in bot.guilds:
-                        for channel in guild.text_channels:
-                            try:
-                                msg = await channel.fetch_message(int(message_id))
-                                await msg.reply(reply_msg)
-                                console_print(f"Replied to message {message_id}")
-                                return
-                            except Exception:
-                                continue
-
-                    console_print("Message not found in accessible channels.")
-
-            bot.loop.call_soon_threadsafe(lambda: bot.loop.create_task(reply_core()))
-
-        elif lcmd == "antiraid on":
-            global raid_enabled
-            raid_enabled = True
-            console_print("Anti-raid ENABLED via terminal.")
-            logger.info("Anti-raid ENABLED via terminal.")
-
-        elif lcmd == "antiraid off":
-            raid_enabled = False
-            console_print("Anti-raid DISABLED via terminal.")
-            logger.info("Anti-raid DISABLED via terminal.")
-
-        elif lcmd == "mentions list":
-            if not mentions_log:
-                console_print("No mentions recorded.")
-            else:
-                for entry in mentions_log:
-                    console_print(f"{entry['channel_id']}: {entry['message_id']} \"{entry['content']}\" \"{entry['user_id']}\"")
+    asyncio.create_task(restart_core())
 
-        elif lcmd == "commandslist":
-            console_print("Prefix commands:")
-            for c in sorted(bot.commands, key=lambda x: x.name):
-                console_print(f" - {c.name}: {c.help or 'no help'}")
 
-            console_print("\nApplication (slash) commands:")
-            try:
-                app_cmds = getattr(bot, "application_commands", [])
-                for app in sorted(app_cmds, key=lambda a: getattr(a, 'name', str(a))):
-                    name = getattr(app, "name", None) or getattr(app, "qualified_name", str(app))
-                    is_global = getattr(app, "is_global", False)
-                    console_print(f" - {name} (global: {is_global})")
-            except Exception as e:
-                console_print(f"Failed to list application commands: {e}")
+@console.command("shutdown", "shutdown <time>|now|cancel")
+async def console_shutdown(ctx, args):
+    global scheduled_shutdown
+    if not args:
+        ctx.fail("Usage: shutdown <time>|now|cancel  (e.g. shutdown 30s or shutdown 5m)")
+        return
 
-        elif lcmd.startswith("delete "):
-            target = cmd[len("delete "):].strip()
-            if not target:
-                console_print("Usage: delete <command_name>")
-                continue
+    sub = args.split()[0].lower()
+    if sub == "cancel":
+        if scheduled_shutdown is not None and not scheduled_shutdown.done():
+            scheduled_shutdown.cancel()
+            scheduled_shutdown = None
+            ctx.print("Scheduled shutdown cancelled.")
+        else:
+            ctx.fail("No scheduled shutdown to cancel.")
+        return
 
-            async def delete_core():
-                removed_any = False
-
-                if bot.get_command(target):
-                    try:
-                        bot.remove_command(target)
-                        removed_any = True
-                        console_print(f"Removed prefix command: {target}")
-                        logger.info(f"Removed prefix command: {target} via terminal")
-                    except Exception as e:
-                        console_print(f"Failed to remove prefix command {target}: {e}")
-
-                try:
-                    app_cmds = getattr(bot, "application_commands", [])
-                    to_remove = [app for app in app_cmds if getattr(app, 'name', None) == target]
-                    if to_remove:
-                        for app in to_remove:
-                            try:
-                                bot._connection.remove_application_command(app)
-                                removed_any = True
-                                console_print(f"Queued removal of application command: {target}")
-                                logger.info(f"Queued removal of application command: {target} via terminal")
-                            except Exception as e:
-                                console_print(f"Failed to queue removal of application command {target}: {e}")
-
-                        try:
-                            await bot.sync_application_commands()
-                            console_print(f"Synchronized application command deletions for: {target}")
-                        except Exception as e:
-                            console_print(f"Failed to sync application commands after deletion: {e}")
-                except Exception as e:
-                    console_print(f"Error while checking application commands: {e}")
-
-                if not removed_any:
-                    console_print(f"No command named '{target}' was found as a prefix or application command.")
-
-            bot.loop.call_soon_threadsafe(lambda: bot.loop.create_task(delete_core()))
-
-        elif lcmd.startswith("update "):
-            target = cmd[len("update "):].strip()
-            if not target:
-                console_print("Usage: update <command_name>")
-                continue
+    seconds = parse_time(sub)
+    if seconds is None:
+        ctx.fail("Invalid time format for shutdown. Use e.g. 30s, 5m, 1h, now, or cancel")
+        return
 
-            async def update_core():
-                deleted = False
-                if bot.get_command(target):
-                    try:
-                        bot.remove_command(target)
-                        deleted = True
-                        console_print(f"Removed prefix command: {target}")
-                    except Exception as e:
-                        console_print(f"Failed to remove prefix command {target}: {e}")
-
-                try:
-                    app_cmds = getattr(bot, "application_commands", [])
-                    to_remove = [app for app in app_cmds if getattr(app, 'name', None) == target]
-                    if to_remove:
-                        for app in to_remove:
-                            try:
-                                bot._connection.remove_application_command(app)
-                                deleted = True
-                                console_print(f"Queued removal of application command: {target}")
-                            except Exception as e:
-                                console_print(f"Failed to queue removal of application command {target}: {e}")
-
-                        try:
-                            await bot.sync_application_commands()
-                            console_print(f"Synchronized deletions of {target} to Discord")
-                        except Exception as e:
-                            console_print(f"Failed to sync application commands after deletion: {e}")
-                except Exception as e:
-                    console_print(f"Error while checking application commands: {e}")
-
-                console_print("Reloading all cogs to pick up any new/changed command implementations...")
-                COGS_DIR = os.path.join(os.path.dirname(__file__), "cogs")
-                for fn in os.listdir(COGS_DIR):
-                    if fn.endswith('.py') and not fn.startswith('_'):
-                        cog_name = f'cogs.{fn[:-3]}'
-                        try:
-                            bot.reload_extension(cog_name)
-                            console_print(f"Reloaded {cog_name}")
-                        except Exception as e:
-                            console_print(f"Failed to reload {cog_name}: {e}")
-
-                try:
-                    await bot.sync_application_commands()
-                    console_print(f"Synchronized application commands (update completed for: {target})")
-                except Exception as e:
-                    console_print(f"Failed to sync application commands after reload: {e}")
-
-            bot.loop.call_soon_threadsafe(lambda: bot.loop.create_task(update_core()))
-
-        elif lcmd == "restart":
-            console_print("Restarting bot...")
-
-            async def restart_core():
-                try:
-                    await bot.close()
-                except Exception as e:
-                    console_print(f"Error during bot.close(): {e}")
-                try:
-                    python = sys.executable
-                    os.execv(python, [python] + sys.argv)
-                except Exception as e:
-                    console_print(f"Failed to exec new process: {e}")
-
-            bot.loop.call_soon_threadsafe(lambda: bot.loop.create_task(restart_core()))
-
-        elif lcmd.startswith("shutdown"):
-            parts = cmd.split()
-            if len(parts) == 1:
-                console_print("Usage: shutdown <time>|now|cancel  (e.g. shutdown 30s or shutdown 5m)")
-                continue
+    async def shutdown_core(delay: int):
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                ctx.print("Shutdown task was cancelled.")
+                return
+        ctx.print("Shutting down now...")
+        try:
+            await bot.close()
+        except Exception as e:
+            ctx.print(f"Error while closing bot: {e}")
+        console.close()
+        mentions_log.close()
+        storage.close()  # os._exit skips the finally below that would otherwise close it
+        try:
+            os._exit(0)
+        except Exception:
+            pass
 
-            sub = parts[1].lower()
-            if sub == "cancel":
-                if scheduled_shutdown is not None and not scheduled_shutdown.done():
-                    scheduled_shutdown.cancel()
-                    scheduled_shutdown = None
-                    console_print("Scheduled shutdown cancelled.")
-                else:
-                    console_print("No scheduled shutdown to cancel.")
-                continue
+    if seconds > 0:
+        ctx.print(f"Shutdown scheduled in {seconds} seconds. Use 'shutdown cancel' to abort.")
+    scheduled_shutdown = asyncio.create_task(shutdown_core(seconds))
 
-            seconds = parse_time(sub)
-            if seconds is None:
-                console_print("Invalid time format for shutdown. Use e.g. 30s, 5m, 1h, now, or cancel")
-                continue
 
-            async def shutdown_core(delay: int):
-                if delay > 0:
-                    console_print(f"Shutdown scheduled in {delay} seconds. Use 'shutdown cancel' to abort.")
-                    try:
-                        await asyncio.sleep(delay)
-                    except asyncio.CancelledError:
-                        console_print("Shutdown task was cancelled.")
-                        return
-                console_print("Shutting down now...")
-                try:
-                    await bot.close()
-                except Exception as e:
-                    console_print(f"Error while closing bot: {e}")
-                try:
-                    os._exit(0)
-                except Exception:
-                    pass
-
-            if sub == "now":
-                bot.loop.call_soon_threadsafe(lambda: bot.loop.create_task(shutdown_core(0)))
-            else:
-                scheduled_shutdown = bot.loop.create_task(shutdown_core(seconds))
+async def start_console():
+    try:
+        await console.start(os.getenv("CONSOLE_SOCKET", "lunarbot.sock"))
+    except OSError as e:
+        logger.error(f"Failed to start console socket: {e}")
+    if os.getenv("CONSOLE_STDIN", "true").lower() == "true":
+        await console.serve_stdin()
 
-        else:
-            console_print("Unknown command. Available: refresh, restart, shutdown, listen, send, delete, update, commandslist, antiraid on/off, mentions list")
 
 # --- Cog Loader ---
+# LAZY_COGS=true registers prefix-command/listener stubs from a manifest and imports
+# each cog on first use (cogs with application commands still load here).
 COGS_DIR = os.path.join(os.path.dirname(__file__), "cogs")
-for fn in os.listdir(COGS_DIR):
-    if fn.endswith('.py') and not fn.startswith('_'):
-        try:
-            bot.load_extension(f'cogs.{fn[:-3]}')
-            logger.info(f"Loaded cog: {fn}")
-        except Exception as e:
-            logger.error(f"Failed to load cog {fn}: {e}")
+LAZY_COGS = os.getenv("LAZY_COGS", "false").lower() == "true"
+with boot.phase("cog import"):
+    bot.lazy_cogs = None
+    if LAZY_COGS:
+        bot.lazy_cogs = LazyCogs(bot, build_manifest(COGS_DIR, os.getenv("COG_MANIFEST", "cog_manifest.json")))
+    for fn in os.listdir(COGS_DIR):
+        if fn.endswith('.py') and not fn.startswith('_'):
+            if bot.lazy_cogs and bot.lazy_cogs.install(fn[:-3]):
+                logger.info(f"Deferred cog: {fn}")
+                continue
+            try:
+                bot.load_extension(f'cogs.{fn[:-3]}')
+                logger.info(f"Loaded cog: {fn}")
+            except Exception as e:
+                logger.error(f"Failed to load cog {fn}: {e}")
+bot.reloader = CogReloader(
+    bot, COGS_DIR, sync=bot.command_sync.sync, load=bot.lazy_cogs.load_extension if bot.lazy_cogs else None,
+    debounce=float(os.getenv("COG_WATCH_DEBOUNCE", "1.0")), snapshot=bot.snapshot,
+)
+bot.reloader.mark_loaded()
+
 
 # --- Optional: Reload command for owner only ---
 @bot.command(hidden=True)
 #@commands.is_owner()
-async def reload(ctx, cog: str):
+async def reload(ctx, cog: str = None):
     allowed_ids = 972357305226125322
-    """Reload a cog. Usage: !reload embed"""
+    """Reload a cog and its dependents, or every changed cog. Usage: !reload [embed]"""
     if ctx.author.id != allowed_ids:
         return
-    try:
-        bot.reload_extension(f'cogs.{cog}')
-        await ctx.send(f"Reloaded cogs.{cog}")
-        logger.info(f"Reloaded cog: {cog}")
-    except Exception as e:
-        await ctx.send(f"Failed to reload: {e}")
-        logger.error(f"Failed to reload cog {cog}: {e}")
+    result = await bot.reloader.reload(modules=[cog] if cog else None)
+    await ctx.send(describe(result))
+
+
+# --- Bot events ---
+@bot.event
+async def on_connect():
+    first = "login" not in boot.marks
+    if first:
+        boot.mark("login", since="run")
+    # register commands locally only; on_ready pushes just the scopes whose fingerprint changed
+    with boot.phase("command registration") if first else nullcontext():
+        bot.add_all_application_commands()
+
+
+@bot.event
+async def on_guild_available(guild):
+    pass  # replaces nextcord's per-guild rollout sync; guild scopes are fingerprinted too
 
-# --- Bot events ---+
 
 @bot.event
 async def on_ready():
     logger.info(f"Bot is running as {bot.user} (ID: {bot.user.id})")
     logger.info(f"Connected to {len(bot.guilds)} guild(s).")
-    # Sync all application (slash) commands with Discord
+    first = "first READY" not in boot.marks
+    if first:
+        boot.mark("first READY", since="login")
+        logger.info(f"Time to ready: {boot.elapsed():.2f}s (lazy cogs {'on' if LAZY_COGS else 'off'})")
+        if bot.lazy_cogs and os.getenv("LAZY_COGS_WARM", "true").lower() == "true":
+            bot.loop.create_task(bot.lazy_cogs.warm())
     try:
-        await bot.sync_application_commands()
-        logger.info("Application commands synced successfully")
+        with boot.phase("command sync") if first else nullcontext():
+            await bot.command_sync.sync()
     except Exception as e:
         logger.error(f"Failed to sync application commands: {e}")
+    if first:
+        logger.info(f"Boot phases: {boot.summary()}")
+        if PROFILE_STARTUP:
+            print(boot.report(), flush=True)
 
     logger.info(f"Logged in as {bot.user} (ID: {bot.user.id})")
+    if os.getenv("COG_WATCH", "false").lower() == "true":
+        bot.reloader.start_watch()
 
 
 @bot.event
 async def on_disconnect():
     logger.warning("Bot disconnected from Discord.")
 
+
 @bot.event
 async def on_resumed():
     logger.info("Bot resumed session.")
 
+
 # --- Run Bot ---
 token = os.getenv('Token')
 if not token:
@@ -1029,5 +1023,12 @@ if not token:
 
 
 if __name__ == '__main__':
-    threading.Thread(target=terminal_listener, daemon=True).start()
-    bot.run(token)
+    bot.loop.create_task(start_console())
+    boot.mark("run")
+    try:
+        bot.run(token)
+    finally:
+        console.close()
+        mentions_log.close()
+        # cogs flush their pending writes while unloading in bot.close()
+        storage.close()
@@ -4,9 +4,6 @@ from nextcord.ui import View, Button
 import aiohttp
 import random
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
 
 # prefer TENOR_API_KEY env var, but allow TenorKey for backwards compatibility
 TENOR_API_KEY = os.getenv("TENOR_API_KEY") or os.getenv("TenorKey")
@@ -94,7 +91,18 @@ class ActionButton(View):
 class ActionCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.action_stats = {}
+        self.action_stats = bot.snapshot.take_over("action_stats") or {}
+        bot.snapshot.register("action_stats", self.dump_stats, self.load_stats)
+
+    def dump_stats(self):
+        return {action: list(users.items()) for action, users in self.action_stats.items()}
+
+    def load_stats(self, state):
+        self.action_stats = {action: dict(users) for action, users in state.items()}
+
+    def cog_unload(self):
+        self.bot.snapshot.unregister("action_stats")
+        self.bot.snapshot.hand_over("action_stats", self.action_stats)
 
     async def fetch_action_gif(self, action):
         # if no Tenor key available, use curated fallbacks to ensure variety
@@ -177,7 +185,9 @@ class ActionCommands(commands.Cog):
 
         # Determine target user
         if member is None and ctx.message.reference:
-            replied_message = await ctx.channel.fetch_message(ctx.message.reference.message_id)
+            replied_message = ctx.message.reference.cached_message or await self.bot.resolver.resolve(
+                ctx.message.reference.message_id, ctx.channel
+            )
             if replied_message and replied_message.author:
                 member = replied_message.author
 
@@ -0,0 +1,91 @@
+import nextcord
+from nextcord.ext import commands
+import logging
+import os
+import time
+
+from core.alts import AltScorer
+from core.persist import RotatingLog
+
+logger = logging.getLogger("lunarbot.alts")
+
+# detections are appended to ALT_LOG as NDJSON and rotated at ALT_LOG_MAX_BYTES
+ALT_LOG = os.getenv("ALT_LOG", "alts_log.json")
+ALT_LOG_MAX_BYTES = int(os.getenv("ALT_LOG_MAX_BYTES", str(8 * 1024 * 1024)))
+ALT_LOG_BACKUPS = int(os.getenv("ALT_LOG_BACKUPS", "5"))
+# scoring: accounts younger than ALT_MIN_AGE_DAYS, default avatars and look-alike names add up to the score
+ALT_MIN_AGE_DAYS = float(os.getenv("ALT_MIN_AGE_DAYS", "7"))
+ALT_SIMILARITY = float(os.getenv("ALT_SIMILARITY", "0.6"))
+ALT_WINDOW = int(os.getenv("ALT_WINDOW", "500"))
+ALT_THRESHOLD = float(os.getenv("ALT_THRESHOLD", "0.5"))
+ALT_ALERT_CHANNEL_ID = int(os.getenv("ALT_ALERT_CHANNEL_ID", "0"))
+
+
+class AltDetector(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.scorer = AltScorer(ALT_MIN_AGE_DAYS, ALT_SIMILARITY, ALT_WINDOW)
+        self.log = RotatingLog(ALT_LOG, ALT_LOG_MAX_BYTES, ALT_LOG_BACKUPS)
+        self.scored = 0
+        self.flagged = 0
+
+    def cog_unload(self):
+        self.log.close()
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        if member.bot:
+            return
+        result = self.scorer.score(member.guild.id, member.id, member.name, member.avatar is None)
+        self.scored += 1
+        if result["score"] < ALT_THRESHOLD:
+            return
+        self.flagged += 1
+        entry = {
+            "ts": time.time(),
+            "guild_id": member.guild.id,
+            "user_id": member.id,
+            "name": member.name,
+            **result,
+        }
+        try:
+            self.log.append(entry)
+        except OSError as e:
+            logger.error(f"Failed to append to {ALT_LOG}: {e}")
+        logger.info(f"Possible alt {member} ({member.id}) in {member.guild.id}: score {result['score']}, "
+                    f"{', '.join(result['reasons'])}")
+        await self.alert(member, result)
+
+    async def alert(self, member, result):
+        channel = member.guild.get_channel(ALT_ALERT_CHANNEL_ID) if ALT_ALERT_CHANNEL_ID else None
+        if channel is None:
+            return
+        embed = nextcord.Embed(
+            title="Possible alt account",
+            description=f"{member.mention} ({member.id})",
+            color=nextcord.Color.orange(),
+        )
+        embed.add_field(name="Score", value=str(result["score"]))
+        embed.add_field(name="Signals", value="\n".join(result["reasons"]) or "none", inline=False)
+        if result["similar"]:
+            embed.add_field(
+                name="Similar recent joins",
+                value="\n".join(f"<@{user_id}> ({similarity:.0%})" for user_id, similarity in result["similar"]),
+                inline=False,
+            )
+        try:
+            await channel.send(embed=embed)
+        except Exception as e:
+            logger.error(f"Failed to send alt alert in {member.guild.id}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "scored": self.scored,
+            "flagged": self.flagged,
+            "logged": self.log.written,
+            "rotations": self.log.rotations,
+        }
+
+
+def setup(bot):
+    bot.add_cog(AltDetector(bot))
@@ -0,0 +1,156 @@
+from nextcord.ext import commands
+import asyncio
+import logging
+import os
+import time
+
+from core.raid import ActionQueue, RaidDetector
+
+logger = logging.getLogger("lunarbot.antiraid")
+
+# trip when RAID_JOINS members join within RAID_WINDOW seconds; lift after RAID_CALM quiet seconds
+RAID_JOINS = int(os.getenv("RAID_JOINS", "10"))
+RAID_WINDOW = int(os.getenv("RAID_WINDOW", "10"))
+RAID_CALM = float(os.getenv("RAID_CALM", "300"))
+# what a lockdown does to raid joiners: quarantine role (ID, optional), then none/kick/ban
+RAID_ROLE_ID = int(os.getenv("RAID_ROLE_ID", "0"))
+RAID_ACTION = os.getenv("RAID_ACTION", "none").lower()
+RAID_CONCURRENCY = int(os.getenv("RAID_CONCURRENCY", "4"))
+RAID_ALERT_CHANNEL_ID = int(os.getenv("RAID_ALERT_CHANNEL_ID", "0"))
+
+
+class AntiRaid(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        previous = bot.snapshot.take_over("antiraid")
+        if previous is None:
+            self.detector = RaidDetector(RAID_JOINS, RAID_WINDOW, RAID_CALM)
+            self.actions = ActionQueue(RAID_CONCURRENCY)
+            self.paused = set()  # guild IDs whose invites this cog paused
+        else:
+            self.detector = previous["detector"]
+            self.actions = previous["actions"]
+            self.paused = previous["paused"]
+        self.watchers = {}   # guild_id: task that lifts the lockdown once joins calm down
+        for guild_id in self.detector.raids:
+            self.watch(guild_id)
+        # a warm restart carries lockdowns over, so paused invites are still lifted later
+        bot.snapshot.register("antiraid", self.dump_state, self.load_state)
+
+    def dump_state(self):
+        return {"raids": list(self.detector.raids.items()), "paused": sorted(self.paused)}
+
+    def load_state(self, state):
+        for guild_id, raid in state["raids"]:
+            self.detector.raids[guild_id] = raid
+            self.watch(guild_id)
+        self.paused.update(state["paused"])
+
+    def cog_unload(self):
+        self.bot.snapshot.unregister("antiraid")
+        for task in self.watchers.values():
+            task.cancel()
+        live = {"detector": self.detector, "actions": self.actions, "paused": self.paused}
+        if self.bot.snapshot.hand_over("antiraid", live, release=self.lift_all):
+            return
+        self.actions.stop()
+        if self.paused:
+            # a warm restart restores the lockdown from the snapshot; a cold stop cannot
+            logger.warning(f"Anti-raid unloaded with invites paused in {sorted(self.paused)}")
+
+    def lift_all(self):
+        # the cog was removed by a reload; nothing would ever lift its lockdowns
+        self.actions.stop()
+        for guild_id in list(self.detector.raids):
+            asyncio.create_task(self.release(guild_id))
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        if not self.bot.raid_enabled or member.bot:
+            return
+        guild = member.guild
+        if self.detector.record(guild.id, member.id):
+            await self.lockdown(guild)
+        elif self.detector.in_raid(guild.id):
+            self.actions.submit(self.handle_joiner, guild, member.id)
+
+    # === LOCKDOWN PIPELINE ===
+    async def lockdown(self, guild):
+        joiners = self.detector.joiners(guild.id)
+        logger.warning(
+            f"Raid detected in {guild.name} ({guild.id}): {len(joiners)} joins in {RAID_WINDOW}s, locking down"
+        )
+        self.watch(guild.id)
+        await self.pause_invites(guild, True)
+        for member_id in joiners:
+            self.actions.submit(self.handle_joiner, guild, member_id)
+        await self.alert(guild, f"🚨 Raid detected: {len(joiners)} joins in {RAID_WINDOW}s. Invites paused"
+                                f"{', joiners quarantined' if RAID_ROLE_ID else ''}"
+                                f"{f', joiners queued for {RAID_ACTION}' if RAID_ACTION in ('kick', 'ban') else ''}.")
+
+    async def pause_invites(self, guild, paused: bool):
+        try:
+            await guild.edit(invites_disabled=paused, reason="Anti-raid lockdown" if paused else "Anti-raid lifted")
+        except Exception as e:
+            logger.error(f"Failed to {'pause' if paused else 'resume'} invites in {guild.id}: {e}")
+            return
+        if paused:
+            self.paused.add(guild.id)
+        else:
+            self.paused.discard(guild.id)
+
+    async def handle_joiner(self, guild, member_id: int):
+        member = guild.get_member(member_id)
+        if member is None:
+            return  # already gone
+        if RAID_ROLE_ID:
+            role = guild.get_role(RAID_ROLE_ID)
+            if role is not None and role not in member.roles:
+                await member.add_roles(role, reason="Anti-raid quarantine")
+        if RAID_ACTION == "kick":
+            await member.kick(reason="Anti-raid lockdown")
+        elif RAID_ACTION == "ban":
+            await guild.ban(member, reason="Anti-raid lockdown", delete_message_seconds=3600)
+
+    def watch(self, guild_id: int):
+        # bot.loop, since a restored lockdown is watched before the loop runs
+        self.watchers[guild_id] = self.bot.loop.create_task(self.lift_when_calm(guild_id))
+
+    async def lift_when_calm(self, guild_id: int):
+        while self.detector.in_raid(guild_id):
+            raid = self.detector.raids[guild_id]
+            wait = raid["last_hot"] + self.detector.calm - time.time()
+            if wait <= 0:
+                await self.release(guild_id)
+                return
+            await asyncio.sleep(wait)
+
+    async def release(self, guild_id: int) -> bool:
+        if self.detector.release(guild_id) is None:
+            return False
+        watcher = self.watchers.pop(guild_id, None)
+        if watcher is not None and watcher is not asyncio.current_task():
+            watcher.cancel()
+        guild = self.bot.get_guild(guild_id)
+        if guild is not None:
+            if guild_id in self.paused:
+                await self.pause_invites(guild, False)
+            await self.alert(guild, "✅ Raid lockdown lifted, invites resumed.")
+        logger.info(f"Raid lockdown lifted in {guild_id}")
+        return True
+
+    async def alert(self, guild, text: str):
+        channel = guild.get_channel(RAID_ALERT_CHANNEL_ID) if RAID_ALERT_CHANNEL_ID else None
+        if channel is None:
+            return
+        try:
+            await channel.send(text)
+        except Exception as e:
+            logger.error(f"Failed to send raid alert in {guild.id}: {e}")
+
+    def stats(self) -> dict:
+        return {**self.detector.stats(), "actions": self.actions.stats(), "paused": sorted(self.paused)}
+
+
+def setup(bot):
+    bot.add_cog(AntiRaid(bot))
@@ -3,8 +3,6 @@ import nextcord
 from nextcord.ext import commands
 from nextcord.ui import View, Select, Modal, TextInput
 from typing import Optional
-import json
-import os
 
 logger = logging.getLogger(__name__)
 
@@ -20,20 +18,9 @@ BOOSTER_COLOR_ROLES = {
     "Pink": 456789012345678901,
 }
 
-# --- Custom Role JSON Storage ---
-CUSTOM_ROLE_FILE = "custom_roles.json"
-
-def load_custom_roles():
-    if os.path.exists(CUSTOM_ROLE_FILE):
-        with open(CUSTOM_ROLE_FILE, "r") as f:
-            return json.load(f)
-    return {}
-
-def save_custom_roles(data):
-    with open(CUSTOM_ROLE_FILE, "w") as f:
-        json.dump(data, f, indent=4)
-
-custom_roles = load_custom_roles()
+# --- Custom Role Storage ---
+# member ID -> role ID, kept in the shared storage engine (scope 0 = not per guild)
+CUSTOM_ROLE_TABLE = "custom_roles"
 
 class BoosterColorSelect(Select):
     def __init__(self, member: nextcord.Member):
@@ -108,8 +95,7 @@ class CustomRoleModal(Modal):
             try:
                 await self.existing_role.edit(**role_kwargs)
                 # Update mapping
-                custom_roles[str(member.id)] = self.existing_role.id
-                save_custom_roles(custom_roles)
+                await self.bot.storage.upsert(CUSTOM_ROLE_TABLE, 0, member.id, self.existing_role.id)
                 await interaction.response.send_message(
                     f"Your custom role has been updated: {self.existing_role.mention}\n{note}",
                     ephemeral=True
@@ -122,8 +108,7 @@ class CustomRoleModal(Modal):
                 role = await guild.create_role(**role_kwargs)
                 await member.add_roles(role)
                 # Save mapping
-                custom_roles[str(member.id)] = role.id
-                save_custom_roles(custom_roles)
+                await self.bot.storage.upsert(CUSTOM_ROLE_TABLE, 0, member.id, role.id)
                 await interaction.response.send_message(
                     f"Your custom role has been created: {role.mention}\n{note}",
                     ephemeral=True
@@ -162,7 +147,7 @@ class BoosterMenuSelect(Select):
 
         elif self.values[0] == "custom":
             # Check if user already has a custom role using the mapping
-            role_id = custom_roles.get(str(member.id))
+            role_id = await self.bot.storage.get(CUSTOM_ROLE_TABLE, 0, member.id)
             existing_role = None
             if role_id:
                 existing_role = guild.get_role(role_id)
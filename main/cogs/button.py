@@ -120,7 +120,7 @@ class ButtonCog(commands.Cog):
                 await interaction.response.send_message("Invalid channel ID.", ephemeral=True)
                 return
 
-            message = await channel.fetch_message(int(message_id))
+            message = await self.bot.resolver.resolve(int(message_id), channel)
             if not message:
                 await interaction.response.send_message("Message not found.", ephemeral=True)
                 return
@@ -110,7 +110,7 @@ class EmbedCommands(commands.Cog):
             except ValueError as ve:
                 await ctx.send(str(ve))
                 return
-            msg = await ctx.channel.fetch_message(message_id_int)
+            msg = await self.bot.resolver.resolve(message_id_int, ctx.channel)
             if not msg.embeds:
                 await ctx.send("That message does not contain an embed.")
                 return
@@ -138,7 +138,7 @@ class EmbedCommands(commands.Cog):
             except ValueError as ve:
                 await ctx.send(str(ve))
                 return
-            msg = await ctx.channel.fetch_message(message_id_int)
+            msg = await self.bot.resolver.resolve(message_id_int, ctx.channel)
             if not msg.embeds:
                 await ctx.send("That message does not contain an embed.")
                 return
@@ -161,7 +161,7 @@ class EmbedCommands(commands.Cog):
             except ValueError as ve:
                 await ctx.send(str(ve))
                 return
-            msg = await ctx.channel.fetch_message(message_id_int)
+            msg = await self.bot.resolver.resolve(message_id_int, ctx.channel)
             if not msg.embeds:
                 await ctx.send("That message does not contain an embed.")
                 return
@@ -184,7 +184,7 @@ class EmbedCommands(commands.Cog):
             except ValueError as ve:
                 await ctx.send(str(ve))
                 return
-            msg = await ctx.channel.fetch_message(message_id_int)
+            msg = await self.bot.resolver.resolve(message_id_int, ctx.channel)
             if not msg.embeds:
                 await ctx.send("That message does not contain an embed.")
                 return
@@ -207,7 +207,7 @@ class EmbedCommands(commands.Cog):
             except ValueError as ve:
                 await ctx.send(str(ve))
                 return
-            msg = await ctx.channel.fetch_message(message_id_int)
+            msg = await self.bot.resolver.resolve(message_id_int, ctx.channel)
             if not msg.embeds:
                 await ctx.send("That message does not contain an embed.")
                 return
@@ -229,7 +229,7 @@ class EmbedCommands(commands.Cog):
             except ValueError as ve:
                 await ctx.send(str(ve))
                 return
-            msg = await ctx.channel.fetch_message(message_id_int)
+            msg = await self.bot.resolver.resolve(message_id_int, ctx.channel)
             if not msg.embeds:
                 await ctx.send("That message does not contain an embed.")
                 return
@@ -244,7 +244,7 @@ class EmbedCommands(commands.Cog):
     @embed.command()
     async def delete(self, ctx, message_id: int):
         try:
-            msgs = await ctx.channel.fetch_message(message_id)
+            msgs = await self.bot.resolver.resolve(message_id, ctx.channel)
             await msgs.delete()
             await ctx.send(f"embed `{message_id}` deleted")
         except nextcord.NotFound:
@@ -258,7 +258,7 @@ class EmbedCommands(commands.Cog):
     async def color(self, ctx, hex: str, message_id: str):
         try:
             message_id_int = self.parse_message_id(message_id)
-            msg = await ctx.channel.fetch_message(message_id_int)
+            msg = await self.bot.resolver.resolve(message_id_int, ctx.channel)
             if not msg.embeds:
                 await ctx.send("That message does not contain an embed.")
                 return
@@ -289,7 +289,7 @@ class EmbedCommands(commands.Cog):
     ):
         try:
             message_id_int = self.parse_message_id(message_id)
-            msg = await interaction.channel.fetch_message(message_id_int)
+            msg = await self.bot.resolver.resolve(message_id_int, interaction.channel)
             if not msg.embeds:
                 await interaction.response.send_message("That message does not contain an embed.", ephemeral=True)
                 return
@@ -341,7 +341,7 @@ class EmbedCommands(commands.Cog):
     ):
         try:
             message_id_int = self.parse_message_id(message_id)
-            msg = await interaction.channel.fetch_message(message_id_int)
+            msg = await self.bot.resolver.resolve(message_id_int, interaction.channel)
             if not msg.embeds:
                 await interaction.response.send_message("That message does not contain an embed.", ephemeral=True)
                 return
@@ -3,9 +3,6 @@ from nextcord.ext import commands
 from nextcord import Interaction, SlashOption
 import aiohttp
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
 
 # prefer TENOR_API_KEY env var, but allow TenorKey in .env for backwards compatibility
 TENOR_API_KEY = os.getenv("TENOR_API_KEY") or os.getenv("TenorKey")
@@ -1,30 +1,247 @@
 import nextcord
 from nextcord.ext import commands
 from nextcord import Interaction, Embed, SlashOption
+from nextcord.ui import View, Button
+import asyncio
 import json
+import logging
 import os
+import tempfile
+import time
+from datetime import datetime, timezone
 
-MESSAGE_COUNT_FILE = "message_counts.json"
+from core.backfill import Backfill
+from core.counters import CounterStore
+from core.export import PART_SIZE, day_columns, iter_rows, snapshot_counts, snapshot_days, write_export
+from core.persist import WriteBehind, atomic_write_bytes
+from core.ranking import RankIndex
+from core.rollups import ActivityTracker, DAY
+from core.sessions import SessionManager
 
-def load_message_counts():
-    if os.path.exists(MESSAGE_COUNT_FILE):
-        with open(MESSAGE_COUNT_FILE, "r") as f:
-            return json.load(f)
-    return {}
+logger = logging.getLogger("lunarbot.message")
 
-def save_message_counts(counts):
-    with open(MESSAGE_COUNT_FILE, "w") as f:
-        json.dump(counts, f, indent=4)
+# write-behind tuning: flush every N seconds, or sooner once this many increments are pending
+FLUSH_INTERVAL = float(os.getenv("MSG_FLUSH_INTERVAL", "10"))
+FLUSH_THRESHOLD = int(os.getenv("MSG_FLUSH_THRESHOLD", "500"))
+# counting sessions: cap, idle/absolute expiry, and the checkpoint that carries them across restarts
+SESSION_FILE = os.getenv("SESSION_FILE", "sessions.json")
+SESSION_MAX = int(os.getenv("SESSION_MAX", "50"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", str(12 * 3600)))
+SESSION_MAX_AGE = float(os.getenv("SESSION_MAX_AGE", str(7 * 86400)))
+SESSION_CHECKPOINT_INTERVAL = float(os.getenv("SESSION_CHECKPOINT_INTERVAL", "30"))
+SESSION_SWEEP_INTERVAL = 60
+# history backfill: channels scanned at once, and where resumable checkpoints live
+BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "4"))
+BACKFILL_DIR = os.getenv("BACKFILL_DIR", ".")
+# /export parts end on a row boundary, so they can overrun the part size by up to one row
+EXPORT_ROW_MARGIN = 64 * 1024
+LEADERBOARD_PAGE_SIZE = 10
+LEADERBOARD_THUMBNAIL = "https://cdn.discordapp.com/attachments/972365813468246036/1418687899297255556/chat_1.png?ex=68cf0791&is=68cdb611&hm=54bc7b42884df5aed417b3176756551bba850ea9d1d929b2e5ac49676e555d72&"
 
-message_counts = load_message_counts()
+def load_message_counts(storage):
+    return CounterStore.from_mapping(storage.load("message_counts"))
 
-# --- NEW: Session tracking ---
-active_sessions = {}  # channel_id: True/False
-session_counts = {}   # channel_id: {user_id: count}
+def load_sessions(manager):
+    if not os.path.exists(SESSION_FILE):
+        return
+    try:
+        with open(SESSION_FILE, "r", encoding="utf-8") as f:
+            manager.load_json(json.load(f))
+        logger.info(f"Restored {len(manager)} counting session(s) from {SESSION_FILE}")
+    except Exception as e:
+        logger.error(f"Failed to restore counting sessions: {e}")
+
+def leaderboard_embed(title, guild, index, page, user_id=None, count=0):
+    """Render one page of a RankIndex; members are int user IDs."""
+    pages = max(1, -(-len(index) // LEADERBOARD_PAGE_SIZE))
+    page = max(0, min(page, pages - 1))
+    start = page * LEADERBOARD_PAGE_SIZE
+    embed = Embed(title=title, color=nextcord.Color.green())
+    embed.set_thumbnail(url=LEADERBOARD_THUMBNAIL)
+    for i, (member_id, member_count) in enumerate(index.top(LEADERBOARD_PAGE_SIZE, offset=start), start=start + 1):
+        member = guild.get_member(member_id)
+        name = member.display_name if member else f"<@{member_id}>"
+        embed.add_field(name=f"{i} {name}", value=f"{member_count} messages", inline=False)
+    footer = f"Page {page + 1}/{pages}"
+    rank = index.rank(user_id, count) if user_id else None
+    if rank:
+        footer += f" • Your rank: #{rank} of {len(index)} ({count} messages)"
+    embed.set_footer(text=footer)
+    return embed
+
+HEATMAP_SHADES = " ░▒▓█"
+
+def render_heatmap(rows, now):
+    """Text heatmap of [day][hour] counts, one line per UTC day."""
+    peak = max((max(row) for row in rows), default=0)
+    first_day = int(now // DAY) - len(rows) + 1
+    lines = ["          0     6     12    18   "]
+    for d, row in enumerate(rows):
+        label = datetime.fromtimestamp((first_day + d) * DAY, tz=timezone.utc).strftime("%a %d")
+        cells = "".join(
+            HEATMAP_SHADES[0 if not peak or not c else 1 + (c * (len(HEATMAP_SHADES) - 2)) // peak] for c in row
+        )
+        lines.append(f"{label:<9} {cells} {sum(row)}")
+    return "\n".join(lines)
+
+class LeaderboardView(View):
+    def __init__(self, title, guild, index, user_id, count, timeout=120):
+        super().__init__(timeout=timeout)
+        self.title = title
+        self.guild = guild
+        self.index = index
+        self.user_id = user_id
+        self.count = count
+        self.page = 0
+
+    async def show(self, interaction: Interaction, delta: int):
+        pages = max(1, -(-len(self.index) // LEADERBOARD_PAGE_SIZE))
+        self.page = (self.page + delta) % pages
+        embed = leaderboard_embed(self.title, self.guild, self.index, self.page, self.user_id, self.count)
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @nextcord.ui.button(label="◀", style=nextcord.ButtonStyle.secondary)
+    async def previous(self, button: Button, interaction: Interaction):
+        await self.show(interaction, -1)
+
+    @nextcord.ui.button(label="▶", style=nextcord.ButtonStyle.secondary)
+    async def next(self, button: Button, interaction: Interaction):
+        await self.show(interaction, 1)
 
 class MessageCounter(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # after a hot reload, the previous instance's live objects are adopted without touching disk
+        previous = bot.snapshot.take_over("message_counter")
+        if previous is None:
+            self.message_counts = load_message_counts(bot.storage)
+            self.dirty = set()  # (guild_id, user_id) rows changed since the last flush
+            self.leaderboards = {}  # guild_id: RankIndex, built on first use then kept up to date
+            self.activity = ActivityTracker()  # bounded minute/hour/day rollups
+            self.sessions = SessionManager(SESSION_MAX, SESSION_IDLE_TTL, SESSION_MAX_AGE)
+            load_sessions(self.sessions)
+        else:
+            self.message_counts = previous["message_counts"]
+            self.dirty = previous["dirty"]
+            self.leaderboards = previous["leaderboards"]
+            self.activity = previous["activity"]
+            self.sessions = previous["sessions"]
+        # only the changed rows are written, from an executor thread
+        self.writer = WriteBehind(
+            "message_counts",
+            snapshot=self.take_dirty_rows,
+            write=lambda rows: bot.storage.write_many("message_counts", rows),
+            interval=FLUSH_INTERVAL,
+            threshold=FLUSH_THRESHOLD,
+            requeue=lambda rows: self.dirty.update((g, u) for g, u, _ in rows),
+        )
+        self.session_checkpoint = WriteBehind(
+            "sessions",
+            snapshot=lambda: json.dumps(self.sessions.to_json()).encode("utf-8"),
+            write=lambda data: atomic_write_bytes(SESSION_FILE, data),
+            interval=SESSION_CHECKPOINT_INTERVAL,
+            threshold=10**9,  # sessions are checkpointed on the interval only
+        )
+        if previous is not None:
+            # unwritten updates carry over; the old writers stop without writing
+            for old, new in ((previous["writer"], self.writer), (previous["session_checkpoint"], self.session_checkpoint)):
+                pending = old.detach()
+                if pending:
+                    new.mark_dirty(pending)
+        self.last_sweep = time.time()
+        self.backfills = {}  # guild_id: (Backfill, task) currently running
+        # counts and sessions are already on disk; the rollups only live in memory
+        bot.snapshot.register("activity", self.activity.to_json, self.activity.load_json)
+
+    def guild_leaderboard(self, guild_id: int) -> RankIndex:
+        index = self.leaderboards.get(guild_id)
+        if index is None:
+            index = self.leaderboards[guild_id] = RankIndex(self.message_counts.guild(guild_id).items())
+        return index
+
+    def take_dirty_rows(self):
+        dirty, self.dirty = self.dirty, set()
+        return [(g, u, self.message_counts.get(g, u)) for g, u in dirty]
+
+    def sweep_sessions(self, now: float):
+        if now - self.last_sweep < SESSION_SWEEP_INTERVAL:
+            return
+        self.last_sweep = now
+        for results in self.sessions.expire(now):
+            logger.info(f"Closed {results['reason']} counting session in channel {results['channel_id']}")
+            self.session_checkpoint.mark_dirty()
+
+    async def run_backfill(self, guild, concurrency: int = BACKFILL_CONCURRENCY, progress=None) -> str:
+        """Rebuild `guild`'s counts from history and merge them into the live counters."""
+        if guild.id in self.backfills:
+            job, _ = self.backfills[guild.id]
+            return f"A backfill of {guild.name} is already running: {job.status()}"
+
+        path = os.path.join(BACKFILL_DIR, f"backfill_{guild.id}.json")
+        job = Backfill(guild, self.message_counts.guild(guild.id), path, concurrency, progress)
+        self.backfills[guild.id] = (job, asyncio.current_task())
+        logger.info(f"Backfill of guild {guild.id} started ({concurrency} channels at a time)")
+        try:
+            await job.run()
+        finally:
+            self.backfills.pop(guild.id, None)
+
+        counters = self.message_counts.guild(guild.id)
+        changed = 0
+        for user_id, count in job.merged():
+            if counters.get(user_id) != count:
+                counters.set(user_id, count)
+                self.dirty.add((guild.id, user_id))
+                changed += 1
+        if changed:
+            self.writer.mark_dirty(changed)
+        self.leaderboards.pop(guild.id, None)  # rebuilt from the merged counts on next use
+        job.discard_checkpoint()
+
+        summary = f"Backfill of {guild.name} finished: {job.status()}, {changed} members updated"
+        if job.resumed:
+            summary += " (resumed from checkpoint)"
+        if job.skipped:
+            summary += f", {len(job.skipped)} channel(s) skipped"
+        logger.info(summary)
+        return summary
+
+    async def export_counts(self, directory: str, fmt: str = "csv", compress: bool = False, days: int = 0,
+                            guild_id: int = None, part_size: int = PART_SIZE) -> list:
+        """Stream counts (optionally with per-day buckets) to files in `directory`; returns their paths."""
+        now = time.time()
+        counts = snapshot_counts(self.message_counts, None if guild_id is None else [guild_id])
+        columns = day_columns(now, days) if days else ()
+        buckets = snapshot_days(self.activity, [g for g, _ in counts], now, days) if days else None
+        basename = f"message_counts-{guild_id or 'all'}-{int(now)}"
+        # the snapshot is private to this export, so the writing can happen off the loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, write_export, iter_rows(counts, buckets, columns), directory, basename, fmt, compress, part_size
+        )
+
+    def cog_unload(self):
+        self.bot.snapshot.unregister("activity")
+        # an interrupted backfill keeps its checkpoint and resumes next time
+        for _, task in self.backfills.values():
+            if task is not None:
+                task.cancel()
+        live = {
+            "message_counts": self.message_counts,
+            "dirty": self.dirty,
+            "leaderboards": self.leaderboards,
+            "activity": self.activity,
+            "sessions": self.sessions,
+            "writer": self.writer,
+            "session_checkpoint": self.session_checkpoint,
+        }
+        if not self.bot.snapshot.hand_over("message_counter", live, release=self.persist):
+            self.persist()
+
+    def persist(self):
+        # runs on bot.close(), or after a reload that nothing took the state over from
+        self.writer.close()
+        self.session_checkpoint.close()
 
     # === SESSION COMMANDS ===
     @nextcord.slash_command(name="msgs_count", description="Start or stop a message counting session")
@@ -36,43 +253,189 @@ class MessageCounter(commands.Cog):
         if not interaction.user.guild_permissions.manage_messages:
             await interaction.response.send_message("You need Manage Messages permission to start a session.", ephemeral=True)
             return
-        channel_id = str(interaction.channel.id)
-        active_sessions[channel_id] = True
-        session_counts[channel_id] = {}
-        await interaction.response.send_message("Message counting session started in this channel!", ephemeral=False)
+        evicted = self.sessions.evicted
+        self.sessions.start(interaction.channel.id, interaction.guild.id)
+        self.session_checkpoint.mark_dirty()
+        note = ""
+        if self.sessions.evicted != evicted:
+            note = f"\n(The least recently active session was closed to stay under the {SESSION_MAX}-session limit.)"
+        await interaction.response.send_message(f"Message counting session started in this channel!{note}", ephemeral=False)
 
     @msgs_count.subcommand(name="stop", description="Stop counting messages in this channel")
     async def msgs_count_stop(self, interaction: Interaction):
         if not interaction.user.guild_permissions.manage_messages:
             await interaction.response.send_message("You need Manage Messages permission to stop a session.", ephemeral=True)
             return
-        channel_id = str(interaction.channel.id)
-        active_sessions[channel_id] = False
-        await interaction.response.send_message("Message counting session stopped in this channel!", ephemeral=False)
+        results = self.sessions.close(interaction.channel.id, "stopped")
+        if results is None:
+            await interaction.response.send_message("There is no active session in this channel.", ephemeral=True)
+            return
+        self.session_checkpoint.mark_dirty()
+        await interaction.response.send_message(
+            f"Message counting session stopped in this channel! "
+            f"{results['total']} messages from {results['participants']} members. Use /msgs for the final results.",
+            ephemeral=False,
+        )
 
     # === SESSION LEADERBOARD ===
     @nextcord.slash_command(name="msgs", description="Show the leaderboard for the current session in this channel")
     async def msgs(self, interaction: Interaction):
-        channel_id = str(interaction.channel.id)
-        if not active_sessions.get(channel_id, False) and channel_id not in session_counts:
-            await interaction.response.send_message("No active or recent session in this channel.", ephemeral=True)
+        channel_id = interaction.channel.id
+        user_id = interaction.user.id
+        session = self.sessions.get(channel_id)
+        if session is None:
+            results = self.sessions.closed.get(channel_id)
+            if results is None:
+                await interaction.response.send_message("No active or recent session in this channel.", ephemeral=True)
+                return
+            if not results["top"]:
+                await interaction.response.send_message("No messages were counted in the last session.", ephemeral=True)
+                return
+            # final-results snapshot of the last closed session
+            top = dict(results["top"])
+            embed = leaderboard_embed(
+                "Session Results", interaction.guild, RankIndex(top.items()), 0, user_id, top.get(user_id, 0)
+            )
+            embed.description = f"{results['total']} messages from {results['participants']} members ({results['reason']})"
+            await interaction.response.send_message(embed=embed, ephemeral=False)
             return
-        counts = session_counts.get(channel_id, {})
-        if not counts:
+
+        if not session.total:
             await interaction.response.send_message("No messages have been counted in this session.", ephemeral=True)
             return
 
-        sorted_users = sorted(counts.items(), key=lambda x: x[1], reverse=True)
-        top_users = sorted_users[:10]
+        embed = leaderboard_embed(
+            "Session Message Leaderboard", interaction.guild, session.ranks, 0, user_id, session.counts.get(user_id)
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=False)
+
+    # === GUILD LEADERBOARD ===
+    @nextcord.slash_command(name="leaderboard", description="Show the all-time message leaderboard for this server")
+    async def leaderboard(
+        self,
+        interaction: Interaction,
+        page: int = SlashOption(description="Page to open", required=False, default=1, min_value=1),
+    ):
+        guild_id = interaction.guild.id
+        index = self.guild_leaderboard(guild_id)
+        if not len(index):
+            await interaction.response.send_message("No messages have been counted in this server yet.", ephemeral=True)
+            return
+
+        user_id = interaction.user.id
+        count = self.message_counts.get(guild_id, user_id)
+        view = LeaderboardView("Server Message Leaderboard", interaction.guild, index, user_id, count)
+        view.page = page - 1
+        embed = leaderboard_embed(view.title, interaction.guild, index, view.page, user_id, count)
+        await interaction.response.send_message(embed=embed, view=view)
 
-        embed = Embed(title="Session Message Leaderboard", color=nextcord.Color.green())
-        embed.set_thumbnail(url="https://cdn.discordapp.com/attachments/972365813468246036/1418687899297255556/chat_1.png?ex=68cf0791&is=68cdb611&hm=54bc7b42884df5aed417b3176756551bba850ea9d1d929b2e5ac49676e555d72&")
+    # === HISTORY BACKFILL ===
+    @nextcord.slash_command(name="backfill", description="Rebuild this server's message counts from channel history")
+    async def backfill(
+        self,
+        interaction: Interaction,
+        concurrency: int = SlashOption(description="Channels scanned at once", required=False, default=BACKFILL_CONCURRENCY, min_value=1, max_value=16),
+    ):
+        if not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message("You need Administrator permission to run a backfill.", ephemeral=True)
+            return
+        await interaction.response.send_message("Backfill started...", ephemeral=True)
+
+        async def progress(text):
+            await interaction.edit_original_message(content=f"Backfill running: {text}")
+
+        summary = await self.run_backfill(interaction.guild, concurrency, progress)
+        try:
+            await interaction.edit_original_message(content=summary)
+        except Exception as e:
+            # interaction tokens expire after 15 minutes; the summary is logged either way
+            logger.warning(f"Could not report backfill result: {e}")
+
+    # === EXPORT ===
+    @nextcord.slash_command(name="export", description="Export this server's message counts as files")
+    async def export(
+        self,
+        interaction: Interaction,
+        fmt: str = SlashOption(name="format", description="File format", choices=["csv", "ndjson"], required=False, default="csv"),
+        compress: bool = SlashOption(description="gzip the files", required=False, default=False),
+        days: int = SlashOption(description="Add per-day columns for the last N days", required=False, default=0, min_value=0, max_value=30),
+    ):
+        if not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message("You need Administrator permission to export data.", ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True)
+
+        # the upload limit covers all attachments of one message
+        upload_limit = interaction.guild.filesize_limit
+        part_size = min(PART_SIZE, upload_limit - EXPORT_ROW_MARGIN)
+        with tempfile.TemporaryDirectory() as directory:
+            paths = await self.export_counts(directory, fmt, compress, days, interaction.guild.id, part_size)
+            if not paths:
+                await interaction.followup.send("No messages have been counted in this server yet.", ephemeral=True)
+                return
+            # pack parts into messages: at most 10 attachments and upload_limit bytes each
+            groups, group, size = [], [], 0
+            for path in paths:
+                part = os.path.getsize(path)
+                if group and (len(group) == 10 or size + part > upload_limit):
+                    groups.append(group)
+                    group, size = [], 0
+                group.append(path)
+                size += part
+            groups.append(group)
+            sent = 0
+            for group in groups:
+                files = [nextcord.File(path) for path in group]
+                await interaction.followup.send(
+                    f"Message counts export, part {sent + 1}-{sent + len(files)} of {len(paths)}", files=files, ephemeral=True
+                )
+                sent += len(files)
+
+    # === ACTIVITY ===
+    @nextcord.slash_command(name="activity", description="Recent message activity")
+    async def activity(self, interaction: Interaction):
+        pass  # This is just the group parent
+
+    @activity.subcommand(name="top", description="Most active members over the last few days")
+    async def activity_top(
+        self,
+        interaction: Interaction,
+        days: int = SlashOption(description="How many days to look back", required=False, default=7, min_value=1, max_value=30),
+    ):
+        top_users = self.activity.top_users(interaction.guild.id, days, LEADERBOARD_PAGE_SIZE)
+        if not top_users:
+            await interaction.response.send_message("No activity recorded for that period.", ephemeral=True)
+            return
+
+        embed = Embed(title=f"Most Active - Last {days} Day{'s' if days != 1 else ''}", color=nextcord.Color.green())
+        embed.set_thumbnail(url=LEADERBOARD_THUMBNAIL)
         for i, (user_id, count) in enumerate(top_users, start=1):
-            user = interaction.guild.get_member(int(user_id))
-            name = user.display_name if user else f"<@{user_id}>"
+            member = interaction.guild.get_member(user_id)
+            name = member.display_name if member else f"<@{user_id}>"
             embed.add_field(name=f"{i} {name}", value=f"{count} messages", inline=False)
+        await interaction.response.send_message(embed=embed)
 
-        await interaction.response.send_message(embed=embed, ephemeral=False)
+    @activity.subcommand(name="heatmap", description="Messages per hour (UTC) over the last 7 days")
+    async def activity_heatmap(
+        self,
+        interaction: Interaction,
+        channel: nextcord.TextChannel = SlashOption(description="Channel (defaults to the whole server)", required=False, default=None),
+    ):
+        rollup = self.activity.channels.get(channel.id) if channel else self.activity.guilds.get(interaction.guild.id)
+        if rollup is None:
+            await interaction.response.send_message("No activity recorded yet.", ephemeral=True)
+            return
+
+        now = time.time()
+        rows = self.activity.heatmap(rollup, days=7, now=now)
+        last_hour = rollup.minutes.total(now, 60)
+        embed = Embed(
+            title=f"Activity Heatmap - {'#' + channel.name if channel else interaction.guild.name}",
+            description=f"```\n{render_heatmap(rows, now)}\n```",
+            color=nextcord.Color.green(),
+        )
+        embed.set_footer(text=f"{last_hour} messages in the last hour")
+        await interaction.response.send_message(embed=embed)
 
     # === MESSAGE LISTENER ===
     @commands.Cog.listener()
@@ -81,23 +444,20 @@ class MessageCounter(commands.Cog):
             return
 
         # --- Normal global counting ---
-        guild_id = str(message.guild.id)
-        user_id = str(message.author.id)
-        if guild_id not in message_counts:
-            message_counts[guild_id] = {}
-        if user_id not in message_counts[guild_id]:
-            message_counts[guild_id][user_id] = 0
-        message_counts[guild_id][user_id] += 1
-        save_message_counts(message_counts)
+        guild_id = message.guild.id
+        user_id = message.author.id
+        count = self.message_counts.add(guild_id, user_id)
+        self.dirty.add((guild_id, user_id))
+        self.writer.mark_dirty()
+        if guild_id in self.leaderboards:
+            self.leaderboards[guild_id].update(user_id, count - 1, count)
+        self.activity.record(guild_id, message.channel.id, user_id, message.created_at.timestamp())
 
         # --- Session counting ---
-        channel_id = str(message.channel.id)
-        if active_sessions.get(channel_id, False):
-            if channel_id not in session_counts:
-                session_counts[channel_id] = {}
-            if user_id not in session_counts[channel_id]:
-                session_counts[channel_id][user_id] = 0
-            session_counts[channel_id][user_id] += 1
+        now = time.time()
+        if self.sessions.record(message.channel.id, user_id, now) is not None:
+            self.session_checkpoint.mark_dirty()
+        self.sweep_sessions(now)
 
 def setup(bot):
     bot.add_cog(MessageCounter(bot))
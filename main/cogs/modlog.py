@@ -0,0 +1,324 @@
+import nextcord
+from nextcord import Interaction, SlashOption
+from nextcord.ext import commands
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+import zlib
+
+from core.deletelog import ContentCache
+from core.modindex import ModLogIndex
+from core.persist import RotatingLog, WriteBehind
+
+logger = logging.getLogger("lunarbot.modlog")
+
+# content remembered per guild so deletes can be logged with what was said
+DELETE_CACHE_BYTES = int(os.getenv("DELETE_CACHE_BYTES", str(4 * 1024 * 1024)))
+# deletes are appended in batches as gzip'd NDJSON and rotated by size
+DELETE_LOG = os.getenv("DELETE_LOG", "message_deletes.ndjson.gz")
+DELETE_LOG_MAX_BYTES = int(os.getenv("DELETE_LOG_MAX_BYTES", str(16 * 1024 * 1024)))
+DELETE_LOG_BACKUPS = int(os.getenv("DELETE_LOG_BACKUPS", "5"))
+DELETE_FLUSH_INTERVAL = float(os.getenv("DELETE_FLUSH_INTERVAL", "5"))
+DELETE_FLUSH_THRESHOLD = int(os.getenv("DELETE_FLUSH_THRESHOLD", "200"))
+# edits are logged (with the previous content) next to deletes
+MODLOG_EDITS = os.getenv("MODLOG_EDITS", "true").lower() == "true"
+# search index: one FTS partition per MODLOG_PARTITION_DAYS, merged every MODLOG_MAINTAIN_INTERVAL seconds
+MODLOG_PARTITION_DAYS = float(os.getenv("MODLOG_PARTITION_DAYS", "7"))
+MODLOG_RETENTION_DAYS = float(os.getenv("MODLOG_RETENTION_DAYS", "0"))  # 0 keeps everything
+MODLOG_MAINTAIN_INTERVAL = float(os.getenv("MODLOG_MAINTAIN_INTERVAL", "60"))
+
+
+class ModLog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        # after a hot reload the cache and unwritten records are adopted from the previous instance
+        previous = bot.snapshot.take_over("modlog")
+        if previous is None:
+            self.cache = ContentCache(DELETE_CACHE_BYTES)
+            self.pending = []  # delete records not yet written
+            self.log = RotatingLog(DELETE_LOG, DELETE_LOG_MAX_BYTES, DELETE_LOG_BACKUPS, compress=True)
+        else:
+            self.cache = previous["cache"]
+            self.pending = previous["pending"]
+            self.log = previous["log"]
+        self.index = ModLogIndex(bot.storage, MODLOG_PARTITION_DAYS * 86400, MODLOG_RETENTION_DAYS * 86400)
+        self.index_failures = 0
+        self.maintainer = None
+        if previous is None:
+            backlog = self.open_backlog()
+            self.backfilling = bot.loop.create_task(self.backfill(backlog)) if backlog else None
+        else:
+            self.backfilling = previous["backfilling"]
+        self.writer = WriteBehind(
+            "message_deletes",
+            snapshot=self.take_pending,
+            write=self.write_batch,
+            interval=DELETE_FLUSH_INTERVAL,
+            threshold=DELETE_FLUSH_THRESHOLD,
+            requeue=self.requeue,
+        )
+        if previous is not None:
+            pending = previous["writer"].detach()
+            if pending:
+                self.writer.mark_dirty(pending)
+        bot.snapshot.register("delete_cache", self.cache.to_json, self.cache.load_json)
+
+    def take_pending(self):
+        records, self.pending = self.pending, []
+        return records
+
+    def requeue(self, records):
+        # a failed write puts its records back ahead of anything newer
+        self.pending[:0] = records
+
+    def write_batch(self, records):
+        # runs in the executor; the log is the record of truth, so an index failure doesn't retry the batch
+        self.log.append_many(records)
+        try:
+            self.index.add_many(records)
+        except Exception as e:
+            self.index_failures += 1
+            logger.error(f"Failed to index {len(records)} modlog records: {e}")
+
+    # === BACKFILL ===
+    def open_backlog(self) -> list:
+        """Open the logs written before the index existed; [(path, file, size)], empty once indexed.
+
+        Files are opened and sized now, before this instance writes anything,
+        so the backfill reads exactly the old records even if a log rotates
+        while it runs.
+        """
+        if self.bot.storage.get_meta("modlog:indexed") is not None:
+            return []
+        backlog = []
+        for path in [f"{DELETE_LOG}.{i}" for i in range(DELETE_LOG_BACKUPS, 0, -1)] + [DELETE_LOG]:
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                continue
+            backlog.append((path, f, os.fstat(f.fileno()).st_size))
+        if not backlog:
+            self.bot.storage.set_meta("modlog:indexed", str(time.time()))
+        return backlog
+
+    async def backfill(self, backlog):
+        """Index the old logs in the background; records are unique, so an interrupted run just starts over."""
+        loop = asyncio.get_running_loop()
+        total = 0
+        try:
+            for path, f, size in backlog:
+                try:
+                    records = await loop.run_in_executor(None, read_backlog, f, size)
+                except (OSError, EOFError, ValueError, zlib.error) as e:
+                    logger.error(f"Skipped {path} while indexing the modlog: {e}")
+                    continue
+                for i in range(0, len(records), 1000):
+                    total += await self.index.add(records[i:i + 1000])
+            await loop.run_in_executor(None, self.bot.storage.set_meta, "modlog:indexed", str(time.time()))
+            logger.info(f"Indexed {total} previously logged modlog records")
+        finally:
+            for _, f, _ in backlog:
+                f.close()
+
+    @property
+    def backfill_running(self) -> bool:
+        return self.backfilling is not None and not self.backfilling.done()
+
+    def queue(self, records):
+        self.pending.extend(records)
+        self.writer.mark_dirty(len(records))
+        if self.maintainer is None or self.maintainer.done():
+            self.maintainer = asyncio.create_task(self.maintain())
+
+    async def maintain(self):
+        while True:
+            await asyncio.sleep(MODLOG_MAINTAIN_INTERVAL)
+            try:
+                await self.index.maintain()
+            except Exception as e:
+                logger.error(f"Modlog index maintenance failed: {e}")
+
+    def cog_unload(self):
+        if self.maintainer is not None:
+            self.maintainer.cancel()
+        self.bot.snapshot.unregister("delete_cache")
+        live = {
+            "cache": self.cache,
+            "pending": self.pending,
+            "log": self.log,
+            "writer": self.writer,
+            "backfilling": self.backfilling,
+        }
+        if not self.bot.snapshot.hand_over("modlog", live, release=self.persist):
+            self.persist()
+
+    def persist(self):
+        # runs on bot.close(), or after a reload that nothing took the state over from
+        if self.backfilling is not None:
+            self.backfilling.cancel()  # resumes from the start next time
+        self.writer.close()
+        self.log.close()
+
+    # === CAPTURE ===
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        if message.guild is None or (not message.content and not message.attachments):
+            return
+        self.cache.put(
+            message.guild.id, message.id, message.channel.id, message.author.id,
+            message.created_at.timestamp(), message.content, [a.url for a in message.attachments],
+        )
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload):
+        # the raw event also covers messages that fell out of nextcord's own cache
+        if payload.guild_id is None or "content" not in payload.data:
+            return
+        content = payload.data["content"]
+        cached = self.cache.edit(payload.guild_id, payload.message_id, content)
+        if not MODLOG_EDITS or cached is None or cached[2] == content:
+            return  # unknown message, or an embed-only update
+        channel_id, author_id, before = cached
+        self.queue([{
+            "ts": time.time(),
+            "kind": "edit",
+            "guild_id": payload.guild_id,
+            "channel_id": channel_id,
+            "message_id": payload.message_id,
+            "author_id": author_id,
+            "content": content,
+            "before": before,
+        }])
+
+    # === DELETES ===
+    def build_record(self, guild_id: int, channel_id: int, message_id: int, cached_message=None, bulk: bool = False):
+        record = {
+            "ts": time.time(),
+            "kind": "delete",
+            "guild_id": guild_id,
+            "channel_id": channel_id,
+            "message_id": message_id,
+            "bulk": bulk,
+        }
+        found = self.cache.pop(guild_id, message_id)
+        if found is None and cached_message is not None:
+            found = {
+                "channel_id": channel_id,
+                "author_id": cached_message.author.id,
+                "created": cached_message.created_at.timestamp(),
+                "content": cached_message.content,
+                "attachments": [a.url for a in cached_message.attachments],
+            }
+        record["known"] = found is not None
+        if found is not None:
+            record.update(found)
+        return record
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        if payload.guild_id is None:
+            return
+        self.queue([self.build_record(payload.guild_id, payload.channel_id, payload.message_id, payload.cached_message)])
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload):
+        # a purge arrives as one event and is queued as one batch
+        if payload.guild_id is None:
+            return
+        cached = {m.id: m for m in payload.cached_messages}
+        records = [
+            self.build_record(payload.guild_id, payload.channel_id, message_id, cached.get(message_id), bulk=True)
+            for message_id in sorted(payload.message_ids)
+        ]
+        self.queue(records)
+        await self.writer.flush()  # one write for the whole purge
+        known = sum(record["known"] for record in records)
+        logger.info(f"Logged bulk delete of {len(records)} messages in {payload.channel_id} ({known} with content)")
+
+    # === SEARCH ===
+    @nextcord.slash_command(
+        name="modlog",
+        description="Moderation log",
+        default_member_permissions=nextcord.Permissions(manage_messages=True),
+    )
+    async def modlog(self, interaction: Interaction):
+        pass
+
+    @modlog.subcommand(name="search", description="Search deleted and edited messages")
+    async def search(
+        self,
+        interaction: Interaction,
+        text: str = SlashOption(description="Words that must all appear (word* matches a prefix)", required=False, default=""),
+        user: nextcord.User = SlashOption(description="Author", required=False, default=None),
+        channel: nextcord.abc.GuildChannel = SlashOption(description="Channel", required=False, default=None),
+        hours: float = SlashOption(description="Only the last N hours", required=False, default=None, min_value=0),
+        kind: str = SlashOption(description="Deletes or edits only", required=False, default=None,
+                                choices={"Deleted": "delete", "Edited": "edit"}),
+        limit: int = SlashOption(description="Results to show", required=False, default=10, min_value=1, max_value=25),
+    ):
+        if interaction.guild is None:
+            return await interaction.response.send_message("This command only works in a server.", ephemeral=True)
+        await interaction.response.defer(ephemeral=True)
+        await self.writer.flush()  # include what is still queued
+        found = await self.index.search(
+            interaction.guild.id, text,
+            user_id=user.id if user else None,
+            channel_id=channel.id if channel else None,
+            since=time.time() - hours * 3600 if hours else None,
+            kind=kind,
+            limit=limit,
+        )
+        lines = [describe(record) for record in found]
+        description, size = [], 0
+        for line in lines:
+            size += len(line) + 1
+            if size > 4000:
+                break
+            description.append(line)
+        embed = nextcord.Embed(
+            title=f"Modlog search: {len(found)} result{'s' if len(found) != 1 else ''}",
+            description="\n".join(description) or "Nothing found.",
+            color=nextcord.Color.blurple(),
+        )
+        embed.set_footer(text=f"{self.index.last_search_ms:.1f} ms" + (
+            " · still indexing older records, results may be incomplete" if self.backfill_running else ""))
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
+    def stats(self) -> dict:
+        return {
+            "cache": self.cache.stats(),
+            "writer": self.writer.stats(),
+            "logged": self.log.written,
+            "batches": self.log.batches,
+            "rotations": self.log.rotations,
+            "index_failures": self.index_failures,
+            "backfilling": self.backfill_running,
+        }
+
+
+def read_backlog(f, size: int) -> list:
+    # concatenated gzip members (one per batch) decompress as one stream
+    data = gzip.decompress(f.read(size))
+    return [json.loads(line) for line in data.decode("utf-8").splitlines() if line.strip()]
+
+
+def describe(record: dict, width: int = 200) -> str:
+    """One Discord-formatted line for a logged delete or edit."""
+    content = (record.get("content") or "").replace("\n", " ")
+    if len(content) > width:
+        content = content[:width - 1] + "…"
+    where = f"<@{record['author_id']}> in <#{record['channel_id']}>" if record.get("known", True) else \
+        f"unknown message in <#{record['channel_id']}>"
+    if record.get("kind") == "edit":
+        before = record.get("before", "").replace("\n", " ")
+        if len(before) > width // 2:
+            before = before[:width // 2 - 1] + "…"
+        return f"<t:{int(record['ts'])}:R> ✏️ {where}: ~~{before}~~ → {content}"
+    return f"<t:{int(record['ts'])}:R> 🗑️ {where}: {content or '*no text*'}"
+
+
+def setup(bot):
+    bot.add_cog(ModLog(bot))
@@ -1,6 +1,8 @@
 import nextcord
 from nextcord.ext import commands
-import os, time, logging
+import time, logging
+
+from core.reload import describe
 
 logger = logging.getLogger("lunarbot")
 
@@ -29,7 +31,14 @@ class UtilityCommands(commands.Cog):
     @commands.command(name="stats")
     async def stats(self, ctx):
         uptime = int(time.time() - self.start_time)
-        await ctx.send(f"Bot Uptime: {uptime} seconds")
+        lines = [f"Bot Uptime: {uptime} seconds"]
+        counter = self.bot.get_cog("MessageCounter")
+        if counter:
+            w = counter.writer.stats()
+            lines.append(f"Message count writes: {w['writes']} ({w['coalesced']} coalesced, {w['pending']} pending)")
+        r = self.bot.resolver.stats()
+        lines.append(f"Message cache: {r['hits']} hits / {r['misses']} misses (hit ratio {r['hit_ratio']}), {r['messages']} cached")
+        await ctx.send("\n".join(lines))
 
     # link
     @commands.command(name="link")
@@ -140,45 +149,18 @@ class UtilityCommands(commands.Cog):
             return await ctx.send("You are not authorized to use this command.")
 
         embed = nextcord.Embed(
-            title="Refreshing all cogs...",
-            description="Starting refresh...",
+            title="Refreshing cogs...",
+            description="Reloading changed cogs...",
             color=0x00FF00
         )
         msg = await ctx.send(embed=embed)
 
-        COGS_DIR = os.path.join(os.path.dirname(__file__), "../cogs")
-        reloaded = []
-        failed = []
-
-        for fn in os.listdir(COGS_DIR):
-            if fn.endswith(".py") and not fn.startswith("_"):
-                cog_name = f"cogs.{fn[:-3]}"
-                try:
-                    self.bot.reload_extension(cog_name)
-                    reloaded.append(cog_name)
-                    logger.info(f"Reloaded {cog_name} via command")
-                    embed.description = f"Reloaded: {', '.join(reloaded)}"
-                except Exception as e:
-                    failed.append((cog_name, str(e)))
-                    logger.error(f"Failed to reload {cog_name}: {e}")
-                    embed.description = (
-                        f"Reloaded: {', '.join(reloaded)}\n"
-                        f"Failed: {', '.join(f'{cog} ({err})' for cog, err in failed)}"
-                    )
-
-                await msg.edit(embed=embed)  # update embed after each cog
+        # this cog may itself be reloaded below; the result still comes back here
+        result = await self.bot.reloader.reload()
 
         embed.title = "Refresh complete"
-        if failed:
-            embed.color = 0xFF0000
-            embed.description = (
-                f"Reloaded: {', '.join(reloaded)}\n"
-                f"Failed: {', '.join(f'{cog} ({err})' for cog, err in failed)}"
-            )
-        else:
-            embed.color = 0x00FF00
-            embed.description = f"Reloaded all cogs: {', '.join(reloaded)}"
-
+        embed.color = 0xFF0000 if result["failed"] else 0x00FF00
+        embed.description = describe(result)
         await msg.edit(embed=embed, delete_after=20)
 
 
@@ -0,0 +1,155 @@
+"""Guild allowlist enforced at the gateway.
+
+The gateway hands every event payload to `ConnectionState.parsers[EVENT]`,
+and only the parser builds models (`Message`, `Member`, ...) and dispatches
+to listeners. `attach()` wraps those parsers: a payload whose `guild_id` is
+not allowed is counted and dropped on the spot, so no model is built, no
+cog listener runs and nothing is written for that guild.
+
+Structural events (channels, roles, threads, guild updates) still pass, so
+the cache stays correct if a guild is allowed later. Unlisted guilds are
+never chunked, and their GUILD_CREATE is stripped of members and presences,
+so none of their members are cached. With `leave`, the bot leaves them
+when they become available or join.
+
+An empty allowlist allows every guild.
+"""
+
+import asyncio
+import json
+import logging
+import os
+
+from core.persist import atomic_write_json
+
+logger = logging.getLogger("lunarbot.allowlist")
+
+# payloads that keep the cache consistent; never dropped
+STRUCTURAL = {
+    "GUILD_UPDATE", "GUILD_ROLE_CREATE", "GUILD_ROLE_UPDATE", "GUILD_ROLE_DELETE",
+    "GUILD_EMOJIS_UPDATE", "GUILD_STICKERS_UPDATE", "GUILD_MEMBERS_CHUNK",
+    "CHANNEL_CREATE", "CHANNEL_UPDATE", "CHANNEL_DELETE", "CHANNEL_PINS_UPDATE",
+    "THREAD_CREATE", "THREAD_UPDATE", "THREAD_DELETE", "THREAD_LIST_SYNC",
+}
+
+
+class GuildAllowlist:
+    def __init__(self, bot, allowed=(), leave: bool = False, path: str = None):
+        self.bot = bot
+        self.leave = leave
+        self.path = path  # JSON list of guild IDs; overrides `allowed` when present
+        self.allowed = set()
+        self._keys = frozenset()  # gateway payloads carry IDs as strings
+        self.dropped = {}         # event: payloads dropped
+        self.stripped = 0         # GUILD_CREATE payloads sent without members
+        self.left = 0
+        self.set(allowed)
+        if path and os.path.exists(path):
+            self.reload()
+
+    def allows(self, guild_id) -> bool:
+        return not self._keys or str(guild_id) in self._keys
+
+    def set(self, guild_ids):
+        self.allowed = {int(g) for g in guild_ids}
+        self._keys = frozenset(str(g) for g in self.allowed)
+
+    # --- gateway ---
+    def attach(self):
+        state = self.bot._connection
+        for event, parse in state.parsers.items():
+            if event == "GUILD_CREATE":
+                state.parsers[event] = self._guild_create(parse)
+            elif event not in STRUCTURAL:
+                state.parsers[event] = self._gate(event, parse)
+        needs_chunking = state._guild_needs_chunking
+        state._guild_needs_chunking = lambda guild: self.allows(guild.id) and needs_chunking(guild)
+        self.bot.add_listener(self.on_guild_available, "on_guild_available")
+        self.bot.add_listener(self.on_guild_join, "on_guild_join")
+
+    def _gate(self, event: str, parse):
+        def gated(data):
+            guild_id = data.get("guild_id") if type(data) is dict else None
+            if guild_id is not None and self._keys and guild_id not in self._keys:
+                self.dropped[event] = self.dropped.get(event, 0) + 1
+                return
+            parse(data)
+        return gated
+
+    def _guild_create(self, parse):
+        def gated(data):
+            if not self.allows(data.get("id")):
+                # the guild itself is kept (to leave it, or allow it later), its members are not
+                data.pop("members", None)
+                data.pop("presences", None)
+                self.stripped += 1
+            parse(data)
+        return gated
+
+    # --- leaving ---
+    async def on_guild_available(self, guild):
+        await self.check(guild)
+
+    async def on_guild_join(self, guild):
+        await self.check(guild)
+
+    async def check(self, guild) -> bool:
+        """Leave `guild` if it is not allowed and leaving is on; True if it was left."""
+        if self.allows(guild.id) or not self.leave:
+            return False
+        try:
+            await guild.leave()
+        except Exception as e:
+            logger.error(f"Failed to leave unlisted guild {guild.name} ({guild.id}): {e}")
+            return False
+        self.left += 1
+        logger.warning(f"Left unlisted guild {guild.name} ({guild.id})")
+        return True
+
+    async def sweep(self) -> int:
+        """Apply the current list to every joined guild: leave unlisted ones, chunk newly allowed ones."""
+        left = 0
+        for guild in list(self.bot.guilds):
+            if not self.allows(guild.id):
+                left += await self.check(guild)
+            elif self.bot._connection._guild_needs_chunking(guild):
+                asyncio.create_task(self.chunk(guild))  # its members were never cached
+        return left
+
+    async def chunk(self, guild):
+        try:
+            await guild.chunk()
+        except Exception as e:
+            logger.error(f"Failed to chunk newly allowed guild {guild.id}: {e}")
+
+    # --- hot reload ---
+    def reload(self):
+        """Re-read the list from `path`."""
+        with open(self.path, "r", encoding="utf-8") as f:
+            self.set(json.load(f))
+        logger.info(f"Guild allowlist loaded from {self.path}: {len(self.allowed)} guilds")
+
+    def save(self):
+        if self.path:
+            atomic_write_json(self.path, sorted(self.allowed))
+
+    def add(self, guild_id: int):
+        self.set(self.allowed | {guild_id})
+        self.save()
+
+    def remove(self, guild_id: int) -> bool:
+        if guild_id not in self.allowed:
+            return False
+        self.set(self.allowed - {guild_id})
+        self.save()
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "allowed": sorted(self.allowed),
+            "leave": self.leave,
+            "dropped": dict(sorted(self.dropped.items(), key=lambda kv: kv[1], reverse=True)),
+            "dropped_total": sum(self.dropped.values()),
+            "stripped": self.stripped,
+            "left": self.left,
+        }
@@ -0,0 +1,176 @@
+"""Rebuild message counts from channel history.
+
+Channels are scanned newest-to-oldest, several at a time under a semaphore.
+Everything older than the scan's starting snowflake (the cutoff) is counted
+from history; everything newer is left to the live counter. The checkpoint
+records each channel's cursor together with the partial counts, so an
+interrupted scan resumes where it stopped without counting anything twice.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+
+import nextcord
+
+from core.counters import GuildCounters
+from core.persist import WriteBehind, atomic_write_bytes
+
+logger = logging.getLogger("lunarbot.backfill")
+
+DISCORD_EPOCH = 1420070400000
+
+
+def snowflake_at(ts: float) -> int:
+    return (int(ts * 1000) - DISCORD_EPOCH) << 22
+
+
+class Backfill:
+    def __init__(self, guild, live: GuildCounters, checkpoint_path: str, concurrency: int = 4,
+                 progress=None, progress_interval: float = 10.0):
+        self.guild = guild
+        self.live = live
+        self.checkpoint_path = checkpoint_path
+        self.concurrency = max(1, concurrency)
+        self.progress = progress  # async callable(text), optional
+        self.progress_interval = progress_interval
+
+        self.cutoff = snowflake_at(time.time())
+        self.baseline = live.copy()     # live counts when the scan started
+        self.counts = GuildCounters()   # counts rebuilt from history
+        self.cursors = {}               # channel_id: oldest message id scanned so far
+        self.done = set()               # channel_ids scanned to the beginning
+        self.skipped = []               # channels we cannot read
+        self.scanned = 0
+        self.resumed = False
+        self.started = None
+        self.elapsed = 0.0
+
+        self.checkpoint = WriteBehind(
+            f"backfill:{guild.id}",
+            snapshot=lambda: json.dumps(self.to_json()).encode("utf-8"),
+            write=lambda data: atomic_write_bytes(self.checkpoint_path, data),
+            interval=5.0,
+            threshold=10**9,
+        )
+        self.load_checkpoint()
+
+    # --- checkpoint ---
+    def to_json(self) -> dict:
+        return {
+            "guild_id": self.guild.id,
+            "cutoff": self.cutoff,
+            "scanned": self.scanned,
+            "elapsed": self.elapsed,
+            "cursors": self.cursors,
+            "done": list(self.done),
+            "counts": list(self.counts.items()),
+            "baseline": list(self.baseline.items()),
+        }
+
+    def load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("guild_id") != self.guild.id:
+            return
+        self.cutoff = data["cutoff"]
+        self.scanned = data["scanned"]
+        self.elapsed = data.get("elapsed", 0.0)
+        self.cursors = {int(k): v for k, v in data["cursors"].items()}
+        self.done = set(data["done"])
+        self.counts = GuildCounters(data["counts"], capacity=len(data["counts"]))
+        self.baseline = GuildCounters(data["baseline"], capacity=len(data["baseline"]))
+        self.resumed = True
+        logger.info(f"Resuming backfill of guild {self.guild.id}: {self.scanned} messages, {len(self.done)} channels done")
+
+    # --- scanning ---
+    @property
+    def rate(self) -> float:
+        elapsed = self.elapsed + (time.monotonic() - self.started if self.started else 0)
+        return self.scanned / elapsed if elapsed else 0.0
+
+    def status(self) -> str:
+        channels = len(self.guild.text_channels)
+        return (
+            f"{self.scanned:,} messages, {len(self.done)}/{channels} channels, "
+            f"{self.rate:,.0f} msg/s"
+        )
+
+    async def scan_channel(self, channel, semaphore):
+        async with semaphore:
+            before = nextcord.Object(id=self.cursors.get(channel.id, self.cutoff))
+            # nextcord's HTTP client reads the X-RateLimit-* headers and waits
+            # out each route's bucket (and any 429) before the next page
+            async for message in channel.history(limit=None, before=before):
+                if not message.author.bot:
+                    self.counts.add(message.author.id)
+                self.scanned += 1
+                self.cursors[channel.id] = message.id
+                if self.scanned % 100 == 0:
+                    self.checkpoint.mark_dirty()
+            self.done.add(channel.id)
+            self.checkpoint.mark_dirty()
+
+    async def report_progress(self):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            try:
+                await self.progress(self.status())
+            except Exception as e:
+                logger.warning(f"Backfill progress report failed: {e}")
+
+    async def run(self):
+        me = self.guild.me
+        channels = []
+        for channel in self.guild.text_channels:
+            if channel.id in self.done:
+                continue
+            perms = channel.permissions_for(me)
+            if not (perms.read_messages and perms.read_message_history):
+                self.skipped.append(channel.id)
+                continue
+            channels.append(channel)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        reporter = asyncio.create_task(self.report_progress()) if self.progress else None
+        self.started = time.monotonic()
+        try:
+            results = await asyncio.gather(
+                *(self.scan_channel(channel, semaphore) for channel in channels), return_exceptions=True
+            )
+        finally:
+            if reporter:
+                reporter.cancel()
+            self.elapsed += time.monotonic() - self.started
+            self.started = None
+            self.checkpoint.close()
+
+        for channel, result in zip(channels, results):
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+            if isinstance(result, Exception):
+                self.skipped.append(channel.id)
+                logger.warning(f"Backfill skipped channel {channel.id}: {result}")
+
+    def merged(self):
+        """(user_id, count) pairs for the live store.
+
+        History supplies everything before the cutoff; the live counter's
+        growth since the scan started supplies everything after it. Counts the
+        live store held for pre-cutoff messages are replaced, not added.
+        """
+        users = {user_id for user_id, _ in self.counts.items()}
+        users.update(user_id for user_id, _ in self.live.items())
+        for user_id in users:
+            since = self.live.get(user_id) - self.baseline.get(user_id)
+            yield user_id, self.counts.get(user_id) + max(0, since)
+
+    def discard_checkpoint(self):
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,126 @@
+"""Startup phase timing.
+
+`BootProfile` records how long each boot phase takes, so a cold-start
+regression shows up as one row growing. With `--profile-startup`, an import
+hook also times every module import (cumulative and self time, like
+`python -X importtime`), and the full report is printed at first READY.
+
+Only the standard library is used here: this module is imported before
+anything it is meant to measure.
+"""
+
+import importlib.abc
+import sys
+import time
+from contextlib import contextmanager
+
+
+class _TimedLoader(importlib.abc.Loader):
+    def __init__(self, loader, timer, name):
+        self.loader = loader
+        self.timer = timer
+        self.name = name
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        self.timer.enter(self.name)
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.timer.leave(self.name)
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+class ImportTimer(importlib.abc.MetaPathFinder):
+    """Times module execution; nested imports are subtracted to get self time."""
+
+    def __init__(self):
+        self.stack = []     # [name, started, child time]
+        self.times = {}     # name: (cumulative, self)
+        self._finding = set()
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname in self._finding:
+            return None
+        self._finding.add(fullname)
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                        spec.loader = _TimedLoader(spec.loader, self, fullname)
+                    return spec
+            return None
+        finally:
+            self._finding.discard(fullname)
+
+    def enter(self, name):
+        self.stack.append([name, time.perf_counter(), 0.0])
+
+    def leave(self, name):
+        _, started, children = self.stack.pop()
+        total = time.perf_counter() - started
+        self.times[name] = (total, total - children)
+        if self.stack:
+            self.stack[-1][2] += total
+
+    def top(self, n: int = 20, key: int = 0):
+        return sorted(self.times.items(), key=lambda item: item[1][key], reverse=True)[:n]
+
+
+class BootProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []        # (name, seconds)
+        self.marks = {"start": self.started}  # name: perf_counter at the mark
+        self.imports = None
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def mark(self, name: str, since: str = None):
+        """Record a point in time; with `since`, also record the phase from that mark."""
+        now = time.perf_counter()
+        self.marks[name] = now
+        if since is not None and since in self.marks:
+            self.phases.append((name, now - self.marks[since]))
+
+    def profile_imports(self):
+        self.imports = ImportTimer()
+        self.imports.install()
+
+    def summary(self) -> str:
+        return ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases)
+
+    def report(self, top: int = 20) -> str:
+        lines = [f"{'phase':<24}{'ms':>10}"]
+        for name, seconds in self.phases:
+            lines.append(f"{name:<24}{seconds * 1000:>10.1f}")
+        lines.append(f"{'total (to now)':<24}{self.elapsed() * 1000:>10.1f}")
+        if self.imports is not None:
+            lines.append("")
+            lines.append(f"{'import':<40}{'cumulative ms':>15}{'self ms':>10}")
+            for name, (cumulative, own) in self.imports.top(top):
+                lines.append(f"{name:<40}{cumulative * 1000:>15.1f}{own * 1000:>10.1f}")
+        return "\n".join(lines)
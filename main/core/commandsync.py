@@ -0,0 +1,118 @@
+"""Application-command syncs that only run when the command tree changed.
+
+Every sync scope (global, and each guild with guild-scoped commands) gets a
+fingerprint: a hash of the sorted command payloads the bot would push there.
+Fingerprints from the last successful sync are kept on disk, so a restart or
+gateway reconnect with an unchanged tree skips the rate-limited sync
+endpoints entirely, and a changed tree only pushes the scopes that differ.
+Commands whose IDs were not associated by a skipped sync are still matched
+on first use by nextcord's lazy command loading.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+
+from core.persist import atomic_write_json
+
+logger = logging.getLogger("lunarbot.commandsync")
+
+GLOBAL = "global"
+
+
+def command_payloads(bot) -> dict:
+    """{scope: [payload, ...]} for every application command in the connection state."""
+    scopes = {}
+    for command in bot.get_all_application_commands():
+        if command.is_global:
+            scopes.setdefault(GLOBAL, []).append(command.get_payload(None))
+        for guild_id in command.guild_ids_to_rollout:
+            scopes.setdefault(str(guild_id), []).append(command.get_payload(guild_id))
+    return scopes
+
+
+def fingerprint(payloads) -> str:
+    ordered = sorted(payloads, key=lambda p: (p.get("type", 0), p["name"]))
+    data = json.dumps(ordered, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class CommandSync:
+    def __init__(self, bot, path: str):
+        self.bot = bot
+        self.path = path
+        self.state = {"application_id": None, "fingerprints": {}, "scope_ms": None}
+        self.synced_scopes = 0
+        self.skipped_scopes = 0
+        self.time_spent = 0.0   # seconds spent syncing
+        self.time_saved = 0.0   # estimated seconds saved by skipping
+        self.last = None
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.state.update(json.load(f))
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable command sync state {path}: {e}")
+
+    async def sync(self, force: bool = False) -> dict:
+        """Push the scopes whose fingerprint changed (or all of them if `force`)."""
+        started = time.perf_counter()
+        current = {scope: fingerprint(p) for scope, p in command_payloads(self.bot).items()}
+        known = self.state["fingerprints"] if self.state["application_id"] == self.bot.application_id else {}
+        # scopes that lost all their commands still need a sync so Discord drops them
+        scopes = set(current) | set(known)
+        stale = sorted(s for s in scopes if force or current.get(s) != known.get(s))
+
+        synced, failed = [], []
+        for scope in stale:
+            scope_started = time.perf_counter()
+            try:
+                await self.bot.sync_application_commands(guild_id=None if scope == GLOBAL else int(scope))
+            except Exception as e:
+                failed.append((scope, str(e)))
+                logger.error(f"Failed to sync application commands for {scope}: {e}")
+                continue
+            synced.append(scope)
+            self.observe(time.perf_counter() - scope_started)
+
+        fingerprints = dict(current)
+        # a failed scope keeps its old fingerprint (or none), so the next sync retries it
+        for scope, _ in failed:
+            fingerprints.pop(scope, None)
+            if scope in known:
+                fingerprints[scope] = known[scope]
+        self.state["application_id"] = self.bot.application_id
+        self.state["fingerprints"] = fingerprints
+        atomic_write_json(self.path, self.state)
+
+        skipped = len(scopes) - len(stale)
+        elapsed = time.perf_counter() - started
+        saved = skipped * (self.state["scope_ms"] or 0) / 1000
+        self.synced_scopes += len(synced)
+        self.skipped_scopes += skipped
+        self.time_spent += elapsed
+        self.time_saved += saved
+        self.last = {"synced": synced, "skipped": skipped, "failed": failed, "elapsed": elapsed, "saved": saved}
+        logger.info(
+            f"Command sync: {len(synced)} scope(s) synced, {skipped} unchanged and skipped, "
+            f"{len(failed)} failed in {elapsed * 1000:.0f} ms (saved ~{saved * 1000:.0f} ms)"
+        )
+        return self.last
+
+    def observe(self, seconds: float):
+        """Fold one scope's sync time into the running estimate used for 'time saved'."""
+        ms = seconds * 1000
+        previous = self.state["scope_ms"]
+        self.state["scope_ms"] = ms if previous is None else previous * 0.8 + ms * 0.2
+
+    def stats(self) -> dict:
+        return {
+            "scopes": len(self.state["fingerprints"]),
+            "synced_scopes": self.synced_scopes,
+            "skipped_scopes": self.skipped_scopes,
+            "spent_ms": round(self.time_spent * 1000),
+            "saved_ms": round(self.time_saved * 1000),
+            "scope_ms": round(self.state["scope_ms"] or 0),
+        }
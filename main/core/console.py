@@ -0,0 +1,290 @@
+"""Operator console served inside the bot's event loop.
+
+Commands are registered on a `Console` and run as coroutines on the loop,
+so there is no thread hop per command. The console listens on a local Unix
+domain socket (any number of concurrent clients) and, optionally, on the
+process's stdin.
+
+Protocol, one line per request:
+
+- a plain text line runs that command; output comes back as text lines
+  prefixed with the bot's name, as on the old terminal
+- a JSON line `{"id": 1, "cmd": "sync stats"}` gets one JSON response
+  `{"id", "command", "ok", "output": [...], "data": {...}, "ms"}`
+- `{"id": 2, "batch": ["cogs", "boot"], "stop_on_error": true}` runs the
+  commands in order and answers `{"id", "ok", "results": [...]}`
+
+Output a command prints after its response was sent (background work such
+as a running backfill) is delivered as `{"id", "event": "output", "line"}`
+or a plain text line, and is logged if the client has gone away.
+
+Run `python -m core.console [--socket PATH] [--json] [command ...]` to send
+commands from a shell or a script; without commands it reads them from stdin.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger("lunarbot.console")
+
+REQUEST_LIMIT = 64 * 1024  # longer request lines are answered with an error and skipped
+RESPONSE_LIMIT = 16 * 1024 * 1024  # the client reads whole command outputs as one JSON line
+
+
+class ConsoleContext:
+    def __init__(self, emit=None, late=None, drain=None):
+        self.output = []
+        self.data = {}
+        self.ok = True
+        self.done = False
+        self.gone = False    # the client disconnected; late output now goes to the log
+        self._emit = emit    # streams each line as it is printed (text clients)
+        self._late = late    # receives lines printed after the response was sent
+        self._drain = drain  # waits for the client to take what was written
+
+    def print(self, *args, sep: str = " "):
+        line = sep.join(str(a) for a in args)
+        if self.done:
+            if self._late is None or not self._late(line):
+                self.gone = self._late is not None
+                logger.info(f"console: {line}")
+            return
+        self.output.append(line)
+        if self._emit is not None:
+            self._emit(line)
+
+    async def drain(self):
+        """Backpressure for streamed output: returns once the client has caught up."""
+        if self._drain is None or self.gone:
+            return
+        try:
+            await self._drain()
+        except ConnectionError:
+            self.gone = True
+
+    def fail(self, *args):
+        self.ok = False
+        self.print(*args)
+
+
+class Console:
+    def __init__(self, name=lambda: "Bot"):
+        self.name = name           # callable, so the prefix follows the bot's login
+        self.commands = {}         # word: (handler, usage)
+        self.server = None
+        self.path = None
+        self.clients = 0
+        self.executed = 0
+
+    def command(self, word: str, usage: str = None):
+        """Register `async def handler(ctx, args)` for lines starting with `word`."""
+        def decorator(handler):
+            self.commands[word] = (handler, usage or word)
+            return handler
+        return decorator
+
+    def usage(self) -> str:
+        return "Unknown command. Available: " + ", ".join(usage for _, usage in self.commands.values())
+
+    async def execute(self, line: str, ctx: ConsoleContext = None) -> ConsoleContext:
+        ctx = ctx or ConsoleContext()
+        line = line.strip()
+        word, _, args = line.partition(" ")
+        entry = self.commands.get(word.lower())
+        if entry is None:
+            ctx.fail(self.usage())
+        else:
+            try:
+                await entry[0](ctx, args.strip())
+            except Exception as e:
+                logger.exception(f"Console command failed: {line}")
+                ctx.fail(f"Error: {e}")
+        self.executed += 1
+        ctx.done = True
+        return ctx
+
+    # --- transports ---
+    def _text_line(self, line: str) -> bytes:
+        return f"{self.name()}> {line}\n".encode("utf-8")
+
+    async def handle_line(self, raw: str, write, drain=None) -> None:
+        """Run one request line; `write(bytes)` returns False once the client is gone."""
+        raw = raw.strip()
+        if not raw:
+            return
+        if not raw.startswith("{"):
+            ctx = ConsoleContext(
+                emit=lambda line: write(self._text_line(line)),
+                late=lambda line: write(self._text_line(line)),
+                drain=drain,
+            )
+            await self.execute(raw, ctx)
+            return
+
+        try:
+            request = json.loads(raw)
+        except ValueError as e:
+            write(json.dumps({"ok": False, "error": f"invalid JSON: {e}"}).encode("utf-8") + b"\n")
+            return
+        request_id = request.get("id")
+
+        def late(line):
+            return write(json.dumps({"id": request_id, "event": "output", "line": line}).encode("utf-8") + b"\n")
+
+        async def run(command):
+            started = time.perf_counter()
+            ctx = await self.execute(command, ConsoleContext(late=late, drain=drain))
+            return {
+                "command": command, "ok": ctx.ok, "output": ctx.output, "data": ctx.data,
+                "ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+
+        if "batch" in request:
+            results = []
+            for command in request["batch"]:
+                result = await run(command)
+                results.append(result)
+                if not result["ok"] and request.get("stop_on_error"):
+                    break
+            response = {"id": request_id, "ok": all(r["ok"] for r in results), "results": results}
+        else:
+            response = {"id": request_id, **await run(request.get("cmd", ""))}
+        write(json.dumps(response, default=str).encode("utf-8") + b"\n")
+
+    async def _client(self, reader, writer):
+        self.clients += 1
+
+        def write(data: bytes) -> bool:
+            if writer.is_closing():
+                return False
+            writer.write(data)
+            return True
+
+        try:
+            while True:
+                raw = await read_line(reader)
+                if raw is None:
+                    write(json.dumps({"ok": False, "error": f"request over {REQUEST_LIMIT} bytes"}).encode("utf-8") + b"\n")
+                    continue
+                if not raw:
+                    break
+                await self.handle_line(raw.decode("utf-8", "replace"), write, writer.drain)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    async def start(self, path: str):
+        if os.path.exists(path):
+            os.unlink(path)  # left over from a previous run
+        old_umask = os.umask(0o177)  # owner-only socket
+        try:
+            self.server = await asyncio.start_unix_server(self._client, path=path, limit=REQUEST_LIMIT)
+        finally:
+            os.umask(old_umask)
+        self.path = path
+        logger.info(f"Console listening on {path}")
+
+    async def serve_stdin(self):
+        """Read commands from the process's stdin; commands still run on the loop.
+
+        Lines are read on a daemon thread: a read pipe on the loop would put
+        the terminal, which stdout shares, into non-blocking mode, and then
+        print() and logging can fail with BlockingIOError.
+        """
+        if sys.stdin is None:
+            logger.info("Console stdin unavailable")
+            return
+        loop = asyncio.get_running_loop()
+        lines = asyncio.Queue()
+
+        def read():
+            try:
+                for raw in iter(sys.stdin.buffer.readline, b""):
+                    loop.call_soon_threadsafe(lines.put_nowait, raw)
+                loop.call_soon_threadsafe(lines.put_nowait, b"")
+            except (OSError, ValueError) as e:
+                logger.info(f"Console stdin closed: {e}")
+                loop.call_soon_threadsafe(lines.put_nowait, b"")
+            except RuntimeError:
+                pass  # the loop is closed; the bot is shutting down
+
+        def write(data: bytes) -> bool:
+            sys.stdout.write(data.decode("utf-8"))
+            sys.stdout.flush()
+            return True
+
+        threading.Thread(target=read, name="console-stdin", daemon=True).start()
+        while True:
+            raw = await lines.get()
+            if not raw:
+                break
+            await self.handle_line(raw.decode("utf-8", "replace"), write)
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+        if self.path and os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+async def read_line(reader: asyncio.StreamReader):
+    """The next line, b"" at EOF, or None for a line over the reader's limit, which is skipped whole."""
+    too_long = False
+    while True:
+        try:
+            line = await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            line = e.partial  # EOF; a last line without a newline still counts
+        except asyncio.LimitOverrunError as e:
+            # drop what is buffered and keep looking for the end of the line
+            await reader.read(e.consumed)
+            too_long = True
+            continue
+        return None if too_long else line
+
+
+async def _send(path: str, commands, raw_json: bool) -> int:
+    reader, writer = await asyncio.open_unix_connection(path, limit=RESPONSE_LIMIT)
+    failed = 0
+    for request_id, command in enumerate(commands, 1):
+        writer.write(json.dumps({"id": request_id, "cmd": command}).encode("utf-8") + b"\n")
+        await writer.drain()
+        while True:
+            raw = await read_line(reader)
+            if not raw:
+                print("The bot closed the console connection." if raw is not None
+                      else f"Response over {RESPONSE_LIMIT} bytes, giving up.", file=sys.stderr)
+                writer.close()
+                return 1
+            response = json.loads(raw)
+            if response.get("event"):
+                continue  # late output from an earlier command
+            break
+        if raw_json:
+            print(json.dumps(response))
+        else:
+            for line in response["output"]:
+                print(line)
+        failed += not response["ok"]
+    writer.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send commands to a running bot's console.")
+    parser.add_argument("--socket", default=os.getenv("CONSOLE_SOCKET", "lunarbot.sock"))
+    parser.add_argument("--json", action="store_true", help="print raw JSON responses")
+    parser.add_argument("commands", nargs="*", help="commands to run; read from stdin if omitted")
+    options = parser.parse_args()
+    commands = options.commands or [line.strip() for line in sys.stdin if line.strip()]
+    sys.exit(asyncio.run(_send(options.socket, commands, options.json)))
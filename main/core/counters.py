@@ -0,0 +1,183 @@
+"""Compact integer-keyed counters.
+
+A dict of dicts keyed by str(snowflake) costs a few hundred bytes per user
+(two str objects, an int object and a dict slot). GuildCounters keeps the
+same data in two parallel typed arrays used as an open-addressing hash table:
+8 bytes per key plus 4 per count, divided by the load factor.
+
+Run `python -m core.counters [users]` for a memory comparison.
+"""
+
+from array import array
+
+_EMPTY = 0  # snowflakes are never 0, so 0 marks a free slot
+_GOLDEN = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+_MAX_LOAD = 0.7
+
+
+class GuildCounters:
+    """user_id -> count for one guild (or one channel session)."""
+
+    __slots__ = ("_bits", "_keys", "_vals", "_len")
+
+    def __init__(self, items=(), capacity: int = 8):
+        bits = 3
+        while (1 << bits) * _MAX_LOAD < capacity:
+            bits += 1
+        self._alloc(bits)
+        for key, value in items:
+            self.set(key, value)
+
+    def _alloc(self, bits: int):
+        size = 1 << bits
+        self._bits = bits
+        self._keys = array("Q", bytes(8 * size))
+        self._vals = array("I", bytes(4 * size))
+        self._len = 0
+
+    def _slot(self, key: int) -> int:
+        """Slot holding `key`, or the free slot where it would go."""
+        keys = self._keys
+        mask = len(keys) - 1
+        # Fibonacci hashing spreads the sequential low bits of snowflakes
+        i = ((key * _GOLDEN) & _MASK64) >> (64 - self._bits)
+        while True:
+            k = keys[i]
+            if k == key or k == _EMPTY:
+                return i
+            i = (i + 1) & mask
+
+    def _grow(self):
+        keys, vals = self._keys, self._vals
+        self._alloc(self._bits + 1)
+        for i, key in enumerate(keys):
+            if key != _EMPTY:
+                j = self._slot(key)
+                self._keys[j] = key
+                self._vals[j] = vals[i]
+                self._len += 1
+
+    def __len__(self):
+        return self._len
+
+    def __contains__(self, key: int):
+        return self._keys[self._slot(key)] == key
+
+    def get(self, key: int, default: int = 0) -> int:
+        i = self._slot(key)
+        return self._vals[i] if self._keys[i] == key else default
+
+    def set(self, key: int, value: int):
+        i = self._slot(key)
+        if self._keys[i] != key:
+            if (self._len + 1) > len(self._keys) * _MAX_LOAD:
+                self._grow()
+                i = self._slot(key)
+            self._keys[i] = key
+            self._len += 1
+        self._vals[i] = value
+
+    def add(self, key: int, amount: int = 1) -> int:
+        """Increment `key` and return its new count."""
+        i = self._slot(key)
+        if self._keys[i] == key:
+            value = self._vals[i] + amount
+            self._vals[i] = value
+            return value
+        self.set(key, amount)
+        return amount
+
+    def items(self):
+        vals = self._vals
+        for i, key in enumerate(self._keys):
+            if key != _EMPTY:
+                yield key, vals[i]
+
+    def copy(self) -> "GuildCounters":
+        clone = GuildCounters.__new__(GuildCounters)
+        clone._bits = self._bits
+        clone._keys = array("Q", self._keys)
+        clone._vals = array("I", self._vals)
+        clone._len = self._len
+        return clone
+
+    def to_dict(self) -> dict:
+        return dict(self.items())
+
+    def nbytes(self) -> int:
+        return self._keys.buffer_info()[1] * self._keys.itemsize + self._vals.buffer_info()[1] * self._vals.itemsize
+
+
+class CounterStore:
+    """guild_id -> GuildCounters, with a round trip to the legacy JSON layout."""
+
+    def __init__(self):
+        self.guilds = {}
+
+    def guild(self, guild_id: int) -> GuildCounters:
+        counters = self.guilds.get(guild_id)
+        if counters is None:
+            counters = self.guilds[guild_id] = GuildCounters()
+        return counters
+
+    def add(self, guild_id: int, user_id: int, amount: int = 1) -> int:
+        return self.guild(guild_id).add(user_id, amount)
+
+    def get(self, guild_id: int, user_id: int, default: int = 0) -> int:
+        counters = self.guilds.get(guild_id)
+        return counters.get(user_id, default) if counters is not None else default
+
+    def rows(self):
+        """(guild_id, user_id, count) for every counter."""
+        for guild_id, counters in self.guilds.items():
+            for user_id, count in counters.items():
+                yield guild_id, user_id, count
+
+    @classmethod
+    def from_mapping(cls, data: dict) -> "CounterStore":
+        """From {guild_id: {user_id: count}} with int or str keys."""
+        store = cls()
+        for guild_id, users in data.items():
+            store.guilds[int(guild_id)] = GuildCounters(
+                ((int(u), int(c)) for u, c in users.items()), capacity=len(users)
+            )
+        return store
+
+    from_json = from_mapping
+
+    def to_json(self) -> dict:
+        """The {"guild_id": {"user_id": count}} layout of message_counts.json."""
+        return {
+            str(guild_id): {str(user_id): count for user_id, count in counters.items()}
+            for guild_id, counters in self.guilds.items()
+        }
+
+
+def _compare_memory(users: int):
+    import random
+    import tracemalloc
+
+    ids = random.sample(range(10**17, 10**18), users)
+
+    tracemalloc.start()
+    legacy = {"983593136867643462": {str(u): random.randint(1, 50000) for u in ids}}
+    legacy_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    store = CounterStore.from_json(legacy)
+    compact_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    assert store.to_json() == legacy
+    print(f"users:           {users:,}")
+    print(f"dict of dicts:   {legacy_bytes / 2**20:8.1f} MiB ({legacy_bytes / users:.0f} B/user)")
+    print(f"GuildCounters:   {compact_bytes / 2**20:8.1f} MiB ({compact_bytes / users:.0f} B/user)")
+    print(f"saving:          {legacy_bytes / compact_bytes:.1f}x")
+
+
+if __name__ == "__main__":
+    import sys
+
+    _compare_memory(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,99 @@
+"""Content cache for deleted-message logging.
+
+Discord delete events carry only IDs, so the content has to be remembered
+ahead of time. `ContentCache` keeps a compact record per message: IDs,
+timestamp, content and attachment URLs, not the full `Message` object.
+The records sit in one LRU per guild, and each guild is bounded by an
+approximate byte budget, so a busy guild evicts its own oldest messages
+without pushing out a quiet guild's.
+"""
+
+from collections import OrderedDict
+
+RECORD_OVERHEAD = 200  # tuple, ints and dict slot per cached message
+
+
+def record_size(content: str, attachments) -> int:
+    return RECORD_OVERHEAD + len(content.encode("utf-8")) + sum(len(url) for url in attachments)
+
+
+class ContentCache:
+    def __init__(self, max_bytes_per_guild: int = 4 * 1024 * 1024):
+        self.max_bytes = max_bytes_per_guild
+        self.guilds = {}   # guild_id: OrderedDict(message_id: (channel_id, author_id, created, content, attachments, size))
+        self.bytes = {}    # guild_id: approximate bytes held
+        self.evicted = 0
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, guild_id: int, message_id: int, channel_id: int, author_id: int, created: float,
+            content: str, attachments=()):
+        attachments = tuple(attachments)
+        cache = self.guilds.get(guild_id)
+        if cache is None:
+            cache = self.guilds[guild_id] = OrderedDict()
+            self.bytes[guild_id] = 0
+        old = cache.pop(message_id, None)
+        if old is not None:
+            self.bytes[guild_id] -= old[5]
+        size = record_size(content, attachments)
+        cache[message_id] = (channel_id, author_id, created, content, attachments, size)
+        self.bytes[guild_id] += size
+        while self.bytes[guild_id] > self.max_bytes and cache:
+            _, evicted = cache.popitem(last=False)
+            self.bytes[guild_id] -= evicted[5]
+            self.evicted += 1
+
+    def edit(self, guild_id: int, message_id: int, content: str):
+        """Update a cached message's content; returns (channel_id, author_id, previous content) or None."""
+        cached = self.guilds.get(guild_id, {}).get(message_id)
+        if cached is None:
+            return None
+        channel_id, author_id, created, before, attachments, _ = cached
+        self.put(guild_id, message_id, channel_id, author_id, created, content, attachments)
+        return channel_id, author_id, before
+
+    def pop(self, guild_id: int, message_id: int):
+        """Remove and return a cached record as a dict, or None."""
+        cache = self.guilds.get(guild_id)
+        cached = cache.pop(message_id, None) if cache else None
+        if cached is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.bytes[guild_id] -= cached[5]
+        channel_id, author_id, created, content, attachments, _ = cached
+        return {
+            "channel_id": channel_id,
+            "author_id": author_id,
+            "created": created,
+            "content": content,
+            "attachments": list(attachments),
+        }
+
+    def __len__(self):
+        return sum(len(cache) for cache in self.guilds.values())
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "messages": len(self),
+            "guilds": len(self.guilds),
+            "bytes": sum(self.bytes.values()),
+            "evicted": self.evicted,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+    # --- warm restart ---
+    def to_json(self) -> list:
+        return [
+            [guild_id, [[message_id, *cached[:5]] for message_id, cached in cache.items()]]
+            for guild_id, cache in self.guilds.items()
+        ]
+
+    def load_json(self, data: list):
+        for guild_id, messages in data:
+            for message_id, channel_id, author_id, created, content, attachments in messages:
+                self.put(guild_id, message_id, channel_id, author_id, created, content, attachments)
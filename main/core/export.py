@@ -0,0 +1,120 @@
+"""Streaming export of message counts to CSV or NDJSON.
+
+Rows come from a generator and are written one at a time, so the export
+never holds the whole output in memory. Output rolls over into numbered
+parts once a part reaches `part_size` bytes, each part a complete file (CSV
+parts repeat the header; gzip parts are independent streams), so every part
+can be sent as its own Discord attachment.
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+from datetime import datetime, timezone
+
+from core.rollups import DAY
+
+PART_SIZE = int(os.getenv("EXPORT_PART_SIZE", str(8 * 1024 * 1024)))
+# gzip buffers compressed output internally, so stop a bit early
+GZIP_MARGIN = 512 * 1024
+
+
+def snapshot_counts(store, guild_ids=None):
+    """Copy the counters to export; cheap (array copies) and safe to hand to another thread."""
+    guild_ids = store.guilds.keys() if guild_ids is None else guild_ids
+    return [(guild_id, store.guilds[guild_id].copy()) for guild_id in guild_ids if guild_id in store.guilds]
+
+
+def snapshot_days(activity, guild_ids, now: float, days: int) -> dict:
+    """{guild_id: [day dict, ...]} for the optional per-day bucket columns."""
+    out = {}
+    for guild_id in guild_ids:
+        users = activity.users.get(guild_id)
+        if users is not None:
+            out[guild_id] = users.snapshot(now, days)
+    return out
+
+
+def day_columns(now: float, days: int):
+    today = int(now // DAY)
+    return [
+        "day_" + datetime.fromtimestamp(d * DAY, tz=timezone.utc).strftime("%Y-%m-%d")
+        for d in range(today - days + 1, today + 1)
+    ]
+
+
+def iter_rows(counts, day_buckets=None, columns=()):
+    """Yield one dict per (guild, user): guild_id, user_id, count[, day_... columns]."""
+    day_buckets = day_buckets or {}
+    for guild_id, counters in counts:
+        buckets = day_buckets.get(guild_id)
+        for user_id, count in counters.items():
+            row = {"guild_id": guild_id, "user_id": user_id, "count": count}
+            if columns:
+                if buckets:
+                    for column, bucket in zip(columns, buckets):
+                        row[column] = bucket.get(user_id, 0)
+                else:
+                    for column in columns:
+                        row[column] = 0
+            yield row
+
+
+class _Part:
+    def __init__(self, path: str, compress: bool):
+        self.path = path
+        self.raw = open(path, "wb")
+        self.stream = gzip.GzipFile(fileobj=self.raw, mode="wb") if compress else self.raw
+
+    def size(self) -> int:
+        return self.raw.tell()
+
+    def close(self):
+        if self.stream is not self.raw:
+            self.stream.close()
+        self.raw.close()
+
+
+def write_export(rows, directory: str, basename: str, fmt: str = "csv", compress: bool = False,
+                 part_size: int = PART_SIZE) -> list:
+    """Stream `rows` into one or more files; returns their paths."""
+    if fmt not in ("csv", "ndjson"):
+        raise ValueError(f"Unknown export format: {fmt}")
+    limit = part_size - GZIP_MARGIN if compress else part_size
+    suffix = "." + fmt + (".gz" if compress else "")
+
+    paths = []
+    part = None
+    header = None
+    line = io.StringIO()
+    writer = csv.writer(line)
+
+    def encode(values) -> bytes:
+        line.seek(0)
+        line.truncate()
+        writer.writerow(values)
+        return line.getvalue().encode("utf-8")
+
+    try:
+        for row in rows:
+            if fmt == "csv":
+                if header is None:
+                    header = encode(row.keys())
+                data = encode(row.values())
+            else:
+                data = json.dumps(row, separators=(",", ":")).encode("utf-8") + b"\n"
+            if part is None or part.size() + len(data) > limit:
+                if part is not None:
+                    part.close()
+                path = os.path.join(directory, f"{basename}-part{len(paths) + 1}{suffix}")
+                part = _Part(path, compress)
+                paths.append(path)
+                if header is not None:
+                    part.stream.write(header)
+            part.stream.write(data)
+    finally:
+        if part is not None:
+            part.close()
+    return paths
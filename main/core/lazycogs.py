@@ -0,0 +1,184 @@
+"""Lazy cog loading.
+
+A manifest, built by reading each cog's source with `ast` (no imports) and
+cached by content hash, lists the prefix commands and event listeners every
+cog defines. In lazy mode those names are registered as cheap stubs; the
+first invocation or event imports the real cog, swaps the stubs out, and
+replays the triggering command or event into it. Cogs that define
+application commands are always loaded up front, because the command sync
+on ready must see their full command tree.
+"""
+
+import ast
+import asyncio
+import json
+import logging
+import os
+import time
+
+from nextcord.ext import commands
+
+from core.persist import atomic_write_json
+from core.reload import file_digest
+
+logger = logging.getLogger("lunarbot.lazycogs")
+
+APP_COMMAND_DECORATORS = {"slash_command", "user_command", "message_command"}
+
+
+def _decorator_name(node):
+    target = node.func if isinstance(node, ast.Call) else node
+    parts = []
+    while isinstance(target, ast.Attribute):
+        parts.append(target.attr)
+        target = target.value
+    if isinstance(target, ast.Name):
+        parts.append(target.id)
+    return ".".join(reversed(parts))
+
+
+def _kwarg(call, name):
+    for keyword in getattr(call, "keywords", ()):
+        if keyword.arg == name:
+            try:
+                return ast.literal_eval(keyword.value)
+            except ValueError:
+                return None
+    return None
+
+
+def scan_cog(path: str) -> dict:
+    """Prefix commands, listeners and whether app commands exist, read from source."""
+    with open(path, "rb") as f:
+        tree = ast.parse(f.read(), filename=path)
+    entry = {"commands": [], "events": [], "app_commands": False}
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        for decorator in node.decorator_list:
+            name = _decorator_name(decorator)
+            if name in ("commands.command", "commands.group"):
+                entry["commands"].append({
+                    "name": _kwarg(decorator, "name") or node.name,
+                    "aliases": list(_kwarg(decorator, "aliases") or ()),
+                })
+            elif name == "commands.Cog.listener":
+                event = decorator.args[0].value if isinstance(decorator, ast.Call) and decorator.args else None
+                entry["events"].append(event or node.name)
+            elif name.split(".")[-1] in APP_COMMAND_DECORATORS:
+                entry["app_commands"] = True
+    return entry
+
+
+def build_manifest(directory: str, cache_path: str = None) -> dict:
+    """{module: entry} for every cog, re-scanning only files whose hash changed."""
+    cached = {}
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except Exception:
+            cached = {}
+    manifest = {}
+    for fn in sorted(os.listdir(directory)):
+        if not fn.endswith(".py") or fn.startswith("_"):
+            continue
+        path = os.path.join(directory, fn)
+        digest = file_digest(path)
+        entry = cached.get(fn[:-3])
+        if entry is None or entry.get("digest") != digest:
+            entry = scan_cog(path)
+            entry["digest"] = digest
+        manifest[fn[:-3]] = entry
+    if cache_path and manifest != cached:
+        atomic_write_json(cache_path, manifest)
+    return manifest
+
+
+class LazyCogs:
+    def __init__(self, bot, manifest: dict, package: str = "cogs"):
+        self.bot = bot
+        self.manifest = manifest
+        self.package = package
+        self.pending = set()     # modules represented only by stubs
+        self.stubs = {}          # module: ([Command], [(event, listener)])
+        self.loaded = {}         # module: (trigger, load ms)
+
+    def install(self, module: str) -> bool:
+        """Register stubs for `module`; False if it must be loaded eagerly."""
+        entry = self.manifest[module]
+        if entry["app_commands"]:
+            return False
+        stub_commands = [self._command_stub(module, c["name"], c["aliases"]) for c in entry["commands"]]
+        stub_events = [(event, self._event_stub(module, event)) for event in entry["events"]]
+        for command in stub_commands:
+            self.bot.add_command(command)
+        for event, listener in stub_events:
+            self.bot.add_listener(listener, event)
+        self.stubs[module] = (stub_commands, stub_events)
+        self.pending.add(module)
+        return True
+
+    def _command_stub(self, module: str, name: str, aliases):
+        async def stub(ctx, *, args: str = None):
+            self.load(module, f"!{name}")
+            # re-parse the message so the real command gets its own converters and checks
+            real_ctx = await self.bot.get_context(ctx.message)
+            if real_ctx.command is not None:
+                await self.bot.invoke(real_ctx)
+
+        return commands.Command(stub, name=name, aliases=aliases, hidden=True)
+
+    def _event_stub(self, module: str, event: str):
+        async def stub(*args, **kwargs):
+            for cog in self.load(module, event):
+                for listener_name, method in cog.get_listeners():
+                    if listener_name == event:
+                        await method(*args, **kwargs)
+
+        return stub
+
+    def _remove_stubs(self, module: str):
+        stub_commands, stub_events = self.stubs.pop(module, ((), ()))
+        for command in stub_commands:
+            if self.bot.all_commands.get(command.name) is command:
+                self.bot.remove_command(command.name)
+        for event, listener in stub_events:
+            self.bot.remove_listener(listener, event)
+
+    def load(self, module: str, trigger: str = "load") -> list:
+        """Import `module` now if it is still lazy; returns its cogs."""
+        name = f"{self.package}.{module}"
+        if module in self.pending:
+            self.pending.discard(module)
+            self._remove_stubs(module)
+            started = time.perf_counter()
+            try:
+                self.bot.load_extension(name)
+            except Exception as e:
+                logger.error(f"Failed to load lazy cog {name}: {e}")
+                return []
+            elapsed = (time.perf_counter() - started) * 1000
+            self.loaded[module] = (trigger, elapsed)
+            logger.info(f"Loaded lazy cog {name} on {trigger} in {elapsed:.1f} ms")
+        return [cog for cog in self.bot.cogs.values() if cog.__module__ == name]
+
+    def load_extension(self, name: str):
+        """Drop-in for bot.load_extension that also clears a lazy module's stubs."""
+        module = name.rsplit(".", 1)[-1]
+        if module in self.pending:
+            self.pending.discard(module)
+            self._remove_stubs(module)
+        self.bot.load_extension(name)
+
+    async def warm(self):
+        """Load every remaining lazy cog, yielding to the loop between imports."""
+        for module in sorted(self.pending):
+            await asyncio.sleep(0)
+            self.load(module, "warm-up")
+
+    def stats(self) -> dict:
+        return {
+            "pending": sorted(self.pending),
+            "loaded": {module: {"trigger": t, "ms": round(ms, 1)} for module, (t, ms) in self.loaded.items()},
+        }
@@ -0,0 +1,214 @@
+"""Bounded, indexed log of messages that mention the bot or a watched keyword.
+
+Entries live in a fixed-capacity ring. Each channel and each user has a
+queue of the sequence numbers it owns, so a filtered query walks only that
+queue (newest first, stopping at `since`) rather than the whole buffer.
+Entries leave the ring in FIFO order, so the entry being overwritten is
+always at the head of its channel and user queues and is dropped in O(1).
+That is how memory stays fixed under a mention flood. Overwritten entries
+are appended to an NDJSON spill file through a buffered handle, so nothing
+recorded is lost.
+"""
+
+import json
+import logging
+import re
+import time
+from collections import deque
+
+logger = logging.getLogger("lunarbot.mentions")
+
+CONTENT_LIMIT = 300  # characters kept per entry
+
+
+class MentionLog:
+    def __init__(self, capacity: int = 1000, keywords=(), spill_path: str = None):
+        self.capacity = capacity
+        self.entries = [None] * capacity
+        self.seq = 0              # entries recorded so far; the next one goes to slot seq % capacity
+        self.by_channel = {}      # channel_id: deque of seqs still in the ring, oldest first
+        self.by_user = {}         # user_id: deque of seqs still in the ring, oldest first
+        self.keywords = [k.strip().lower() for k in keywords if k.strip()]
+        self.pattern = (
+            re.compile(r"\b(" + "|".join(map(re.escape, self.keywords)) + r")\b", re.IGNORECASE)
+            if self.keywords else None
+        )
+        self.spill_path = spill_path
+        self._spill = None
+        self.spilled = 0
+        self.queries = 0
+        self.scanned = 0
+
+    def __len__(self):
+        return min(self.seq, self.capacity)
+
+    def __iter__(self):
+        """Entries in the ring, oldest first."""
+        for seq in range(self.seq - len(self), self.seq):
+            yield self.entries[seq % self.capacity]
+
+    def attach(self, bot):
+        self.bot = bot
+        bot.add_listener(self.on_message, "on_message")
+
+    # --- capture ---
+    def match(self, message, bot_id: int):
+        """Why `message` is worth recording ("bot" or "keyword:<word>"), or None."""
+        if bot_id in message.raw_mentions:
+            return "bot"
+        if self.pattern is not None and message.content:
+            found = self.pattern.search(message.content)
+            if found:
+                return f"keyword:{found.group(1).lower()}"
+        return None
+
+    async def on_message(self, message):
+        if message.author.bot or self.bot.user is None:
+            return
+        reason = self.match(message, self.bot.user.id)
+        if reason is None:
+            return
+        self.record({
+            "ts": message.created_at.timestamp(),
+            "guild_id": message.guild.id if message.guild else None,
+            "channel_id": message.channel.id,
+            "message_id": message.id,
+            "user_id": message.author.id,
+            "reason": reason,
+            "content": (message.content or "")[:CONTENT_LIMIT],
+        })
+
+    def record(self, entry: dict):
+        slot = self.seq % self.capacity
+        old = self.entries[slot]
+        if old is not None:
+            for index, key in ((self.by_channel, old["channel_id"]), (self.by_user, old["user_id"])):
+                seqs = index[key]
+                seqs.popleft()
+                if not seqs:
+                    del index[key]
+            self.spill(old)
+        self.entries[slot] = entry
+        self.by_channel.setdefault(entry["channel_id"], deque()).append(self.seq)
+        self.by_user.setdefault(entry["user_id"], deque()).append(self.seq)
+        self.seq += 1
+
+    def spill(self, entry: dict):
+        if not self.spill_path:
+            return
+        try:
+            if self._spill is None:
+                self._spill = open(self.spill_path, "a", encoding="utf-8", buffering=64 * 1024)
+            self._spill.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            self.spilled += 1
+        except OSError as e:
+            logger.error(f"Failed to spill mention to {self.spill_path}: {e}")
+
+    # --- queries ---
+    def query(self, user_id: int = None, channel_id: int = None, since: float = None, limit: int = 20) -> list:
+        """Newest-first entries matching every given filter."""
+        self.queries += 1
+        candidates = []
+        if user_id is not None:
+            candidates.append(self.by_user.get(user_id, ()))
+        if channel_id is not None:
+            candidates.append(self.by_channel.get(channel_id, ()))
+        if candidates:
+            seqs = reversed(min(candidates, key=len))
+        else:
+            seqs = range(self.seq - 1, self.seq - len(self) - 1, -1)
+
+        out = []
+        for seq in seqs:
+            entry = self.entries[seq % self.capacity]
+            self.scanned += 1
+            if since is not None and entry["ts"] < since:
+                break  # entries are recorded in time order
+            if user_id is not None and entry["user_id"] != user_id:
+                continue
+            if channel_id is not None and entry["channel_id"] != channel_id:
+                continue
+            out.append(entry)
+            if len(out) >= limit:
+                break
+        return out
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self),
+            "capacity": self.capacity,
+            "recorded": self.seq,
+            "channels": len(self.by_channel),
+            "users": len(self.by_user),
+            "spilled": self.spilled,
+            "queries": self.queries,
+            "scanned": self.scanned,
+        }
+
+    # --- persistence ---
+    def to_json(self) -> list:
+        return list(self)
+
+    def load_json(self, entries: list):
+        for entry in entries:
+            self.record(entry)
+
+    def flush(self):
+        if self._spill is not None:
+            self._spill.flush()
+
+    def close(self):
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+
+def _flood(mentions: int = 1_000_000, capacity: int = 1000):
+    import os
+    import random
+    import tempfile
+    import tracemalloc
+
+    path = os.path.join(tempfile.mkdtemp(), "mentions.ndjson")
+    now = time.time()
+
+    def flood(log, count):
+        for i in range(count):
+            log.record({
+                "ts": now - count + i, "guild_id": 1, "channel_id": random.randrange(50),
+                "message_id": i, "user_id": random.randrange(5000), "reason": "bot", "content": "hey bot",
+            })
+
+    log = MentionLog(capacity, spill_path=path)
+    started = time.perf_counter()
+    flood(log, mentions)
+    elapsed = time.perf_counter() - started
+    log.close()
+
+    # what stays resident is the same after 10x or 100x the capacity
+    tracemalloc.start()
+    held = MentionLog(capacity)
+    flood(held, capacity * 10)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        log.query(user_id=random.randrange(5000))
+    indexed = (time.perf_counter() - started) / 1000
+    started = time.perf_counter()
+    for _ in range(1000):
+        user_id = random.randrange(5000)
+        [e for e in reversed(list(log)) if e["user_id"] == user_id][:20]
+    scanned = (time.perf_counter() - started) / 1000
+
+    print(f"{mentions:,} mentions into a {capacity:,}-entry ring: {mentions / elapsed:,.0f}/s")
+    print(f"memory held:      {memory / 1024:8.0f} KiB (ring + indexes)")
+    print(f"spilled:          {log.spilled:,} entries, {os.path.getsize(path) / 2**20:.1f} MiB on disk")
+    print(f"user query:       {indexed * 1e6:8.1f} us indexed vs {scanned * 1e6:.1f} us full scan")
+
+
+if __name__ == "__main__":
+    import sys
+
+    _flood(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
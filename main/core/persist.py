@@ -0,0 +1,263 @@
+"""Write-behind persistence helpers shared by the cogs."""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import tempfile
+import threading
+
+logger = logging.getLogger("lunarbot.persist")
+
+
+def atomic_write_bytes(path: str, data: bytes):
+    """Write `data` to `path` through a temp file + rename so readers never see a torn file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path: str, obj):
+    atomic_write_bytes(path, json.dumps(obj, separators=(",", ":")).encode("utf-8"))
+
+
+class RotatingLog:
+    """Append-only NDJSON log: one write per entry or batch, rotated by size.
+
+    Once the file passes `max_bytes` it becomes `path.1` (older ones shift
+    up to `path.<backups>`) and a fresh file is started, so no write ever
+    rewrites earlier entries. With `compress`, each batch is written as its
+    own gzip member; concatenated members read back as one stream with
+    `gzip.open`, so batches should be large enough to compress well.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 8 * 1024 * 1024, backups: int = 5, compress: bool = False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.compress = compress
+        self._file = None
+        self.size = 0
+        self.written = 0
+        self.batches = 0
+        self.rotations = 0
+
+    def _open(self):
+        self._file = open(self.path, "ab")
+        self.size = self._file.tell()
+
+    def append(self, entry):
+        self.append_many([entry])
+
+    def append_many(self, entries):
+        data = "".join(json.dumps(e, separators=(",", ":"), default=str) + "\n" for e in entries).encode("utf-8")
+        if not data:
+            return
+        if self.compress:
+            data = gzip.compress(data)
+        if self._file is None:
+            self._open()
+        self._file.write(data)
+        self._file.flush()
+        self.size += len(data)
+        self.written += len(entries)
+        self.batches += 1
+        if self.size >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        self.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if os.path.exists(self.path):
+            os.replace(self.path, f"{self.path}.1")
+        self.rotations += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class WriteBehind:
+    """Coalesces many in-memory updates into a few background writes.
+
+    Callers mutate their data and then call `mark_dirty()`. A background task
+    flushes once `interval` seconds have passed or `threshold` updates are
+    pending, whichever comes first. `snapshot()` runs on the event loop so it
+    sees a consistent view of the data; `write(snapshot)` runs in the default
+    executor so the loop never blocks on disk. If a snapshot is destructive
+    (e.g. it drains a dirty set), `requeue(snapshot)` is called when its write
+    fails, in a flush or in `close()`, so the data is retried later.
+
+    Full-state snapshots are numbered so an older one never overwrites a newer
+    one. Draining snapshots are never skipped: each holds data no other
+    snapshot has, so a shutdown write first writes any batch still waiting
+    on the executor.
+    """
+
+    def __init__(self, name: str, snapshot, write, interval: float = 10.0, threshold: int = 500, requeue=None):
+        self.name = name
+        self.snapshot = snapshot
+        self.write = write
+        self.requeue = requeue
+        self.draining = requeue is not None
+        self.interval = interval
+        self.threshold = threshold
+
+        self.pending = 0    # updates not yet on disk
+        self.updates = 0    # updates seen in total
+        self.flushed = 0    # updates that made it to disk
+        self.writes = 0     # physical writes performed
+        self.failures = 0
+
+        self._task = None
+        self._wake = None
+        self._flush_lock = None
+        # snapshots are numbered so an older one can never overwrite a newer one,
+        # even if an executor write and the shutdown write race each other
+        self._generation = 0
+        self._written_generation = 0
+        self._in_flight = {}  # generation: drained batch not written yet
+        self._write_lock = threading.Lock()
+
+    @property
+    def coalesced(self) -> int:
+        """Updates that were absorbed into another update's write."""
+        return self.flushed - self.writes
+
+    def mark_dirty(self, count: int = 1):
+        self.pending += count
+        self.updates += count
+        self._ensure_started()
+        if self._wake is not None and self.pending >= self.threshold:
+            self._wake.set()
+
+    def _ensure_started(self):
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # no loop yet; close() still flushes synchronously
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self.pending:
+                await self.flush()
+
+    def _take_snapshot(self):
+        self._generation += 1
+        data = self.snapshot()
+        if self.draining:
+            self._in_flight[self._generation] = data
+        return self._generation, self.pending, data
+
+    def _write_generation(self, generation: int, data) -> int:
+        """Write a snapshot; returns the number of batches written."""
+        with self._write_lock:
+            if not self.draining:
+                if generation <= self._written_generation:
+                    return 0
+                self.write(data)
+                self._written_generation = generation
+                return 1
+            # a batch close() already took over is gone from _in_flight; older ones go first.
+            # each stays queued until it is on disk, so a failed write can hand it back
+            written = 0
+            for queued in sorted(g for g in self._in_flight if g <= generation):
+                self.write(self._in_flight[queued])
+                del self._in_flight[queued]
+                written += 1
+            return written
+
+    def _requeue_unwritten(self, generation: int):
+        """Hand the batches up to `generation` that a failed write left behind back to the caller."""
+        with self._write_lock:
+            batches = [self._in_flight.pop(g) for g in sorted(self._in_flight) if g <= generation]
+        for data in reversed(batches):  # newest first, so a requeue that prepends keeps the order
+            self.requeue(data)
+
+    async def flush(self):
+        """Write pending updates now, off the event loop."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self.pending:
+                return
+            generation, pending, data = self._take_snapshot()
+            self.pending -= pending
+            loop = asyncio.get_running_loop()
+            try:
+                written = await loop.run_in_executor(None, self._write_generation, generation, data)
+            except Exception as e:
+                self.pending += pending  # retried on the next tick
+                self.failures += 1
+                if self.draining:
+                    self._requeue_unwritten(generation)
+                logger.error(f"[{self.name}] background write failed: {e}")
+                return
+            self.writes += written
+            self.flushed += pending
+
+    def detach(self) -> int:
+        """Stop the flusher without writing; returns the pending count for a successor to adopt."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        pending, self.pending = self.pending, 0
+        return pending
+
+    def close(self):
+        """Stop the flusher and synchronously write anything still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.pending or self._in_flight:
+            if self.pending:
+                generation, pending, data = self._take_snapshot()
+            else:
+                generation, pending, data = self._generation, 0, None  # only take over queued batches
+            try:
+                self.writes += self._write_generation(generation, data)
+                self.pending -= pending
+                self.flushed += pending
+            except Exception as e:
+                self.failures += 1
+                if self.draining:
+                    self._requeue_unwritten(generation)  # still dirty, and still counted as pending
+                logger.error(f"[{self.name}] final write failed: {e}")
+        logger.info(
+            f"[{self.name}] persisted {self.flushed} updates in {self.writes} writes "
+            f"({self.coalesced} coalesced, {self.failures} failures)"
+        )
+
+    def stats(self) -> dict:
+        return {
+            "updates": self.updates,
+            "pending": self.pending,
+            "writes": self.writes,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+        }
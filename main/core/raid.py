@@ -0,0 +1,208 @@
+"""Join-raid detection and the bounded action queue behind a lockdown.
+
+`JoinWindow` counts joins over the last `seconds` seconds with a ring of
+per-second buckets and a running total. Recording a join costs O(1), plus
+clearing the buckets for the seconds that passed since the previous join,
+so the cost per second is bounded regardless of burst size. A
+`RaidDetector` keeps one window per guild, together with the IDs of the
+recent joiners, so a lockdown can act on everyone who arrived inside the
+window. `ActionQueue` runs the resulting role, kick and ban calls with
+bounded concurrency and bounded backlog, keeping a storm of thousands of
+joins from turning into thousands of simultaneous REST calls.
+"""
+
+import asyncio
+import logging
+import time
+from array import array
+from collections import deque
+
+logger = logging.getLogger("lunarbot.raid")
+
+
+class JoinWindow:
+    __slots__ = ("_buckets", "_head", "total")
+
+    def __init__(self, seconds: int):
+        self._buckets = array("I", bytes(4 * seconds))
+        self._head = None  # absolute second of the newest bucket
+        self.total = 0
+
+    def _advance(self, second: int):
+        head = self._head
+        size = len(self._buckets)
+        if head is None or second - head >= size:
+            for i in range(size):
+                self._buckets[i] = 0
+            self.total = 0
+        elif second > head:
+            for s in range(head + 1, second + 1):
+                self.total -= self._buckets[s % size]
+                self._buckets[s % size] = 0
+        else:
+            return
+        self._head = second
+
+    def add(self, ts: float) -> int:
+        """Count one join at `ts`; returns the joins inside the window."""
+        second = int(ts)
+        self._advance(second)
+        if second > self._head - len(self._buckets):
+            self._buckets[second % len(self._buckets)] += 1
+            self.total += 1
+        return self.total
+
+    def count(self, now: float) -> int:
+        self._advance(int(now))
+        return self.total
+
+
+class RaidDetector:
+    def __init__(self, threshold: int = 10, window: int = 10, calm: float = 300.0, max_recent: int = 5000):
+        self.threshold = threshold
+        self.window = window
+        self.calm = calm              # seconds below threshold before a lockdown lifts
+        self.max_recent = max_recent
+        self.windows = {}             # guild_id: JoinWindow
+        self.recent = {}              # guild_id: deque of (ts, member_id) inside the window
+        self.raids = {}               # guild_id: {"since", "last_hot", "joins"}
+        self.joins = 0
+        self.trips = 0
+
+    def record(self, guild_id: int, member_id: int, ts: float = None) -> bool:
+        """Count a join; True when it starts a raid in `guild_id`."""
+        ts = time.time() if ts is None else ts
+        self.joins += 1
+        window = self.windows.get(guild_id)
+        if window is None:
+            window = self.windows[guild_id] = JoinWindow(self.window)
+        count = window.add(ts)
+
+        recent = self.recent.get(guild_id)
+        if recent is None:
+            recent = self.recent[guild_id] = deque(maxlen=self.max_recent)
+        recent.append((ts, member_id))
+        while recent and recent[0][0] <= ts - self.window:
+            recent.popleft()
+
+        raid = self.raids.get(guild_id)
+        if raid is not None:
+            raid["joins"] += 1
+            if count >= self.threshold:
+                raid["last_hot"] = ts
+            return False
+        if count >= self.threshold:
+            self.raids[guild_id] = {"since": ts, "last_hot": ts, "joins": len(recent)}
+            self.trips += 1
+            return True
+        return False
+
+    def joiners(self, guild_id: int) -> list:
+        return [member_id for _, member_id in self.recent.get(guild_id, ())]
+
+    def in_raid(self, guild_id: int) -> bool:
+        return guild_id in self.raids
+
+    def release(self, guild_id: int):
+        return self.raids.pop(guild_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "joins": self.joins,
+            "trips": self.trips,
+            "guilds": len(self.windows),
+            "raids": {g: dict(raid) for g, raid in self.raids.items()},
+        }
+
+
+class ActionQueue:
+    """Runs submitted coroutine functions on `concurrency` workers, holding at most `maxsize`."""
+
+    def __init__(self, concurrency: int = 4, maxsize: int = 10000):
+        self.concurrency = concurrency
+        self.queue = asyncio.Queue(maxsize)
+        self.workers = []
+        self.done = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def start(self):
+        if not self.workers:
+            self.workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        self.workers = []
+
+    def submit(self, func, *args) -> bool:
+        self.start()
+        try:
+            self.queue.put_nowait((func, args))
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    async def _work(self):
+        while True:
+            func, args = await self.queue.get()
+            try:
+                await func(*args)
+                self.done += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Anti-raid action {getattr(func, '__name__', func)} failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "done": self.done,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "concurrency": self.concurrency,
+        }
+
+
+async def _storm(joins: int = 1_000_000, guilds: int = 200, actions: int = 800, latency: float = 0.05,
+                 concurrency: int = 8):
+    import random
+
+    detector = RaidDetector(threshold=30, window=10)
+    now = time.time()
+    # a steady trickle everywhere, then one guild takes a 5,000-join-per-minute storm
+    events = [(random.randrange(guilds), now + i * 0.01) for i in range(joins)]
+    started = time.perf_counter()
+    for member_id, (guild_id, ts) in enumerate(events):
+        detector.record(guild_id, member_id, ts)
+    elapsed = time.perf_counter() - started
+    storm_at = now + joins * 0.01
+    for i in range(5000):
+        detector.record(guilds, joins + i, storm_at + i * 0.012)
+
+    calls = 0
+
+    async def kick(member_id):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(latency)  # one REST round-trip
+
+    queue = ActionQueue(concurrency)
+    started = time.perf_counter()
+    for member_id in range(actions):
+        queue.submit(kick, member_id)
+    await queue.queue.join()
+    drained = time.perf_counter() - started
+    queue.stop()
+
+    print(f"{joins:,} joins across {guilds} guilds: {joins / elapsed:,.0f} joins/s "
+          f"({elapsed / joins * 1e6:.2f} us per join), {detector.trips} raid(s) tripped")
+    print(f"storm guild in raid: {detector.in_raid(guilds)}, {len(detector.joiners(guilds))} joiners in window")
+    print(f"{actions:,} actions at {latency * 1000:.0f} ms each, {concurrency} workers: {drained:.2f}s "
+          f"({calls / drained:,.0f}/s, {actions * latency:.0f}s sequentially)")
+
+
+if __name__ == "__main__":
+    asyncio.run(_storm())
@@ -0,0 +1,169 @@
+"""Incrementally maintained leaderboards.
+
+RankIndex is an order-statistics index over (count, member) pairs: a sorted
+list split into bounded sublists (the layout `sortedcontainers` uses) with a
+Fenwick tree over the sublist lengths. Updating a member's count, finding a
+member's rank and selecting the entry at a position are all O(log n), so a
+leaderboard never has to sort the whole guild.
+"""
+
+from bisect import bisect_left, insort
+
+# Each entry is packed into a single int that sorts highest-count-first and
+# then by member ID: one small int per member instead of a tuple.
+_MEMBER_BITS = 64
+_MEMBER_MASK = (1 << _MEMBER_BITS) - 1
+_MAX_COUNT = (1 << 48) - 1
+
+
+def _pack(member: int, count: int) -> int:
+    return ((_MAX_COUNT - count) << _MEMBER_BITS) | member
+
+
+def _unpack(key: int):
+    return key & _MEMBER_MASK, _MAX_COUNT - (key >> _MEMBER_BITS)
+
+
+class RankIndex:
+    """Members ordered by count, descending.
+
+    The index does not store counts on its own; callers that own the counts
+    pass the previous value to `update()`.
+    """
+
+    def __init__(self, items=(), load: int = 512):
+        self._load = load
+        keys = sorted(_pack(m, c) for m, c in items if c > 0)
+        self._lists = [keys[i:i + load] for i in range(0, len(keys), load)]
+        self._maxes = [lst[-1] for lst in self._lists]
+        self._len = len(keys)
+        self._tree = None  # Fenwick tree over sublist lengths, rebuilt lazily
+
+    def __len__(self):
+        return self._len
+
+    # --- Fenwick tree over sublist lengths ---
+    def _build_tree(self):
+        tree = [len(lst) for lst in self._lists]
+        for i in range(len(tree)):
+            j = i | (i + 1)
+            if j < len(tree):
+                tree[j] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, i: int, delta: int):
+        tree = self._tree
+        if tree is None:
+            return
+        while i < len(tree):
+            tree[i] += delta
+            i |= i + 1
+
+    def _prefix(self, i: int) -> int:
+        """Number of entries in sublists [0, i)."""
+        if self._tree is None:
+            self._build_tree()
+        tree = self._tree
+        total = 0
+        while i > 0:
+            total += tree[i - 1]
+            i &= i - 1
+        return total
+
+    def _locate(self, pos: int):
+        """(sublist, offset) of the entry at absolute position `pos`."""
+        if self._tree is None:
+            self._build_tree()
+        tree = self._tree
+        i = 0
+        step = 1 << (len(tree).bit_length() - 1) if tree else 0
+        while step:
+            j = i + step
+            if j <= len(tree) and tree[j - 1] <= pos:
+                pos -= tree[j - 1]
+                i = j
+            step >>= 1
+        return i, pos
+
+    # --- mutation ---
+    def _insert(self, key: int):
+        lists, maxes = self._lists, self._maxes
+        self._len += 1
+        if not lists:
+            lists.append([key])
+            maxes.append(key)
+            self._tree = None
+            return
+        i = bisect_left(maxes, key)
+        if i == len(maxes):
+            i -= 1
+        lst = lists[i]
+        insort(lst, key)
+        maxes[i] = lst[-1]
+        if len(lst) > 2 * self._load:
+            lists.insert(i + 1, lst[self._load:])
+            del lst[self._load:]
+            maxes[i] = lst[-1]
+            maxes.insert(i + 1, lists[i + 1][-1])
+            self._tree = None
+        else:
+            self._tree_add(i, 1)
+
+    def _remove(self, key: int) -> bool:
+        lists, maxes = self._lists, self._maxes
+        i = bisect_left(maxes, key)
+        if i == len(maxes):
+            return False
+        lst = lists[i]
+        j = bisect_left(lst, key)
+        if j == len(lst) or lst[j] != key:
+            return False
+        del lst[j]
+        self._len -= 1
+        if lst:
+            maxes[i] = lst[-1]
+            self._tree_add(i, -1)
+        else:
+            del lists[i]
+            del maxes[i]
+            self._tree = None
+        return True
+
+    def update(self, member: int, old: int, new: int):
+        """Move `member` from count `old` to `new` (0 means absent)."""
+        if old > 0:
+            self._remove(_pack(member, old))
+        if new > 0:
+            self._insert(_pack(member, new))
+
+    def discard(self, member: int, count: int):
+        self.update(member, count, 0)
+
+    # --- queries ---
+    def rank(self, member: int, count: int):
+        """1-based position of `member` (with its current `count`), or None."""
+        if count <= 0:
+            return None
+        key = _pack(member, count)
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return None
+        lst = self._lists[i]
+        j = bisect_left(lst, key)
+        if j == len(lst) or lst[j] != key:
+            return None
+        return self._prefix(i) + j + 1
+
+    def top(self, k: int, offset: int = 0):
+        """Up to `k` (member, count) pairs starting at position `offset`."""
+        out = []
+        if k <= 0 or offset >= self._len:
+            return out
+        i, j = self._locate(offset)
+        lists = self._lists
+        while i < len(lists) and len(out) < k:
+            lst = lists[i]
+            for key in lst[j:j + k - len(out)]:
+                out.append(_unpack(key))
+            i, j = i + 1, 0
+        return out
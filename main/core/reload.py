@@ -0,0 +1,258 @@
+"""Incremental cog reloads.
+
+Each module in the cogs directory is tracked by a content hash (re-hashed
+only when its mtime or size moves). A reload touches just the modules whose
+hash changed, plus every cog that imports one of them, and finishes with a
+single application-command sync instead of one per step. An optional polling
+watcher triggers the same reload once the directory has been quiet for the
+debounce period, so an editor saving several files causes one reload.
+"""
+
+import ast
+import asyncio
+import hashlib
+import logging
+import os
+import sys
+import time
+from contextlib import nullcontext
+
+logger = logging.getLogger("lunarbot.reload")
+
+
+def file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def module_imports(path: str, package: str) -> set:
+    """Sibling modules of `package` imported by the file at `path`."""
+    with open(path, "rb") as f:
+        tree = ast.parse(f.read(), filename=path)
+    found = set()
+    prefix = package + "."
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name.startswith(prefix):
+                    found.add(alias.name[len(prefix):].split(".")[0])
+        elif isinstance(node, ast.ImportFrom):
+            if node.level == 1:
+                if node.module:
+                    found.add(node.module.split(".")[0])
+                else:
+                    found.update(alias.name for alias in node.names)
+            elif node.level == 0 and node.module:
+                if node.module == package:
+                    found.update(alias.name for alias in node.names)
+                elif node.module.startswith(prefix):
+                    found.add(node.module[len(prefix):].split(".")[0])
+    return found
+
+
+class CogReloader:
+    def __init__(self, bot, directory: str, package: str = "cogs", sync=None, load=None,
+                 debounce: float = 1.0, poll_interval: float = 1.0, snapshot=None):
+        self.bot = bot
+        self.snapshot = snapshot  # StateSnapshot that carries live cog state across the reload
+        self.directory = directory
+        self.package = package
+        self.sync = sync or bot.sync_application_commands
+        self.load = load or bot.load_extension
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.files = {}  # module: (mtime_ns, size, digest) as of the last reload
+        self.lock = asyncio.Lock()
+        self.watcher = None
+        self.reloads = 0
+        self.modules_reloaded = 0
+        self.modules_skipped = 0
+        self.syncs = 0
+        self.last = None
+
+    @staticmethod
+    def is_extension(module: str) -> bool:
+        return not module.startswith("_")
+
+    def scan(self) -> dict:
+        current = {}
+        for fn in os.listdir(self.directory):
+            if not fn.endswith(".py"):
+                continue
+            module = fn[:-3]
+            path = os.path.join(self.directory, fn)
+            try:
+                st = os.stat(path)
+                known = self.files.get(module)
+                if known and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+                    current[module] = known
+                else:
+                    current[module] = (st.st_mtime_ns, st.st_size, file_digest(path))
+            except FileNotFoundError:
+                continue  # removed mid-scan
+        return current
+
+    def mark_loaded(self):
+        """Record the on-disk state of the cogs just loaded at startup."""
+        self.files = self.scan()
+
+    def dependents(self, modules: set) -> set:
+        """Every module that imports one of `modules`, directly or indirectly."""
+        imports = {}
+        for fn in os.listdir(self.directory):
+            if fn.endswith(".py"):
+                try:
+                    imports[fn[:-3]] = module_imports(os.path.join(self.directory, fn), self.package)
+                except (OSError, SyntaxError):
+                    imports[fn[:-3]] = set()
+        out = set()
+        frontier = set(modules)
+        while frontier:
+            frontier = {m for m, deps in imports.items() if deps & frontier and m not in out}
+            out |= frontier
+        return out
+
+    async def reload(self, modules=None, force: bool = False, sync: bool = True) -> dict:
+        """Reload changed cogs (or `modules`, or everything if `force`) and sync once."""
+        async with self.lock:
+            started = time.perf_counter()
+            current = self.scan()
+            if force:
+                changed = set(current)
+            elif modules:
+                changed = set(modules) & set(current)
+            else:
+                changed = {m for m, entry in current.items() if self.files.get(m, (0, 0, None))[2] != entry[2]}
+            removed = set(self.files) - set(current)
+            affected = (changed | self.dependents(changed | removed)) - removed
+
+            # helper modules are not extensions; dropping them makes dependents re-import fresh code
+            for module in changed | removed:
+                if not self.is_extension(module):
+                    sys.modules.pop(f"{self.package}.{module}", None)
+
+            result = {"reloaded": [], "loaded": [], "unloaded": [], "failed": [], "synced": False}
+            with self.snapshot.reloading() if self.snapshot is not None else nullcontext():
+                for module in sorted(removed):
+                    name = f"{self.package}.{module}"
+                    if self.is_extension(module) and name in self.bot.extensions:
+                        try:
+                            self.bot.unload_extension(name)
+                            result["unloaded"].append(name)
+                        except Exception as e:
+                            result["failed"].append((name, str(e)))
+
+                for module in sorted(affected):
+                    if not self.is_extension(module):
+                        continue
+                    name = f"{self.package}.{module}"
+                    try:
+                        if name in self.bot.extensions:
+                            self.bot.reload_extension(name)
+                            result["reloaded"].append(name)
+                        else:
+                            self.load(name)
+                            result["loaded"].append(name)
+                    except Exception as e:
+                        result["failed"].append((name, str(e)))
+                        logger.error(f"Failed to reload {name}: {e}")
+                        # keep the old hash so the next reload retries it
+                        if module in self.files:
+                            current[module] = (0, 0, self.files[module][2])
+                        else:
+                            current.pop(module, None)
+
+            # only what was acted on takes its new hash; a changed module left out of a
+            # targeted reload keeps the old one so the next refresh still picks it up
+            done = changed | affected
+            for module, entry in current.items():
+                known = self.files.get(module)
+                if module in done or (known is not None and known[2] == entry[2]):
+                    self.files[module] = entry
+            for module in removed | (done - set(current)):
+                self.files.pop(module, None)
+            touched = len(result["reloaded"]) + len(result["loaded"]) + len(result["unloaded"])
+            if sync and touched:
+                try:
+                    await self.sync()
+                    self.syncs += 1
+                    result["synced"] = True
+                except Exception as e:
+                    logger.error(f"Failed to sync application commands after reload: {e}")
+
+            self.reloads += 1
+            self.modules_reloaded += touched
+            self.modules_skipped += sum(1 for m in current if self.is_extension(m)) - touched
+            result["elapsed"] = time.perf_counter() - started
+            self.last = result
+            if touched or result["failed"]:
+                logger.info(
+                    f"Reload: {touched} module(s) in {result['elapsed'] * 1000:.0f} ms, "
+                    f"{len(result['failed'])} failed, synced={result['synced']}"
+                )
+            return result
+
+    # --- watching ---
+    def start_watch(self):
+        if self.watcher is None or self.watcher.done():
+            self.watcher = asyncio.create_task(self._watch())
+
+    def stop_watch(self):
+        if self.watcher is not None:
+            self.watcher.cancel()
+            self.watcher = None
+
+    @property
+    def watching(self) -> bool:
+        return self.watcher is not None and not self.watcher.done()
+
+    def _stamp(self):
+        stamps = []
+        for fn in os.listdir(self.directory):
+            if fn.endswith(".py"):
+                try:
+                    st = os.stat(os.path.join(self.directory, fn))
+                except FileNotFoundError:
+                    continue
+                stamps.append((fn, st.st_mtime_ns, st.st_size))
+        return sorted(stamps)
+
+    async def _watch(self):
+        logger.info(f"Watching {self.directory} for cog changes")
+        last = self._stamp()
+        changed_at = time.monotonic()  # pick up anything edited before the watch started
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                stamp = self._stamp()
+                if stamp != last:
+                    last = stamp
+                    changed_at = time.monotonic()
+                elif changed_at is not None and time.monotonic() - changed_at >= self.debounce:
+                    changed_at = None
+                    await self.reload()
+            except Exception as e:
+                logger.error(f"Cog watcher error: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "reloads": self.reloads,
+            "modules_reloaded": self.modules_reloaded,
+            "modules_skipped": self.modules_skipped,
+            "syncs": self.syncs,
+            "watching": self.watching,
+        }
+
+
+def describe(result: dict) -> str:
+    """One-line summary of a reload result for chat and terminal output."""
+    parts = []
+    for key in ("reloaded", "loaded", "unloaded"):
+        if result[key]:
+            parts.append(f"{key.capitalize()}: {', '.join(result[key])}")
+    if result["failed"]:
+        parts.append(f"Failed: {', '.join(f'{name} ({err})' for name, err in result['failed'])}")
+    if not parts:
+        parts.append("No cogs changed")
+    parts.append(f"{result['elapsed'] * 1000:.0f} ms" + (", commands synced" if result["synced"] else ""))
+    return "\n".join(parts)
@@ -0,0 +1,153 @@
+"""Resolve message IDs without a REST round-trip when the bot has seen them.
+
+Gateway events keep two structures current: a message-id -> channel-id index
+(cheap, so it covers many more messages) and an LRU of recent `Message`
+objects bounded both by count and by an approximate byte budget. `resolve()`
+answers from the LRU, and only on a miss fetches over REST, using the index
+to find the channel when the caller does not know it.
+"""
+
+import logging
+import sys
+from collections import OrderedDict
+
+logger = logging.getLogger("lunarbot.resolver")
+
+# rough per-message overhead: the Message object, its author and state refs
+MESSAGE_OVERHEAD = 1024
+
+
+def approx_size(message) -> int:
+    size = MESSAGE_OVERHEAD + sys.getsizeof(message.content or "")
+    for embed in message.embeds:
+        size += 256 + len(embed)  # len(Embed) is its total character count
+    size += 256 * (len(message.attachments) + len(message.components))
+    return size
+
+
+class MessageResolver:
+    def __init__(self, bot, max_messages: int = 5000, max_bytes: int = 16 * 1024 * 1024,
+                 max_index: int = 200_000):
+        self.bot = bot
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.max_index = max_index
+        self.messages = OrderedDict()  # message_id: (Message, approx bytes), least recent first
+        self.index = OrderedDict()     # message_id: channel_id, least recent first
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0    # resolved over REST
+        self.unknown = 0   # channel not known, nothing fetched
+        self.evicted = 0
+
+    def attach(self):
+        self.bot.add_listener(self.on_message, "on_message")
+        self.bot.add_listener(self.on_message_edit, "on_message_edit")
+        self.bot.add_listener(self.on_raw_message_edit, "on_raw_message_edit")
+        self.bot.add_listener(self.on_raw_message_delete, "on_raw_message_delete")
+        self.bot.add_listener(self.on_raw_bulk_message_delete, "on_raw_bulk_message_delete")
+
+    # --- cache ---
+    def add(self, message):
+        self.forget(message.id)
+        size = approx_size(message)
+        self.messages[message.id] = (message, size)
+        self.bytes += size
+        self.index[message.id] = message.channel.id
+        self.index.move_to_end(message.id)
+        while self.messages and (len(self.messages) > self.max_messages or self.bytes > self.max_bytes):
+            _, (_, old_size) = self.messages.popitem(last=False)
+            self.bytes -= old_size
+            self.evicted += 1
+        while len(self.index) > self.max_index:
+            self.index.popitem(last=False)
+
+    def forget(self, message_id: int, index: bool = False):
+        entry = self.messages.pop(message_id, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+        if index:
+            self.index.pop(message_id, None)
+
+    def get(self, message_id: int):
+        entry = self.messages.get(message_id)
+        if entry is None:
+            return None
+        self.messages.move_to_end(message_id)
+        return entry[0]
+
+    def channel_of(self, message_id: int):
+        channel_id = self.index.get(message_id)
+        return self.bot.get_channel(channel_id) if channel_id else None
+
+    async def resolve(self, message_id: int, channel=None):
+        """The message, from cache or REST; None if its channel is not known.
+
+        With an explicit `channel` this behaves like `channel.fetch_message`,
+        including raising NotFound/Forbidden from the REST call.
+        """
+        message = self.get(message_id)
+        if message is not None and (channel is None or message.channel.id == channel.id):
+            self.hits += 1
+            return message
+        channel = channel or self.channel_of(message_id)
+        if channel is None:
+            self.unknown += 1
+            return None
+        self.misses += 1
+        message = await channel.fetch_message(message_id)
+        self.add(message)
+        return message
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "messages": len(self.messages),
+            "indexed": len(self.index),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "unknown": self.unknown,
+            "evicted": self.evicted,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+    # --- warm restart ---
+    # Message objects hold live connection state, so only the channel index is
+    # carried over; messages come back over REST on first use, without a search.
+    def to_json(self) -> dict:
+        return {"index": list(self.index.items())}
+
+    def load_json(self, data: dict):
+        for message_id, channel_id in data["index"]:
+            self.index.setdefault(message_id, channel_id)
+        while len(self.index) > self.max_index:
+            self.index.popitem(last=False)
+
+    # --- gateway events ---
+    async def on_message(self, message):
+        self.add(message)
+
+    async def on_message_edit(self, before, after):
+        # `after` is the live object nextcord keeps updating
+        if after.id in self.messages:
+            self.add(after)
+
+    async def on_raw_message_edit(self, payload):
+        if payload.cached_message is not None:
+            return  # handled by on_message_edit
+        entry = self.messages.get(payload.message_id)
+        if entry is None:
+            return
+        try:
+            entry[0]._update(payload.data)
+        except Exception as e:
+            logger.debug(f"Dropping stale cached message {payload.message_id}: {e}")
+            self.forget(payload.message_id)
+
+    async def on_raw_message_delete(self, payload):
+        self.forget(payload.message_id, index=True)
+
+    async def on_raw_bulk_message_delete(self, payload):
+        for message_id in payload.message_ids:
+            self.forget(message_id, index=True)
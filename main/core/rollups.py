@@ -0,0 +1,214 @@
+"""Time-bucketed activity counters with bounded memory.
+
+Every counter is a fixed-size ring of time buckets, so memory does not grow
+with uptime: a bucket that falls out of the window is recycled for the next
+one. Range questions ("last 7 days", "messages per hour") cost O(buckets).
+"""
+
+import heapq
+import time
+from array import array
+
+MINUTE = 60
+HOUR = 3600
+DAY = 86400
+
+
+class Ring:
+    """`size` consecutive buckets of `width` seconds each."""
+
+    __slots__ = ("width", "_counts", "_head")
+
+    def __init__(self, size: int, width: int):
+        self.width = width
+        self._counts = array("I", bytes(4 * size))
+        self._head = None  # absolute number of the newest bucket
+
+    def _advance(self, bucket: int):
+        head = self._head
+        if head is None or bucket - head >= len(self._counts):
+            for i in range(len(self._counts)):
+                self._counts[i] = 0
+        elif bucket > head:
+            size = len(self._counts)
+            for b in range(head + 1, bucket + 1):
+                self._counts[b % size] = 0
+        else:
+            return
+        self._head = bucket
+
+    def add(self, ts: float, amount: int = 1):
+        bucket = int(ts // self.width)
+        self._advance(bucket)
+        if bucket > self._head - len(self._counts):
+            self._counts[bucket % len(self._counts)] += amount
+
+    def window(self, now: float, buckets: int):
+        """Counts of the last `buckets` buckets ending at `now`, oldest first."""
+        size = len(self._counts)
+        newest = int(now // self.width)
+        head = self._head
+        out = []
+        for b in range(newest - min(buckets, size) + 1, newest + 1):
+            if head is None or b > head or b <= head - size:
+                out.append(0)
+            else:
+                out.append(self._counts[b % size])
+        return out
+
+    def total(self, now: float, buckets: int) -> int:
+        return sum(self.window(now, buckets))
+
+    def to_json(self) -> dict:
+        return {"width": self.width, "head": self._head, "counts": self._counts.tolist()}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Ring":
+        ring = cls(len(data["counts"]), data["width"])
+        ring._counts = array("I", data["counts"])
+        ring._head = data["head"]
+        return ring
+
+
+class Rollup:
+    """Minute, hour and day rings fed together, so each resolution is always current."""
+
+    __slots__ = ("minutes", "hours", "days")
+
+    def __init__(self, minutes: int = 60, hours: int = 7 * 24, days: int = 90):
+        self.minutes = Ring(minutes, MINUTE)
+        self.hours = Ring(hours, HOUR)
+        self.days = Ring(days, DAY)
+
+    def add(self, ts: float, amount: int = 1):
+        self.minutes.add(ts, amount)
+        self.hours.add(ts, amount)
+        self.days.add(ts, amount)
+
+    def to_json(self) -> dict:
+        return {name: getattr(self, name).to_json() for name in self.__slots__}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Rollup":
+        rollup = cls.__new__(cls)
+        for name in cls.__slots__:
+            setattr(rollup, name, Ring.from_json(data[name]))
+        return rollup
+
+
+class DailyUserCounts:
+    """Per-user counts in a ring of day buckets; only active users take space."""
+
+    __slots__ = ("_days", "_head")
+
+    def __init__(self, days: int = 30):
+        self._days = [dict() for _ in range(days)]
+        self._head = None
+
+    def add(self, user_id: int, ts: float, amount: int = 1):
+        day = int(ts // DAY)
+        size = len(self._days)
+        if self._head is None or day - self._head >= size:
+            for bucket in self._days:
+                bucket.clear()
+            self._head = day
+        elif day > self._head:
+            for d in range(self._head + 1, day + 1):
+                self._days[d % size].clear()
+            self._head = day
+        elif day <= self._head - size:
+            return
+        bucket = self._days[day % size]
+        bucket[user_id] = bucket.get(user_id, 0) + amount
+
+    def totals(self, now: float, days: int) -> dict:
+        size = len(self._days)
+        today = int(now // DAY)
+        merged = {}
+        if self._head is None:
+            return merged
+        for d in range(today - min(days, size) + 1, today + 1):
+            if d > self._head or d <= self._head - size:
+                continue
+            for user_id, count in self._days[d % size].items():
+                merged[user_id] = merged.get(user_id, 0) + count
+        return merged
+
+    def snapshot(self, now: float, days: int):
+        """Copies of the last `days` day buckets, oldest first (empty dicts for gaps)."""
+        size = len(self._days)
+        today = int(now // DAY)
+        out = []
+        for d in range(today - min(days, size) + 1, today + 1):
+            if self._head is None or d > self._head or d <= self._head - size:
+                out.append({})
+            else:
+                out.append(dict(self._days[d % size]))
+        return out
+
+    def to_json(self) -> dict:
+        return {"head": self._head, "days": [list(bucket.items()) for bucket in self._days]}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "DailyUserCounts":
+        counts = cls(len(data["days"]))
+        counts._days = [dict(bucket) for bucket in data["days"]]
+        counts._head = data["head"]
+        return counts
+
+
+class ActivityTracker:
+    """Per-guild, per-channel and per-user activity rollups."""
+
+    def __init__(self, user_days: int = 30):
+        self.user_days = user_days
+        self.guilds = {}    # guild_id: Rollup
+        self.channels = {}  # channel_id: Rollup
+        self.users = {}     # guild_id: DailyUserCounts
+
+    def record(self, guild_id: int, channel_id: int, user_id: int, ts: float = None):
+        ts = time.time() if ts is None else ts
+        for table, key in ((self.guilds, guild_id), (self.channels, channel_id)):
+            rollup = table.get(key)
+            if rollup is None:
+                rollup = table[key] = Rollup()
+            rollup.add(ts)
+        users = self.users.get(guild_id)
+        if users is None:
+            users = self.users[guild_id] = DailyUserCounts(self.user_days)
+        users.add(user_id, ts)
+
+    def top_users(self, guild_id: int, days: int, k: int = 10, now: float = None):
+        users = self.users.get(guild_id)
+        if users is None:
+            return []
+        totals = users.totals(time.time() if now is None else now, days)
+        return heapq.nlargest(k, totals.items(), key=lambda item: item[1])
+
+    def series(self, rollup: Rollup, resolution: str, buckets: int, now: float = None):
+        ring = getattr(rollup, resolution)
+        return ring.window(time.time() if now is None else now, buckets)
+
+    def heatmap(self, rollup: Rollup, days: int = 7, now: float = None):
+        """[day][hour] message counts for the last `days` UTC days, oldest day first."""
+        now = time.time() if now is None else now
+        days = min(days, len(rollup.hours._counts) // 24)
+        # pad to the end of today so every row covers 00:00-23:59
+        end_of_today = (int(now // DAY) + 1) * DAY - 1
+        hours = rollup.hours.window(end_of_today, days * 24)
+        return [hours[d * 24:(d + 1) * 24] for d in range(days)]
+
+    def to_json(self) -> dict:
+        # JSON object keys are strings, so the ID-keyed tables go out as pairs
+        return {
+            "user_days": self.user_days,
+            "guilds": [[key, rollup.to_json()] for key, rollup in self.guilds.items()],
+            "channels": [[key, rollup.to_json()] for key, rollup in self.channels.items()],
+            "users": [[key, users.to_json()] for key, users in self.users.items()],
+        }
+
+    def load_json(self, data: dict):
+        self.user_days = data["user_days"]
+        self.guilds = {key: Rollup.from_json(value) for key, value in data["guilds"]}
+        self.channels = {key: Rollup.from_json(value) for key, value in data["channels"]}
+        self.users = {key: DailyUserCounts.from_json(value) for key, value in data["users"]}
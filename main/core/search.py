@@ -0,0 +1,117 @@
+"""Find a message by ID when the channel is unknown.
+
+Instead of one REST round-trip per channel in sequence, lookups fan out over
+a bounded pool of workers, the most recently active channels go first, and
+everything still in flight is cancelled as soon as one lookup hits.
+
+Run `python -m core.search` for a comparison against the sequential scan
+using a fake REST channel with fixed latency.
+"""
+
+import asyncio
+import time
+
+
+class MessageSearch:
+    def __init__(self, concurrency: int = 8):
+        self.concurrency = concurrency
+        self.searches = 0
+        self.hits = 0
+        self.lookups = 0       # REST calls issued
+        self.total_time = 0.0
+        self.last_time = 0.0
+
+    @staticmethod
+    def order(channels, message_id: int):
+        """Likely channels first; channels created after the message are dropped."""
+        candidates = [c for c in channels if c.id <= message_id]
+        # a channel whose newest message is older than the target is unlikely
+        # to hold it, so it goes to the back; otherwise most recent activity first
+        return sorted(
+            candidates,
+            key=lambda c: (
+                (c.last_message_id or 0) < message_id,
+                -(c.last_message_id or 0),
+            ),
+        )
+
+    async def find(self, channels, message_id: int):
+        """The message with `message_id` from any of `channels`, or None."""
+        started = time.perf_counter()
+        ordered = self.order(channels, message_id)
+        pending = iter(ordered)  # shared by the workers; each channel is tried once
+
+        async def worker():
+            for channel in pending:
+                self.lookups += 1
+                try:
+                    return await channel.fetch_message(message_id)
+                except Exception:
+                    continue  # not there, or no access
+            return None
+
+        tasks = [asyncio.create_task(worker()) for _ in range(min(self.concurrency, len(ordered)))]
+        found = None
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                found = await next_done
+                if found is not None:
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        self.last_time = time.perf_counter() - started
+        self.total_time += self.last_time
+        self.searches += 1
+        if found is not None:
+            self.hits += 1
+        return found
+
+    def stats(self) -> dict:
+        return {
+            "searches": self.searches,
+            "hits": self.hits,
+            "lookups": self.lookups,
+            "last_ms": round(self.last_time * 1000, 1),
+            "avg_ms": round(self.total_time / self.searches * 1000, 1) if self.searches else 0.0,
+        }
+
+
+async def _compare(channels: int = 200, latency: float = 0.05, concurrency: int = 8):
+    class FakeChannel:
+        def __init__(self, channel_id, last_message_id, holds):
+            self.id = channel_id
+            self.last_message_id = last_message_id
+            self.holds = holds
+
+        async def fetch_message(self, message_id):
+            await asyncio.sleep(latency)  # one REST round-trip
+            if message_id not in self.holds:
+                raise LookupError(message_id)
+            return (self.id, message_id)
+
+    target = 10**18
+    # the target sits in a moderately active channel somewhere in the middle
+    fakes = [FakeChannel(i, target + 1000 - i, set()) for i in range(1, channels + 1)]
+    fakes[channels // 3].holds.add(target)
+
+    started = time.perf_counter()
+    for channel in fakes:
+        try:
+            await channel.fetch_message(target)
+            break
+        except LookupError:
+            continue
+    sequential = time.perf_counter() - started
+
+    search = MessageSearch(concurrency)
+    assert await search.find(fakes, target) == (fakes[channels // 3].id, target)
+    print(f"{channels} channels, {latency * 1000:.0f} ms per lookup, target in channel #{channels // 3 + 1}")
+    print(f"sequential scan: {sequential * 1000:8.1f} ms")
+    print(f"fan-out ({concurrency:>2}):    {search.last_time * 1000:8.1f} ms ({search.lookups} lookups)")
+
+
+if __name__ == "__main__":
+    asyncio.run(_compare())
@@ -0,0 +1,143 @@
+"""Bounded message-counting sessions.
+
+Sessions are capped in number, expire after a period of inactivity or a
+maximum age, and leave behind a small final-results snapshot when they
+close, so long-running bots do not accumulate per-channel dicts forever.
+"""
+
+import time
+from collections import OrderedDict
+
+from core.counters import GuildCounters
+from core.ranking import RankIndex
+
+RESULTS_TOP = 25  # members kept in a closed session's snapshot
+
+
+class Session:
+    __slots__ = ("channel_id", "guild_id", "started_at", "last_activity", "total", "counts", "ranks")
+
+    def __init__(self, channel_id: int, guild_id: int, started_at: float):
+        self.channel_id = channel_id
+        self.guild_id = guild_id
+        self.started_at = started_at
+        self.last_activity = started_at
+        self.total = 0
+        self.counts = GuildCounters()
+        self.ranks = RankIndex()
+
+    def record(self, user_id: int, now: float) -> int:
+        count = self.counts.add(user_id)
+        self.ranks.update(user_id, count - 1, count)
+        self.total += 1
+        self.last_activity = now
+        return count
+
+    def results(self, closed_at: float, reason: str) -> dict:
+        return {
+            "channel_id": self.channel_id,
+            "guild_id": self.guild_id,
+            "started_at": self.started_at,
+            "closed_at": closed_at,
+            "reason": reason,
+            "total": self.total,
+            "participants": len(self.counts),
+            "top": self.ranks.top(RESULTS_TOP),
+        }
+
+    def to_json(self) -> dict:
+        return {
+            "channel_id": self.channel_id,
+            "guild_id": self.guild_id,
+            "started_at": self.started_at,
+            "last_activity": self.last_activity,
+            "total": self.total,
+            "counts": list(self.counts.items()),
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Session":
+        session = cls(data["channel_id"], data["guild_id"], data["started_at"])
+        session.last_activity = data["last_activity"]
+        session.total = data["total"]
+        session.counts = GuildCounters(data["counts"], capacity=len(data["counts"]))
+        session.ranks = RankIndex(session.counts.items())
+        return session
+
+
+class SessionManager:
+    """Live sessions by channel ID, plus the results of recently closed ones."""
+
+    def __init__(self, max_sessions: int = 50, idle_ttl: float = 12 * 3600, max_age: float = 7 * 86400,
+                 results_kept: int = 100):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_age = max_age
+        self.results_kept = results_kept
+        self.live = OrderedDict()    # channel_id: Session, least recently active first
+        self.closed = OrderedDict()  # channel_id: final results, oldest first
+        self.evicted = 0
+        self.expired = 0
+
+    def __len__(self):
+        return len(self.live)
+
+    def get(self, channel_id: int):
+        return self.live.get(channel_id)
+
+    def start(self, channel_id: int, guild_id: int, now: float = None) -> Session:
+        now = time.time() if now is None else now
+        if channel_id in self.live:
+            self.close(channel_id, "restarted", now)
+        while len(self.live) >= self.max_sessions:
+            oldest = next(iter(self.live))
+            self.close(oldest, "evicted", now)
+            self.evicted += 1
+        session = self.live[channel_id] = Session(channel_id, guild_id, now)
+        return session
+
+    def close(self, channel_id: int, reason: str = "stopped", now: float = None):
+        """End a session and keep its final results; returns them, or None."""
+        session = self.live.pop(channel_id, None)
+        if session is None:
+            return None
+        results = session.results(time.time() if now is None else now, reason)
+        self.closed.pop(channel_id, None)
+        self.closed[channel_id] = results
+        while len(self.closed) > self.results_kept:
+            self.closed.popitem(last=False)
+        return results
+
+    def record(self, channel_id: int, user_id: int, now: float = None):
+        """Count a message if `channel_id` has a live session; returns the new count or None."""
+        session = self.live.get(channel_id)
+        if session is None:
+            return None
+        self.live.move_to_end(channel_id)
+        return session.record(user_id, time.time() if now is None else now)
+
+    def expire(self, now: float = None) -> list:
+        """Close sessions that have been idle or open for too long."""
+        now = time.time() if now is None else now
+        closed = []
+        for channel_id, session in list(self.live.items()):
+            if now - session.last_activity >= self.idle_ttl:
+                closed.append(self.close(channel_id, "idle", now))
+            elif now - session.started_at >= self.max_age:
+                closed.append(self.close(channel_id, "expired", now))
+        self.expired += len(closed)
+        return closed
+
+    def to_json(self) -> dict:
+        return {
+            "live": [session.to_json() for session in self.live.values()],
+            "closed": list(self.closed.values()),
+        }
+
+    def load_json(self, data: dict):
+        for entry in data.get("live", []):
+            session = Session.from_json(entry)
+            self.live[session.channel_id] = session
+        for results in data.get("closed", []):
+            results["top"] = [tuple(pair) for pair in results["top"]]
+            self.closed[results["channel_id"]] = results
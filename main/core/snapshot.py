@@ -0,0 +1,152 @@
+"""In-memory state carried across a warm restart.
+
+Components register a `dump()` that returns JSON-serialisable state and a
+`load(state)` that takes it back. Just before the `restart` command execs
+the new process, `save()` writes every component's state to one compressed
+file. The new process calls `restore()` at boot, before the gateway
+connects. Each component is rehydrated as soon as it registers, so cogs
+that load later (lazily, or on a reload) still get their state back.
+
+A snapshot is deleted once it is read, and it is ignored if it is older
+than `max_age`. That way a cold start after a crash never resurrects stale
+state.
+
+Hot reloads need no file at all. Inside `reloading()`, an unloading cog
+passes its live objects to `hand_over()`, and the reloaded instance picks
+them up with `take_over()`. A reload therefore neither re-reads storage
+nor flushes to it. If no successor claims the objects (the cog was removed
+or did not come back), their `release` callback persists them once the
+reload ends.
+"""
+
+import json
+import logging
+import os
+import time
+import zlib
+from contextlib import contextmanager
+
+from core.persist import atomic_write_bytes
+
+logger = logging.getLogger("lunarbot.snapshot")
+
+VERSION = 1
+
+
+class StateSnapshot:
+    def __init__(self, path: str, max_age: float = 300.0):
+        self.path = path
+        self.max_age = max_age
+        self.components = {}   # key: (dump, load)
+        self.pending = {}      # key: restored state no component has claimed yet
+        self.restored = []     # keys rehydrated from the last snapshot
+        self.last_save = None
+        self.handoffs = {}     # key: (live state, release) from a cog unloaded mid-reload
+        self.reloads = 0       # reloads in progress
+        self.handed_over = 0
+        self.released = 0
+
+    def register(self, key: str, dump, load):
+        self.components[key] = (dump, load)
+        if key in self.pending:
+            self._apply(key, self.pending.pop(key))
+
+    def unregister(self, key: str):
+        self.components.pop(key, None)
+
+    def _apply(self, key: str, state):
+        try:
+            self.components[key][1](state)
+            self.restored.append(key)
+        except Exception as e:
+            logger.error(f"Failed to restore {key} from snapshot: {e}")
+
+    # --- hot reload hand-over ---
+    @contextmanager
+    def reloading(self):
+        self.reloads += 1
+        try:
+            yield
+        finally:
+            self.reloads -= 1
+            if not self.reloads:
+                for key, (_, release) in list(self.handoffs.items()):
+                    del self.handoffs[key]
+                    self.released += 1
+                    if release is None:
+                        continue
+                    try:
+                        release()
+                    except Exception as e:
+                        logger.error(f"Failed to persist unclaimed {key} state after reload: {e}")
+
+    def hand_over(self, key: str, state, release=None) -> bool:
+        """Keep `state` for the reloaded cog; False outside a reload, so the caller persists it."""
+        if not self.reloads:
+            return False
+        self.handoffs[key] = (state, release)
+        return True
+
+    def take_over(self, key: str):
+        """Live state left by the previous instance during this reload, or None."""
+        entry = self.handoffs.pop(key, None)
+        if entry is None:
+            return None
+        self.handed_over += 1
+        return entry[0]
+
+    def save(self) -> dict:
+        """Write every registered component's state; returns a summary."""
+        started = time.perf_counter()
+        state = {}
+        for key, (dump, _) in self.components.items():
+            try:
+                state[key] = dump()
+            except Exception as e:
+                logger.error(f"Failed to snapshot {key}: {e}")
+        payload = {"version": VERSION, "written_at": time.time(), "state": state}
+        data = zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        atomic_write_bytes(self.path, data)
+        self.last_save = {
+            "components": sorted(state),
+            "bytes": len(data),
+            "ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        logger.info(f"Snapshot of {len(state)} component(s) written to {self.path} ({len(data):,} bytes)")
+        return self.last_save
+
+    def restore(self) -> int:
+        """Load and consume the snapshot on disk; returns how many components it held."""
+        if not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path, "rb") as f:
+                payload = json.loads(zlib.decompress(f.read()))
+        except Exception as e:
+            logger.error(f"Ignoring unreadable snapshot {self.path}: {e}")
+            payload = None
+        finally:
+            os.unlink(self.path)
+        if payload is None or payload.get("version") != VERSION:
+            return 0
+        age = time.time() - payload["written_at"]
+        if age > self.max_age:
+            logger.warning(f"Ignoring snapshot written {age:.0f}s ago (max age {self.max_age:.0f}s)")
+            return 0
+        state = payload["state"]
+        self.pending = dict(state)
+        for key in list(self.pending):
+            if key in self.components:
+                self._apply(key, self.pending.pop(key))
+        logger.info(f"Restored snapshot of {len(state)} component(s) written {age:.1f}s ago")
+        return len(state)
+
+    def stats(self) -> dict:
+        return {
+            "registered": sorted(self.components),
+            "restored": list(self.restored),
+            "unclaimed": sorted(self.pending),
+            "last_save": self.last_save,
+            "handed_over": self.handed_over,
+            "released": self.released,
+        }
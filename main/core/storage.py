@@ -0,0 +1,279 @@
+"""SQLite (WAL) storage engine shared by the bot and its cogs.
+
+Every table has the same shape: an integer `scope` (usually a guild ID, 0 for
+global data), an integer `key` (usually a user ID) and an integer `value`.
+All statements run on one dedicated DB thread; whatever is queued while a
+transaction is running is committed together in the next one.
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from core.counters import CounterStore
+
+logger = logging.getLogger("lunarbot.storage")
+
+TABLES = (
+    "message_counts",  # scope=guild_id, key=user_id, value=message count
+    "custom_roles",    # scope=0, key=user_id, value=role_id
+)
+
+
+class Storage:
+    def __init__(self, path: str, batch_size: int = 512):
+        self.path = path
+        self.batch_size = batch_size
+        self.transactions = 0
+        self.statements = 0
+        self._queue = queue.SimpleQueue()
+        ready = concurrent.futures.Future()
+        self._thread = threading.Thread(target=self._worker, args=(ready,), name="lunarbot-db", daemon=True)
+        self._thread.start()
+        ready.result()  # re-raises if the database could not be opened
+
+    # --- DB thread ---
+    def _connect(self):
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for table in TABLES:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "scope INTEGER NOT NULL, key INTEGER NOT NULL, value INTEGER NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (scope, key)) WITHOUT ROWID"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_by_value ON {table} (scope, value DESC)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        return conn
+
+    def _worker(self, ready):
+        try:
+            conn = self._connect()
+        except Exception as e:
+            ready.set_exception(e)
+            return
+        ready.set_result(None)
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)  # finish this batch, then stop
+                    break
+                batch.append(item)
+
+            results = []
+            try:
+                conn.execute("BEGIN")
+                for fn, fut in batch:
+                    if not fut.set_running_or_notify_cancel():
+                        continue
+                    # a failed callable only rolls back its own writes, not the batch
+                    conn.execute("SAVEPOINT call")
+                    try:
+                        result = fn(conn)
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO call")
+                        conn.execute("RELEASE call")
+                        results.append((fut, None, e))
+                        continue
+                    conn.execute("RELEASE call")
+                    results.append((fut, result, None))
+                conn.execute("COMMIT")
+            except Exception as e:
+                logger.error(f"Storage transaction failed: {e}")
+                try:
+                    conn.execute("ROLLBACK")
+                except Exception:
+                    pass
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+
+            self.transactions += 1
+            self.statements += len(results)
+            # only report success once the data is committed
+            for fut, result, error in results:
+                if error is not None:
+                    fut.set_exception(error)
+                else:
+                    fut.set_result(result)
+
+        conn.close()
+
+    # --- submission ---
+    def submit(self, fn) -> concurrent.futures.Future:
+        """Queue `fn(conn)` for the DB thread; returns a concurrent future."""
+        fut = concurrent.futures.Future()
+        self._queue.put((fn, fut))
+        return fut
+
+    def call(self, fn):
+        """Blocking variant of submit(), for startup code and executor threads."""
+        return self.submit(fn).result()
+
+    async def run(self, fn):
+        return await asyncio.wrap_future(self.submit(fn))
+
+    @staticmethod
+    def _check(table: str):
+        if table not in TABLES:
+            raise ValueError(f"Unknown storage table: {table}")
+
+    # --- statements ---
+    @classmethod
+    def _upsert_sql(cls, table: str, increment: bool) -> str:
+        cls._check(table)
+        update = "value + excluded.value" if increment else "excluded.value"
+        return (
+            f"INSERT INTO {table} (scope, key, value) VALUES (?, ?, ?) "
+            f"ON CONFLICT (scope, key) DO UPDATE SET value = {update}"
+        )
+
+    def _write_many(self, table: str, rows, increment: bool):
+        sql = self._upsert_sql(table, increment)
+        rows = list(rows)
+        return lambda conn: conn.executemany(sql, rows).rowcount
+
+    @staticmethod
+    def _set_meta(name: str, value: str):
+        return lambda conn: conn.execute(
+            "INSERT INTO meta (name, value) VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = excluded.value",
+            (name, value),
+        )
+
+    # --- async API ---
+    async def increment(self, table: str, scope: int, key: int, amount: int = 1):
+        await self.run(self._write_many(table, [(scope, key, amount)], increment=True))
+
+    async def increment_many(self, table: str, rows):
+        """rows: iterable of (scope, key, amount)."""
+        return await self.run(self._write_many(table, rows, increment=True))
+
+    async def upsert(self, table: str, scope: int, key: int, value: int):
+        await self.run(self._write_many(table, [(scope, key, value)], increment=False))
+
+    async def upsert_many(self, table: str, rows):
+        """rows: iterable of (scope, key, value)."""
+        return await self.run(self._write_many(table, rows, increment=False))
+
+    async def delete(self, table: str, scope: int, key: int):
+        self._check(table)
+        await self.run(lambda conn: conn.execute(f"DELETE FROM {table} WHERE scope = ? AND key = ?", (scope, key)))
+
+    async def get(self, table: str, scope: int, key: int, default=None):
+        self._check(table)
+
+        def fn(conn):
+            row = conn.execute(f"SELECT value FROM {table} WHERE scope = ? AND key = ?", (scope, key)).fetchone()
+            return row[0] if row else default
+
+        return await self.run(fn)
+
+    async def scan(self, table: str, scope: int, start: int = None, stop: int = None, limit: int = None):
+        """(key, value) pairs in `scope` with start <= key < stop, ordered by key."""
+        self._check(table)
+        sql = f"SELECT key, value FROM {table} WHERE scope = ?"
+        params = [scope]
+        if start is not None:
+            sql += " AND key >= ?"
+            params.append(start)
+        if stop is not None:
+            sql += " AND key < ?"
+            params.append(stop)
+        sql += " ORDER BY key"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return await self.run(lambda conn: conn.execute(sql, params).fetchall())
+
+    async def top(self, table: str, scope: int, n: int = 10, offset: int = 0):
+        """The `n` highest (key, value) pairs in `scope`, served from the value index."""
+        self._check(table)
+        sql = f"SELECT key, value FROM {table} WHERE scope = ? ORDER BY value DESC LIMIT ? OFFSET ?"
+        return await self.run(lambda conn: conn.execute(sql, (scope, n, offset)).fetchall())
+
+    # --- blocking helpers ---
+    def load(self, table: str) -> dict:
+        """Whole table as {scope: {key: value}}; meant for one-off startup loads."""
+        self._check(table)
+
+        def fn(conn):
+            out = {}
+            for scope, key, value in conn.execute(f"SELECT scope, key, value FROM {table}"):
+                out.setdefault(scope, {})[key] = value
+            return out
+
+        return self.call(fn)
+
+    def write_many(self, table: str, rows, increment: bool = False):
+        return self.call(self._write_many(table, rows, increment))
+
+    def get_meta(self, name: str, default=None):
+        row = self.call(lambda conn: conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone())
+        return row[0] if row else default
+
+    def set_meta(self, name: str, value: str):
+        self.call(self._set_meta(name, value))
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        logger.info(f"Storage closed ({self.statements} statements in {self.transactions} transactions)")
+
+
+# --- One-shot migration of the old JSON files ---
+
+def _read_json(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def migrate_json_files(storage: Storage, message_counts: str = None, custom_roles: str = None) -> dict:
+    """Import the legacy whole-file JSON stores once.
+
+    Each file is imported at most once; the source files are left untouched.
+    A file's rows and its `migrated:<path>` marker commit together, so a
+    crash mid-import never leaves a file half-imported or imported twice.
+    A file that fails to import is logged and skipped, and retried on the
+    next start. The alt and delete logs are not stores and stay as files.
+    """
+    imported = {}
+
+    def counts_rows(data):
+        return CounterStore.from_json(data).rows()
+
+    def roles_rows(data):
+        return [(0, int(u), int(r)) for u, r in data.items()]
+
+    jobs = [(message_counts, "message_counts", counts_rows), (custom_roles, "custom_roles", roles_rows)]
+    for path, table, to_rows in jobs:
+        if not path or not os.path.exists(path) or storage.get_meta(f"migrated:{path}") is not None:
+            continue
+        try:
+            rows = list(to_rows(_read_json(path)))
+            write = storage._write_many(table, rows, increment=False)
+            mark = storage._set_meta(f"migrated:{path}", str(time.time()))
+            storage.call(lambda conn: (write(conn), mark(conn)))
+        except Exception as e:
+            logger.error(f"Failed to migrate {path}, leaving it for the next start: {e}")
+            continue
+        imported[path] = len(rows)
+        logger.info(f"Migrated {len(rows)} rows from {path}")
+
+    return imported
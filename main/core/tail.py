@@ -0,0 +1,169 @@
+"""Live tail of guild messages to console clients.
+
+Each subscription has a filter (channels and/or guilds, authors, a regex,
+attachments only), a bounded queue, and a pump task that writes to its
+console client and waits for that client to drain. The gateway handler
+only formats the message once and offers it to each matching queue, which
+never blocks. When a queue is full, the "drop-oldest" policy evicts the
+oldest event. The "sample" policy admits one in every `sample` events and
+drops the rest, so a flood still shows a trickle. Either way, a noisy
+channel or a slow client costs at most `maxsize` lines, and the drops are
+counted and reported inline.
+"""
+
+import asyncio
+import logging
+import re
+from collections import deque
+
+logger = logging.getLogger("lunarbot.tail")
+
+POLICIES = ("drop-oldest", "sample")
+
+
+class TailFilter:
+    def __init__(self, channels=(), guilds=(), authors=(), pattern: str = None, attachments: bool = False):
+        self.channels = set(channels)
+        self.guilds = set(guilds)
+        self.authors = set(authors)
+        self.pattern = re.compile(pattern, re.IGNORECASE) if pattern else None
+        self.attachments = attachments
+
+    def matches(self, message) -> bool:
+        # channels and guilds widen the scope together; with neither, every message is in scope
+        if self.channels or self.guilds:
+            guild_id = message.guild.id if message.guild else None
+            if message.channel.id not in self.channels and guild_id not in self.guilds:
+                return False
+        if self.authors and message.author.id not in self.authors:
+            return False
+        if self.attachments and not message.attachments:
+            return False
+        if self.pattern is not None and not self.pattern.search(message.content or ""):
+            return False
+        return True
+
+    def describe(self) -> str:
+        parts = []
+        for label, ids in (("channels", self.channels), ("guilds", self.guilds), ("authors", self.authors)):
+            if ids:
+                parts.append(f"{label}={','.join(map(str, sorted(ids)))}")
+        if self.pattern is not None:
+            parts.append(f"match={self.pattern.pattern!r}")
+        if self.attachments:
+            parts.append("attachments only")
+        return " ".join(parts) or "everything"
+
+
+class Subscription:
+    def __init__(self, sub_id: int, tail_filter: TailFilter, ctx, maxsize: int = 200,
+                 policy: str = "drop-oldest", sample: int = 10):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {', '.join(POLICIES)}")
+        self.id = sub_id
+        self.filter = tail_filter
+        self.ctx = ctx
+        self.maxsize = maxsize
+        self.policy = policy
+        self.sample = max(1, sample)
+        self.queue = deque()
+        self.ready = asyncio.Event()
+        self.offered = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.reported = 0    # drops already announced to the client
+        self._overflow = 0   # events seen while full, for sampling
+        self.task = None
+
+    def offer(self, line: str):
+        """Queue `line` without ever waiting; applies the overflow policy when full."""
+        self.offered += 1
+        if len(self.queue) >= self.maxsize:
+            if self.policy == "sample":
+                self._overflow += 1
+                if self._overflow % self.sample:
+                    self.dropped += 1
+                    return
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(line)
+        self.ready.set()
+
+    async def get(self) -> str:
+        while not self.queue:
+            self.ready.clear()
+            await self.ready.wait()
+        return self.queue.popleft()
+
+    def stats(self) -> dict:
+        return {
+            "id": self.id,
+            "filter": self.filter.describe(),
+            "policy": self.policy if self.policy != "sample" else f"sample 1/{self.sample}",
+            "queued": len(self.queue),
+            "maxsize": self.maxsize,
+            "offered": self.offered,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+def format_message(message) -> str:
+    where = f"#{getattr(message.channel, 'name', message.channel.id)}"
+    if message.guild:
+        where = f"{message.guild.name} {where}"
+    line = f"[{where}] {message.author} ({message.author.id}): {message.content}"
+    if message.attachments:
+        line += " " + " ".join(a.url for a in message.attachments)
+    return line
+
+
+class TailHub:
+    def __init__(self, bot):
+        self.bot = bot
+        self.subscriptions = {}  # id: Subscription
+        self.next_id = 1
+
+    def attach(self):
+        self.bot.add_listener(self.on_message, "on_message")
+
+    def subscribe(self, tail_filter: TailFilter, ctx, **options) -> Subscription:
+        sub = Subscription(self.next_id, tail_filter, ctx, **options)
+        self.next_id += 1
+        self.subscriptions[sub.id] = sub
+        sub.task = asyncio.create_task(self._pump(sub))
+        return sub
+
+    def unsubscribe(self, sub_id: int) -> bool:
+        sub = self.subscriptions.pop(sub_id, None)
+        if sub is None:
+            return False
+        if sub.task is not None:
+            sub.task.cancel()
+        return True
+
+    async def _pump(self, sub: Subscription):
+        try:
+            while not sub.ctx.gone:
+                line = await sub.get()
+                if sub.dropped > sub.reported:
+                    sub.ctx.print(f"[tail {sub.id}: {sub.dropped - sub.reported} event(s) dropped]")
+                    sub.reported = sub.dropped
+                sub.ctx.print(line)
+                sub.delivered += 1
+                await sub.ctx.drain()  # a slow client fills its own queue, never the loop
+        finally:
+            if self.subscriptions.get(sub.id) is sub:
+                del self.subscriptions[sub.id]
+                logger.info(f"Tail {sub.id} ended ({sub.delivered} delivered, {sub.dropped} dropped)")
+
+    async def on_message(self, message):
+        line = None
+        for sub in self.subscriptions.values():
+            if sub.filter.matches(message):
+                if line is None:
+                    line = format_message(message)
+                sub.offer(line)
+
+    def stats(self) -> list:
+        return [sub.stats() for sub in self.subscriptions.values()]
@@ -0,0 +1,157 @@
+"""User lookups without a REST call per use.
+
+A reverse index maps each user ID to the guilds the bot has seen them in. It
+is built from whatever members are cached at ready and kept current from
+join/leave/update events and from message authors, so it also covers guilds whose
+member list was never fully chunked. Users that still have to be fetched over
+REST are kept in a small TTL'd LRU.
+"""
+
+import logging
+import time
+from collections import OrderedDict
+
+import nextcord
+
+logger = logging.getLogger("lunarbot.users")
+
+
+class UserDirectory:
+    def __init__(self, bot, max_users: int = 2000, ttl: float = 3600.0):
+        self.bot = bot
+        self.max_users = max_users
+        self.ttl = ttl
+        self.guilds_of = {}          # user_id: set of guild_ids
+        self.fetched = OrderedDict()  # user_id: (User, expires_at), least recent first
+        self.hits = 0
+        self.fetches = 0
+
+    def attach(self):
+        self.bot.add_listener(self.on_ready, "on_ready")
+        self.bot.add_listener(self.on_guild_join, "on_guild_join")
+        self.bot.add_listener(self.on_guild_remove, "on_guild_remove")
+        self.bot.add_listener(self.on_member_join, "on_member_join")
+        self.bot.add_listener(self.on_member_remove, "on_member_remove")
+        self.bot.add_listener(self.on_member_update, "on_member_update")
+        self.bot.add_listener(self.on_user_update, "on_user_update")
+        self.bot.add_listener(self.on_message, "on_message")
+
+    # --- reverse index ---
+    def add_member(self, guild_id: int, user_id: int):
+        guilds = self.guilds_of.get(user_id)
+        if guilds is None:
+            guilds = self.guilds_of[user_id] = set()
+        guilds.add(guild_id)
+
+    def remove_member(self, guild_id: int, user_id: int):
+        guilds = self.guilds_of.get(user_id)
+        if guilds is None:
+            return
+        guilds.discard(guild_id)
+        if not guilds:
+            del self.guilds_of[user_id]
+
+    def index_guild(self, guild):
+        for member in guild.members:  # only what is cached; partial for unchunked guilds
+            self.add_member(guild.id, member.id)
+
+    def drop_guild(self, guild):
+        for user_id in [u for u, guilds in self.guilds_of.items() if guild.id in guilds]:
+            self.remove_member(guild.id, user_id)
+
+    def mutual_guilds(self, user_id: int):
+        return [g for g in map(self.bot.get_guild, self.guilds_of.get(user_id, ())) if g is not None]
+
+    def member(self, user_id: int):
+        """A cached Member for `user_id` from any shared guild, or None."""
+        for guild_id in self.guilds_of.get(user_id, ()):
+            guild = self.bot.get_guild(guild_id)
+            member = guild.get_member(user_id) if guild else None
+            if member is not None:
+                return member
+        return None
+
+    # --- lookups ---
+    def get_user(self, user_id: int):
+        entry = self.fetched.get(user_id)
+        if entry is not None:
+            if entry[1] > time.monotonic():
+                self.fetched.move_to_end(user_id)
+                return entry[0]
+            del self.fetched[user_id]
+        return self.member(user_id) or self.bot.get_user(user_id)
+
+    async def resolve_user(self, user_id: int):
+        """A User or Member for `user_id`; REST only when nothing is cached."""
+        user = self.get_user(user_id)
+        if user is not None:
+            self.hits += 1
+            return user
+        self.fetches += 1
+        user = await self.bot.fetch_user(user_id)
+        self.remember(user)
+        return user
+
+    def remember(self, user):
+        self.fetched[user.id] = (user, time.monotonic() + self.ttl)
+        self.fetched.move_to_end(user.id)
+        while len(self.fetched) > self.max_users:
+            self.fetched.popitem(last=False)
+
+    # --- warm restart ---
+    def to_json(self) -> dict:
+        now = time.monotonic()
+        return {
+            "guilds_of": [[user_id, list(guilds)] for user_id, guilds in self.guilds_of.items()],
+            # remaining TTL, since monotonic clocks do not carry across processes
+            "fetched": [[user._to_minimal_user_json(), expires - now]
+                        for user, expires in self.fetched.values() if expires > now],
+        }
+
+    def load_json(self, data: dict):
+        for user_id, guilds in data["guilds_of"]:
+            self.guilds_of.setdefault(user_id, set()).update(guilds)
+        now = time.monotonic()
+        for payload, remaining in data["fetched"]:
+            user = nextcord.User(state=self.bot._connection, data=payload)
+            self.fetched[user.id] = (user, now + remaining)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.fetches
+        return {
+            "indexed": len(self.guilds_of),
+            "fetched": len(self.fetched),
+            "hits": self.hits,
+            "fetches": self.fetches,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+    # --- gateway events ---
+    async def on_ready(self):
+        for guild in self.bot.guilds:
+            self.index_guild(guild)
+        logger.info(f"User directory indexed {len(self.guilds_of)} users")
+
+    async def on_guild_join(self, guild):
+        self.index_guild(guild)
+
+    async def on_guild_remove(self, guild):
+        self.drop_guild(guild)
+
+    async def on_member_join(self, member):
+        self.add_member(member.guild.id, member.id)
+
+    async def on_member_remove(self, member):
+        self.remove_member(member.guild.id, member.id)
+
+    async def on_member_update(self, before, after):
+        # also how members of unchunked guilds first show up
+        self.add_member(after.guild.id, after.id)
+
+    async def on_user_update(self, before, after):
+        if after.id in self.fetched:
+            self.remember(after)
+
+    async def on_message(self, message):
+        if message.guild is not None:
+            self.add_member(message.guild.id, message.author.id)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the bot runs from main/ and imports its own packages as `core.x` / `cogs.x`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
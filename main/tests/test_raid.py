@@ -0,0 +1,97 @@
+import asyncio
+
+from core.raid import ActionQueue, JoinWindow, RaidDetector
+
+NOW = 1_700_000_000.0
+
+
+def test_trips_when_threshold_is_crossed():
+    detector = RaidDetector(threshold=5, window=10)
+    assert not any(detector.record(1, member_id, NOW + member_id * 0.1) for member_id in range(4))
+    assert not detector.in_raid(1)
+    assert detector.record(1, 4, NOW + 0.4)
+    assert detector.in_raid(1)
+    assert detector.trips == 1
+    assert detector.joiners(1) == [0, 1, 2, 3, 4]
+    # later joins extend the raid instead of tripping again
+    assert not detector.record(1, 5, NOW + 2)
+    assert detector.trips == 1
+    assert detector.raids[1]["joins"] == 6
+    assert detector.raids[1]["last_hot"] == NOW + 2
+
+
+def test_guilds_are_counted_separately():
+    detector = RaidDetector(threshold=3, window=10)
+    for member_id in range(4):
+        detector.record(member_id % 2, member_id, NOW)
+    assert detector.trips == 0
+
+
+def test_joins_expire_with_the_window():
+    detector = RaidDetector(threshold=5, window=10)
+    for member_id in range(4):
+        detector.record(1, member_id, NOW)
+    # the first four joins have left the window by the fifth
+    assert not detector.record(1, 4, NOW + 10)
+    assert not detector.in_raid(1)
+    assert detector.joiners(1) == [4]
+
+
+def test_window_counts_only_recent_seconds():
+    window = JoinWindow(10)
+    for second in range(5):
+        window.add(NOW + second)
+    assert window.count(NOW + 4) == 5
+    assert window.count(NOW + 12) == 2   # seconds 3 and 4 are still inside
+    assert window.count(NOW + 100) == 0
+    # a join older than the window is not counted
+    assert window.add(NOW + 50) == 0
+
+
+def test_release_ends_the_raid():
+    detector = RaidDetector(threshold=1, window=10)
+    assert detector.record(1, 1, NOW)
+    assert detector.release(1)["joins"] == 1
+    assert not detector.in_raid(1)
+    assert detector.release(1) is None
+
+
+def test_action_queue_bounds_concurrency():
+    in_flight = 0
+    peak = 0
+
+    async def kick(member_id):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+
+    async def run():
+        queue = ActionQueue(concurrency=3)
+        for member_id in range(30):
+            assert queue.submit(kick, member_id)
+        await queue.queue.join()
+        queue.stop()
+        return queue
+
+    queue = asyncio.run(run())
+    assert peak == 3
+    assert queue.stats()["done"] == 30
+
+
+def test_action_queue_drops_past_maxsize_and_counts_failures():
+    async def fail(member_id):
+        raise RuntimeError(member_id)
+
+    async def run():
+        queue = ActionQueue(concurrency=2, maxsize=5)
+        accepted = [queue.submit(fail, member_id) for member_id in range(8)]
+        await queue.queue.join()
+        queue.stop()
+        return queue, accepted
+
+    queue, accepted = asyncio.run(run())
+    assert accepted == [True] * 5 + [False] * 3
+    assert queue.stats()["dropped"] == 3
+    assert queue.stats()["failed"] == 5
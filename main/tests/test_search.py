@@ -0,0 +1,102 @@
+import asyncio
+
+from core.search import MessageSearch
+
+TARGET = 10**18
+
+
+class FakeRest:
+    """Counts REST lookups and how many are in flight at once."""
+
+    def __init__(self, latency: float = 0.01):
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.fetched = []
+        self.cancelled = 0
+
+
+class FakeChannel:
+    def __init__(self, rest: FakeRest, channel_id: int, last_message_id: int, holds=()):
+        self.rest = rest
+        self.latency = rest.latency
+        self.id = channel_id
+        self.last_message_id = last_message_id
+        self.holds = set(holds)
+
+    async def fetch_message(self, message_id):
+        rest = self.rest
+        rest.fetched.append(self.id)
+        rest.in_flight += 1
+        rest.max_in_flight = max(rest.max_in_flight, rest.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            rest.cancelled += 1
+            raise
+        finally:
+            rest.in_flight -= 1
+        if message_id not in self.holds:
+            raise LookupError(message_id)  # nextcord raises NotFound here
+        return (self.id, message_id)
+
+
+def channels(rest: FakeRest, count: int, holder: int = None):
+    return [
+        FakeChannel(rest, i, TARGET + 1000 - i, {TARGET} if i == holder else ())
+        for i in range(1, count + 1)
+    ]
+
+
+def test_finds_the_message():
+    rest = FakeRest()
+    search = MessageSearch(concurrency=4)
+    found = asyncio.run(search.find(channels(rest, 40, holder=25), TARGET))
+    assert found == (25, TARGET)
+    assert search.stats()["hits"] == 1
+    # fewer lookups than the sequential scan would have needed
+    assert len(rest.fetched) < 40
+
+
+def test_concurrency_is_bounded():
+    rest = FakeRest()
+    search = MessageSearch(concurrency=4)
+    asyncio.run(search.find(channels(rest, 40), TARGET))
+    assert rest.max_in_flight == 4
+
+
+def test_not_found_tries_every_channel_once():
+    rest = FakeRest(latency=0)
+    search = MessageSearch(concurrency=8)
+    assert asyncio.run(search.find(channels(rest, 30), TARGET)) is None
+    assert sorted(rest.fetched) == list(range(1, 31))
+    assert search.stats()["hits"] == 0
+    assert search.lookups == 30
+
+
+def test_hit_cancels_lookups_in_flight():
+    rest = FakeRest(latency=0.05)
+    search = MessageSearch(concurrency=4)
+    fakes = channels(rest, 40, holder=1)
+    fakes[0].latency = 0.001
+    # the holder answers first, while the other three workers still wait on REST
+    found = asyncio.run(search.find(fakes, TARGET))
+    assert found == (1, TARGET)
+    assert rest.in_flight == 0
+    assert rest.cancelled == 3
+    assert len(rest.fetched) == 4
+
+
+def test_order_skips_newer_channels_and_tries_recent_first():
+    rest = FakeRest()
+    quiet = FakeChannel(rest, 1, TARGET - 5)        # last message older than the target
+    busy = FakeChannel(rest, 2, TARGET + 50)
+    busier = FakeChannel(rest, 3, TARGET + 90)
+    newer = FakeChannel(rest, TARGET + 1, TARGET + 99)  # created after the message
+    assert MessageSearch.order([quiet, busy, newer, busier], TARGET) == [busier, busy, quiet]
+
+
+def test_no_channels():
+    search = MessageSearch()
+    assert asyncio.run(search.find([], TARGET)) is None
+    assert search.lookups == 0